@@ -0,0 +1,43 @@
+"""
+Dependencias compartidas por los routers.
+
+Los servicios son singletons sin estado por request; exponerlos como
+dependencias permite reemplazarlos con ``app.dependency_overrides`` en tests
+y perfiles sin parchear imports. Son ``async def`` porque FastAPI ejecuta
+las dependencias síncronas en el thread pool de anyio: un salto de hilo por
+request solo para devolver un objeto.
+"""
+from typing import Annotated
+
+from fastapi import Depends
+
+from app.services.ocr_service import OCRService, ocr_service
+from app.services.price_service import PriceService, price_service
+from app.services.product_service import ProductService, product_service
+from app.services.store_service import StoreService, store_service
+
+
+async def get_product_service() -> ProductService:
+    """Servicio de productos compartido"""
+    return product_service
+
+
+async def get_store_service() -> StoreService:
+    """Servicio de tiendas compartido"""
+    return store_service
+
+
+async def get_price_service() -> PriceService:
+    """Servicio de precios compartido"""
+    return price_service
+
+
+async def get_ocr_service() -> OCRService:
+    """Servicio OCR compartido"""
+    return ocr_service
+
+
+ProductServiceDep = Annotated[ProductService, Depends(get_product_service)]
+StoreServiceDep = Annotated[StoreService, Depends(get_store_service)]
+PriceServiceDep = Annotated[PriceService, Depends(get_price_service)]
+OCRServiceDep = Annotated[OCRService, Depends(get_ocr_service)]
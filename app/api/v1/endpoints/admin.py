@@ -1,23 +1,47 @@
 """Endpoints administrativos para disparar tareas en segundo plano."""
+import asyncio
+from typing import List
 from uuid import UUID
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Body
 
 from tasks import background_queue
-from tasks.jobs import scrape_prices, process_shopping_image
+from tasks.jobs import scrape_prices, process_shopping_image, refresh_price_trends
 
 router = APIRouter()
 
+MAX_BATCH_SCRAPE = 500
+
 
 @router.post("/scrape-precios/{product_id}")
-def trigger_scrape_prices(product_id: UUID):
+async def trigger_scrape_prices(product_id: UUID):
     """Encola la tarea para scrappear precios de un producto."""
-    job = background_queue.enqueue(scrape_prices, product_id)
+    job = await asyncio.to_thread(background_queue.enqueue, scrape_prices, product_id)
     return {"job_id": job.id}
 
 
+@router.post("/scrape-precios")
+async def trigger_scrape_prices_batch(
+    product_ids: List[UUID] = Body(..., embed=True, min_length=1, max_length=MAX_BATCH_SCRAPE)
+):
+    """Encola el scraping de varios productos en un único pipeline de Redis."""
+    job_datas = [
+        background_queue.prepare_data(scrape_prices, args=(product_id,))
+        for product_id in product_ids
+    ]
+    jobs = await asyncio.to_thread(background_queue.enqueue_many, job_datas)
+    return {"job_ids": [job.id for job in jobs]}
+
+
 @router.post("/procesar-imagen/{file_id}")
-def trigger_process_image(file_id: str):
+async def trigger_process_image(file_id: str):
     """Encola la tarea para procesar una imagen de compra."""
-    job = background_queue.enqueue(process_shopping_image, file_id)
+    job = await asyncio.to_thread(background_queue.enqueue, process_shopping_image, file_id)
+    return {"job_id": job.id}
+
+
+@router.post("/refrescar-tendencias")
+async def trigger_refresh_trends():
+    """Encola el refresco de la vista materializada de tendencias de precio."""
+    job = await asyncio.to_thread(background_queue.enqueue, refresh_price_trends)
     return {"job_id": job.id}
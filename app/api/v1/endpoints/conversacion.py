@@ -8,8 +8,10 @@ Contextual Anchors.
 """
 
 from typing import Dict, Any, Optional, List
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
+from fastapi.responses import ORJSONResponse
+from fastapi_cache.decorator import cache as response_cache
+import asyncio
 import logging
 import time
 
@@ -22,7 +24,10 @@ from app.schemas.conversation import (
     UserProfileResponse
 )
 from app.services.conversation_service import ConversationService
-from app.core.database import get_database_session
+from app.core.cache import CachedResponseCoder, response_cache_key_builder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_async_db, get_database_stats
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -30,24 +35,17 @@ logger = logging.getLogger(__name__)
 # Router para endpoints de conversación
 router = APIRouter(prefix="/conversacion", tags=["Conversación"])
 
-# Instancia del servicio de conversación
-conversation_service = None
-
-
-async def get_conversation_service():
-    """Dependency para obtener el servicio de conversación"""
-    global conversation_service
-    if conversation_service is None:
-        db_session = await get_database_session()
-        conversation_service = ConversationService(db_session)
-    return conversation_service
+async def get_conversation_service(request: Request) -> ConversationService:
+    """Dependency para obtener el servicio de conversación creado en el lifespan"""
+    return request.app.state.conv_service
 
 
 @router.post("/procesar", response_model=ConversationResponse)
 async def procesar_interaccion(
     request: ConversationRequest,
     background_tasks: BackgroundTasks,
-    service: ConversationService = Depends(get_conversation_service)
+    service: ConversationService = Depends(get_conversation_service),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Procesar una nueva interacción del usuario y mantener contexto conversacional.
@@ -61,6 +59,7 @@ async def procesar_interaccion(
         request: Datos de la interacción del usuario
         background_tasks: Tareas en segundo plano para optimización
         service: Servicio de conversación inyectado
+        db: Sesión de base de datos del request
         
     Returns:
         ConversationResponse: Respuesta con contexto actualizado y recomendaciones
@@ -69,7 +68,7 @@ async def procesar_interaccion(
         HTTPException: Si hay errores en el procesamiento
     """
     try:
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         logger.info(f"Procesando interacción para usuario: {request.user_id}")
         
@@ -77,11 +76,12 @@ async def procesar_interaccion(
         result = await service.process_user_interaction(
             user_id=request.user_id,
             interaction_data=request.interaction_data,
-            session_metadata=request.session_metadata
+            session_metadata=request.session_metadata,
+            session=db
         )
         
         # Calcular tiempo de procesamiento
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
         # Agregar tareas en segundo plano si es necesario
         if result.get("requires_background_processing"):
@@ -127,7 +127,8 @@ async def procesar_interaccion(
 async def obtener_contexto_usuario(
     user_id: str,
     include_history: bool = False,
-    service: ConversationService = Depends(get_conversation_service)
+    service: ConversationService = Depends(get_conversation_service),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtener resumen del contexto actual de un usuario.
@@ -140,6 +141,7 @@ async def obtener_contexto_usuario(
         user_id: Identificador único del usuario
         include_history: Si incluir historial de interacciones
         service: Servicio de conversación inyectado
+        db: Sesión de base de datos del request
         
     Returns:
         ContextSummaryResponse: Resumen del contexto del usuario
@@ -153,7 +155,8 @@ async def obtener_contexto_usuario(
         # Obtener contexto del usuario
         context_summary = await service.get_user_context_summary(
             user_id=user_id,
-            include_history=include_history
+            include_history=include_history,
+            session=db
         )
         
         if not context_summary:
@@ -312,7 +315,7 @@ async def eliminar_datos_usuario(
         service: Servicio de conversación inyectado
         
     Returns:
-        JSONResponse: Confirmación de eliminación
+        ORJSONResponse: Confirmación de eliminación
         
     Raises:
         HTTPException: Si no se confirma o hay errores
@@ -334,7 +337,7 @@ async def eliminar_datos_usuario(
             f"{deletion_result['deleted_records']} registros"
         )
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content={
                 "success": True,
@@ -355,14 +358,15 @@ async def eliminar_datos_usuario(
 
 
 @router.get("/estadisticas")
-async def obtener_estadisticas_sistema(
-    service: ConversationService = Depends(get_conversation_service)
-):
+@response_cache(expire=3600, coder=CachedResponseCoder, key_builder=response_cache_key_builder)
+async def obtener_estadisticas_sistema():
     """
     Obtener estadísticas generales del sistema de conversación.
     
     Retorna métricas agregadas y anonimizadas sobre el uso del sistema,
     calidad de perfiles, efectividad de detección de drift, etc.
+    Los conteos recorren todas las tablas, por lo que la respuesta se
+    cachea durante una hora.
     
     Returns:
         Dict: Estadísticas del sistema
@@ -370,10 +374,10 @@ async def obtener_estadisticas_sistema(
     try:
         logger.info("Obteniendo estadísticas del sistema")
         
-        # Obtener estadísticas del servicio
-        stats = await service.get_system_statistics()
+        # Conteos agregados fuera del event loop
+        stats = await asyncio.to_thread(get_database_stats)
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content={
                 "success": True,
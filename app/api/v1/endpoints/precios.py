@@ -3,26 +3,40 @@ Endpoints de precios con nomenclatura en español
 """
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, Path
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 import time
 
-from fastapi_limiter import limiter
+from fastapi_cache.decorator import cache
+
 from app.core.config import settings
-from app.core.database import get_db
-from app.services.price_service import price_service
-from app.services.product_service import product_service
+from app.core.cache import (
+    CachedResponseCoder,
+    product_cache_key_builder,
+    response_cache_key_builder,
+    with_etag,
+)
+from app.core.database import get_async_db, get_async_read_db
+from app.core.rate_limit import RateLimiter
+from app.api.deps import PriceServiceDep, ProductServiceDep
 from app.schemas.price import (
-    PriceComparisonResponse, BestDealsResponse, PriceHistoryResponse
+    PriceComparisonResponse, BestDealsResponse, PriceHistoryResponse,
+    PriceComparisonBatchRequest, PriceComparisonBatchResponse
 )
 from app.schemas.common import ErrorResponse
 
+# Los endpoints calientes devuelven ORJSONResponse directamente y
+# response_model queda solo para la documentación OpenAPI
 router = APIRouter()
 
 
 @router.get(
     "/comparar/{producto_id}",
     response_model=PriceComparisonResponse,
+    dependencies=[
+        Depends(RateLimiter(times=settings.RATE_LIMIT_PER_MINUTE, seconds=60, scope="comparar"))
+    ],
     summary="Comparar precios de un producto",
     description="Comparar precios de un producto entre diferentes tiendas con análisis detallado",
     responses={
@@ -32,17 +46,16 @@ router = APIRouter()
         500: {"model": ErrorResponse, "description": "Error interno del servidor"}
     }
 )
-@limiter.limit(
-    f"{settings.RATE_LIMIT_PER_MINUTE}/minute",
-    error_message="Demasiadas solicitudes, intenta nuevamente más tarde."
-)
+@cache(expire=120, namespace="prod", coder=CachedResponseCoder, key_builder=product_cache_key_builder)
 async def comparar_precios(
+    price_service: PriceServiceDep,
+    product_service: ProductServiceDep,
     producto_id: UUID = Path(..., description="ID único del producto"),
     lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitud"),
     lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitud"),
     radio_km: float = Query(10.0, ge=0.1, le=50, description="Radio de búsqueda en kilómetros"),
     incluir_mayoristas: bool = Query(False, description="Incluir supermercados mayoristas"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Comparar precios de un producto entre diferentes tiendas.
@@ -66,46 +79,87 @@ async def comparar_precios(
     GET /api/v1/precios/comparar/123e4567-e89b-12d3-a456-426614174000?lat=-33.4489&lon=-70.6693&radio_km=15
     ```
     """
-    try:
-        # Validar coordenadas
-        if (lat is None) != (lon is None):
-            raise HTTPException(
-                status_code=400,
-                detail="Debe proporcionar tanto latitud como longitud, o ninguna"
-            )
-        
-        comparison = price_service.compare_prices(
-            db=db,
-            product_id=producto_id,
-            lat=lat,
-            lon=lon,
-            radio_km=radio_km,
-            incluir_mayoristas=incluir_mayoristas
+    # Validar coordenadas
+    if (lat is None) != (lon is None):
+        raise HTTPException(
+            status_code=400,
+            detail="Debe proporcionar tanto latitud como longitud, o ninguna"
         )
+    
+    comparison = await price_service.compare_prices(
+        db=db,
+        product_id=producto_id,
+        lat=lat,
+        lon=lon,
+        radio_km=radio_km,
+        incluir_mayoristas=incluir_mayoristas
+    )
 
-        # Verificar si se encontró el producto
-        if "error" in comparison:
-            raise HTTPException(
-                status_code=404,
-                detail=comparison["error"]
-            )
+    # Verificar si se encontró el producto
+    if "error" in comparison:
+        raise HTTPException(
+            status_code=404,
+            detail=comparison["error"]
+        )
+
+    # Sugerir marca alternativa cuando no hay stock disponible
+    if not comparison.get("precios"):
+        alternativa = await db.run_sync(product_service.get_alternative_brand, producto_id)
+        if alternativa:
+            comparison["marca_sugerida"] = alternativa
+            comparison["explicacion"] = f"Producto sin stock disponible. Se sugiere marca {alternativa}."
+
+    # Serializar una sola vez con orjson (response_model queda solo para OpenAPI)
+    return with_etag(ORJSONResponse(content=comparison))
 
-        # Sugerir marca alternativa cuando no hay stock disponible
-        if not comparison.get("precios"):
-            alternativa = product_service.get_alternative_brand(db, producto_id)
-            if alternativa:
-                comparison["marca_sugerida"] = alternativa
-                comparison["explicacion"] = f"Producto sin stock disponible. Se sugiere marca {alternativa}."
 
-        return comparison
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+@router.post(
+    "/comparar-batch",
+    response_model=PriceComparisonBatchResponse,
+    summary="Comparar precios de varios productos",
+    description="Comparar precios de hasta 100 productos en una sola solicitud",
+    responses={
+        200: {"description": "Comparación de precios exitosa"},
+        400: {"model": ErrorResponse, "description": "Parámetros inválidos"},
+        500: {"model": ErrorResponse, "description": "Error interno del servidor"}
+    }
+)
+async def comparar_precios_batch(
+    price_service: PriceServiceDep,
+    request: PriceComparisonBatchRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Comparar precios de varios productos (por ejemplo, una lista de compras).
+    
+    **Funcionalidades:**
+    - Una sola consulta de precios para todos los productos
+    - Misma información por producto que `/comparar/{producto_id}`
+    - Lista de IDs no encontrados
+    
+    **Ejemplo de uso:**
+    ```
+    POST /api/v1/precios/comparar-batch
+    {"producto_ids": ["123e4567-e89b-12d3-a456-426614174000"], "lat": -33.4489, "lon": -70.6693}
+    ```
+    """
+    # Validar coordenadas
+    if (request.lat is None) != (request.lon is None):
         raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al comparar precios: {str(e)}"
+            status_code=400,
+            detail="Debe proporcionar tanto latitud como longitud, o ninguna"
         )
+    
+    result = await price_service.compare_prices_batch(
+        db=db,
+        product_ids=request.producto_ids,
+        lat=request.lat,
+        lon=request.lon,
+        radio_km=request.radio_km,
+        incluir_mayoristas=request.incluir_mayoristas
+    )
+    
+    return ORJSONResponse(content=result)
 
 
 @router.get(
@@ -119,13 +173,15 @@ async def comparar_precios(
         500: {"model": ErrorResponse, "description": "Error interno del servidor"}
     }
 )
+@cache(expire=60, coder=CachedResponseCoder, key_builder=response_cache_key_builder)
 async def obtener_mejores_ofertas(
+    price_service: PriceServiceDep,
     min_descuento: float = Query(20.0, ge=0, le=100, description="Descuento mínimo en porcentaje"),
     lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitud"),
     lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitud"),
     radio_km: float = Query(10.0, ge=0.1, le=50, description="Radio de búsqueda en kilómetros"),
     limite: int = Query(50, ge=1, le=100, description="Número máximo de ofertas"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtener las mejores ofertas disponibles.
@@ -150,41 +206,29 @@ async def obtener_mejores_ofertas(
     - Tienda y ubicación
     - Distancia y tiempo estimado
     """
-    try:
-        # Validar coordenadas
-        if (lat is None) != (lon is None):
-            raise HTTPException(
-                status_code=400,
-                detail="Debe proporcionar tanto latitud como longitud, o ninguna"
-            )
-        
-        deals = price_service.get_best_deals(
-            db=db,
-            min_descuento=min_descuento,
-            lat=lat,
-            lon=lon,
-            radio_km=radio_km,
-            limite=limite
-        )
-        
-        # Calcular ahorro total disponible
-        total_savings = sum(deal.get("ahorro", 0) for deal in deals)
-        
-        return {
-            "ofertas": deals,
-            "total_ofertas": len(deals),
-            "descuento_minimo": min_descuento,
-            "ubicacion": {"lat": lat, "lon": lon} if lat and lon else None,
-            "ahorro_total_disponible": total_savings
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    # Validar coordenadas
+    if (lat is None) != (lon is None):
         raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al obtener mejores ofertas: {str(e)}"
+            status_code=400,
+            detail="Debe proporcionar tanto latitud como longitud, o ninguna"
         )
+    
+    deals, total_savings = await price_service.get_best_deals(
+        db=db,
+        min_descuento=min_descuento,
+        lat=lat,
+        lon=lon,
+        radio_km=radio_km,
+        limite=limite
+    )
+    
+    return with_etag(ORJSONResponse(content={
+        "ofertas": deals,
+        "total_ofertas": len(deals),
+        "descuento_minimo": min_descuento,
+        "ubicacion": {"lat": lat, "lon": lon} if lat and lon else None,
+        "ahorro_total_disponible": total_savings
+    }))
 
 
 @router.get(
@@ -200,10 +244,11 @@ async def obtener_mejores_ofertas(
     }
 )
 async def obtener_historial_precios(
+    price_service: PriceServiceDep,
     producto_id: UUID = Path(..., description="ID único del producto"),
     tienda_id: UUID = Path(..., description="ID único de la tienda"),
     dias: int = Query(30, ge=1, le=365, description="Número de días de historial"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtener historial de precios de un producto en una tienda.
@@ -228,30 +273,21 @@ async def obtener_historial_precios(
     - Validación de ofertas actuales
     - Planificación de compras
     """
-    try:
-        history = price_service.get_price_history(
-            db=db,
-            product_id=producto_id,
-            store_id=tienda_id,
-            dias=dias
-        )
-        
-        # Verificar si se encontraron el producto y la tienda
-        if "error" in history:
-            raise HTTPException(
-                status_code=404,
-                detail=history["error"]
-            )
-        
-        return history
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    history = await price_service.get_price_history(
+        db=db,
+        product_id=producto_id,
+        store_id=tienda_id,
+        dias=dias
+    )
+    
+    # Verificar si se encontraron el producto y la tienda
+    if "error" in history:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al obtener historial: {str(e)}"
+            status_code=404,
+            detail=history["error"]
         )
+    
+    return with_etag(ORJSONResponse(content=history))
 
 
 @router.get(
@@ -263,9 +299,11 @@ async def obtener_historial_precios(
         404: {"model": ErrorResponse, "description": "Producto no encontrado"}
     }
 )
+@cache(expire=3600, coder=CachedResponseCoder, key_builder=response_cache_key_builder)
 async def obtener_tendencias_precio(
+    price_service: PriceServiceDep,
     producto_id: UUID = Path(..., description="ID único del producto"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtener tendencias de precio por comuna.
@@ -280,21 +318,19 @@ async def obtener_tendencias_precio(
     - Identificar comunas con mejores precios
     - Análisis geográfico de precios
     - Planificación de rutas de compra
+    
+    **Nota:** Los datos provienen de una vista materializada que se refresca
+    periódicamente, por lo que pueden tener hasta una hora de antigüedad.
     """
-    try:
-        # TODO: Implementar análisis de tendencias
-        # Por ahora retornamos respuesta básica
-        return {
-            "producto_id": str(producto_id),
-            "tendencias_por_comuna": [],
-            "mensaje": "Funcionalidad en desarrollo"
-        }
-        
-    except Exception as e:
+    trends = await price_service.get_price_trends(db=db, product_id=producto_id)
+    
+    if "error" in trends:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al obtener tendencias: {str(e)}"
+            status_code=404,
+            detail=trends["error"]
         )
+    
+    return ORJSONResponse(content=trends)
 
 
 @router.get(
@@ -307,7 +343,7 @@ async def obtener_tendencias_precio(
 )
 async def obtener_alertas_precio(
     activas_solamente: bool = Query(True, description="Solo alertas activas"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtener alertas de precio del usuario.
@@ -320,20 +356,13 @@ async def obtener_alertas_precio(
     
     **Nota:** Requiere autenticación de usuario (funcionalidad futura)
     """
-    try:
-        # TODO: Implementar sistema de alertas
-        # Requiere autenticación de usuario
-        return {
-            "alertas": [],
-            "total": 0,
-            "mensaje": "Sistema de alertas en desarrollo - requiere autenticación"
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al obtener alertas: {str(e)}"
-        )
+    # TODO: Implementar sistema de alertas
+    # Requiere autenticación de usuario
+    return {
+        "alertas": [],
+        "total": 0,
+        "mensaje": "Sistema de alertas en desarrollo - requiere autenticación"
+    }
 
 
 @router.post(
@@ -346,7 +375,7 @@ async def obtener_alertas_precio(
     }
 )
 async def crear_alerta_precio(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Crear alerta de precio.
@@ -359,17 +388,9 @@ async def crear_alerta_precio(
     
     **Nota:** Requiere autenticación de usuario (funcionalidad futura)
     """
-    try:
-        # TODO: Implementar creación de alertas
-        # Requiere autenticación de usuario
-        return {
-            "mensaje": "Sistema de alertas en desarrollo - requiere autenticación",
-            "status": "pending_implementation"
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al crear alerta: {str(e)}"
-        )
-
+    # TODO: Implementar creación de alertas
+    # Requiere autenticación de usuario
+    return {
+        "mensaje": "Sistema de alertas en desarrollo - requiere autenticación",
+        "status": "pending_implementation"
+    }
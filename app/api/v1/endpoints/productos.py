@@ -1,22 +1,34 @@
 """
 Endpoints de productos con nomenclatura en español
 """
+import logging
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request
+from fastapi.responses import ORJSONResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-import time
+from time import perf_counter_ns
+
+from fastapi_cache.decorator import cache
 
 from fastapi_limiter import limiter
 from app.core.config import settings
-from app.core.database import get_db
-from app.services.product_service import product_service
+from app.core.cache import (
+    CachedResponseCoder,
+    response_cache_key_builder,
+    search_cache_key_builder,
+)
+from app.core.database import get_async_db, get_async_read_db
+from app.core.etag import is_not_modified
+from app.api.deps import ProductServiceDep
 from app.schemas.product import (
     ProductSearchResponse, ProductDetailResponse, ProductBarcodeRequest,
     PopularProductsResponse, ProductDiscountsResponse, CategoriesListResponse
 )
 from app.schemas.common import ErrorResponse
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -35,7 +47,9 @@ router = APIRouter()
     f"{settings.RATE_LIMIT_PER_MINUTE}/minute",
     error_message="Demasiadas solicitudes, intenta nuevamente más tarde."
 )
+@cache(expire=30, coder=CachedResponseCoder, key_builder=search_cache_key_builder)
 async def buscar_productos(
+    product_service: ProductServiceDep,
     q: str = Query(
         ..., min_length=1, max_length=100, pattern=r"^[\w\s-]+$", description="Término de búsqueda"
     ),
@@ -46,8 +60,13 @@ async def buscar_productos(
     lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitud"),
     radio_km: float = Query(10.0, ge=0.1, le=50, description="Radio de búsqueda en km"),
     limite: int = Query(50, ge=1, le=100, description="Número máximo de resultados"),
-    skip: int = Query(0, ge=0, description="Número de resultados a omitir"),
-    db: Session = Depends(get_db)
+    skip: int = Query(
+        0, ge=0, deprecated=True, description="Número de resultados a omitir (obsoleto: usar cursor)"
+    ),
+    cursor: Optional[str] = Query(
+        None, max_length=200, description="`siguiente_cursor` de la página anterior"
+    ),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Buscar productos con filtros avanzados.
@@ -58,59 +77,56 @@ async def buscar_productos(
     - **lat/lon**: Coordenadas para búsqueda geográfica
     - **radio_km**: Radio de búsqueda en kilómetros
     - **limite**: Máximo número de resultados
+    - **cursor**: Paginación; usar `siguiente_cursor` de la respuesta anterior
     """
-    try:
-        start_time = time.time()
-        
-        # Validar rango de precios
-        if precio_min is not None and precio_max is not None and precio_min >= precio_max:
-            raise HTTPException(
-                status_code=400,
-                detail="El precio mínimo debe ser menor que el precio máximo"
-            )
-        
-        # Validar coordenadas (ambas o ninguna)
-        if (lat is None) != (lon is None):
-            raise HTTPException(
-                status_code=400,
-                detail="Debe proporcionar tanto latitud como longitud, o ninguna"
-            )
-        
-        # Realizar búsqueda
-        result = product_service.search_products(
-            db=db,
-            search_term=q,
-            category_id=categoria_id,
-            precio_min=precio_min,
-            precio_max=precio_max,
-            lat=lat,
-            lon=lon,
-            radio_km=radio_km,
-            limite=limite,
-            skip=skip
+    start_ns = perf_counter_ns()
+    
+    if skip and not cursor:
+        logger.warning("Parámetro 'skip' obsoleto en /productos/buscar; usar 'cursor'")
+    
+    # Validar rango de precios
+    if precio_min is not None and precio_max is not None and precio_min >= precio_max:
+        raise HTTPException(
+            status_code=400,
+            detail="El precio mínimo debe ser menor que el precio máximo"
         )
-
-        # Sugerir marca alternativa cuando no hay stock disponible
-        for prod in result.get("productos", []):
-            if prod.get("tiendas_disponibles", 0) == 0:
-                alternativa = product_service.get_alternative_brand(db, UUID(prod["id"]))
-                if alternativa:
-                    prod["marca_sugerida"] = alternativa
-                    prod["explicacion"] = f"Producto sin stock disponible. Se sugiere marca {alternativa}."
-
-        # Agregar tiempo de respuesta
-        end_time = time.time()
-        result["tiempo_respuesta_ms"] = int((end_time - start_time) * 1000)
-        
-        return result
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    
+    # Validar coordenadas (ambas o ninguna)
+    if (lat is None) != (lon is None):
         raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al buscar productos: {str(e)}"
+            status_code=400,
+            detail="Debe proporcionar tanto latitud como longitud, o ninguna"
         )
+    
+    # Realizar búsqueda
+    result = await product_service.search_products_async(
+        db=db,
+        search_term=q,
+        category_id=categoria_id,
+        precio_min=precio_min,
+        precio_max=precio_max,
+        lat=lat,
+        lon=lon,
+        radio_km=radio_km,
+        limite=limite,
+        skip=skip,
+        cursor=cursor
+    )
+
+    # Sugerir marca alternativa cuando no hay stock disponible
+    for prod in result.get("productos", []):
+        if prod.get("tiendas_disponibles", 0) == 0:
+            alternativa = await db.run_sync(
+                product_service.get_alternative_brand, UUID(prod["id"])
+            )
+            if alternativa:
+                prod["marca_sugerida"] = alternativa
+                prod["explicacion"] = f"Producto sin stock disponible. Se sugiere marca {alternativa}."
+
+    # Agregar tiempo de respuesta
+    result["tiempo_respuesta_ms"] = (perf_counter_ns() - start_ns) // 1_000_000
+    
+    return ORJSONResponse(content=result)
 
 
 @router.get(
@@ -125,32 +141,31 @@ async def buscar_productos(
     }
 )
 async def obtener_producto(
+    product_service: ProductServiceDep,
+    request: Request,
     producto_id: UUID = Path(..., description="ID único del producto"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtener información detallada de un producto por su ID.
     
     - **producto_id**: ID único del producto
+    
+    Responde `304 Not Modified` si `If-None-Match` coincide con el ETag actual.
     """
-    try:
-        product = product_service.get_product_by_id(db, producto_id)
-        
-        if not product:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Producto con ID {producto_id} no encontrado"
-            )
-        
-        return product
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    entry = await product_service.get_product_with_etag_async(db, producto_id)
+    
+    if not entry:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al obtener producto: {str(e)}"
+            status_code=404,
+            detail=f"Producto con ID {producto_id} no encontrado"
         )
+    
+    product, etag = entry
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    return ORJSONResponse(content=product, headers={"ETag": etag})
 
 
 @router.get(
@@ -162,9 +177,11 @@ async def obtener_producto(
         200: {"description": "Productos populares obtenidos exitosamente"}
     }
 )
+@cache(expire=120, coder=CachedResponseCoder, key_builder=response_cache_key_builder)
 async def obtener_productos_populares(
+    product_service: ProductServiceDep,
     limite: int = Query(20, ge=1, le=100, description="Número máximo de productos"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtener productos más populares.
@@ -174,20 +191,13 @@ async def obtener_productos_populares(
     - Frecuencia de actualización de precios
     - Actividad de búsqueda
     """
-    try:
-        products = product_service.get_popular_products(db, limite)
-        
-        return {
-            "productos": products,
-            "criterio": "popularidad",
-            "limite": limite
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al obtener productos populares: {str(e)}"
-        )
+    products = await product_service.get_popular_products(db, limite)
+    
+    return ORJSONResponse(content={
+        "productos": products,
+        "criterio": "popularidad",
+        "limite": limite
+    })
 
 
 @router.get(
@@ -199,13 +209,15 @@ async def obtener_productos_populares(
         200: {"description": "Productos con descuentos obtenidos exitosamente"}
     }
 )
+@cache(expire=60, coder=CachedResponseCoder, key_builder=response_cache_key_builder)
 async def obtener_productos_con_descuentos(
+    product_service: ProductServiceDep,
     min_descuento: float = Query(10.0, ge=0, le=100, description="Descuento mínimo en porcentaje"),
     lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitud"),
     lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitud"),
     radio_km: float = Query(10.0, ge=0.1, le=50, description="Radio de búsqueda en km"),
     limite: int = Query(50, ge=1, le=100, description="Número máximo de productos"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtener productos con descuentos significativos.
@@ -215,37 +227,28 @@ async def obtener_productos_con_descuentos(
     - **radio_km**: Radio de búsqueda en kilómetros
     - **limite**: Máximo número de productos
     """
-    try:
-        # Validar coordenadas
-        if (lat is None) != (lon is None):
-            raise HTTPException(
-                status_code=400,
-                detail="Debe proporcionar tanto latitud como longitud, o ninguna"
-            )
-        
-        products = product_service.get_products_with_discounts(
-            db=db,
-            min_descuento=min_descuento,
-            lat=lat,
-            lon=lon,
-            radio_km=radio_km,
-            limite=limite
-        )
-        
-        return {
-            "productos": products,
-            "descuento_minimo": min_descuento,
-            "ubicacion": {"lat": lat, "lon": lon} if lat and lon else None,
-            "total_ofertas": len(products)
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    # Validar coordenadas
+    if (lat is None) != (lon is None):
         raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al obtener productos con descuentos: {str(e)}"
+            status_code=400,
+            detail="Debe proporcionar tanto latitud como longitud, o ninguna"
         )
+    
+    products = await product_service.get_products_with_discounts(
+        db=db,
+        min_descuento=min_descuento,
+        lat=lat,
+        lon=lon,
+        radio_km=radio_km,
+        limite=limite
+    )
+    
+    return ORJSONResponse(content={
+        "productos": products,
+        "descuento_minimo": min_descuento,
+        "ubicacion": {"lat": lat, "lon": lon} if lat and lon else None,
+        "total_ofertas": len(products)
+    })
 
 
 @router.post(
@@ -260,32 +263,24 @@ async def obtener_productos_con_descuentos(
     }
 )
 async def buscar_por_codigo_barras(
+    product_service: ProductServiceDep,
     request: ProductBarcodeRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Buscar producto por código de barras.
     
     - **codigo_barras**: Código de barras del producto (8-20 caracteres)
     """
-    try:
-        product = product_service.get_product_by_barcode(db, request.codigo_barras)
-        
-        if not product:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No se encontró producto con código de barras {request.codigo_barras}"
-            )
-        
-        return product
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    product = await product_service.get_product_by_barcode(db, request.codigo_barras)
+    
+    if not product:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al buscar por código de barras: {str(e)}"
+            status_code=404,
+            detail=f"No se encontró producto con código de barras {request.codigo_barras}"
         )
+    
+    return product
 
 
 @router.get(
@@ -297,26 +292,19 @@ async def buscar_por_codigo_barras(
         200: {"description": "Categorías obtenidas exitosamente"}
     }
 )
+@cache(expire=300, coder=CachedResponseCoder, key_builder=response_cache_key_builder)
 async def obtener_categorias(
     incluir_vacias: bool = Query(False, description="Incluir categorías sin productos"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtener lista de categorías de productos.
     
     - **incluir_vacias**: Si incluir categorías que no tienen productos
     """
-    try:
-        # TODO: Implementar servicio de categorías
-        # Por ahora retornamos una respuesta básica
-        return {
-            "categorias": [],
-            "total": 0
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al obtener categorías: {str(e)}"
-        )
-
+    # TODO: Implementar servicio de categorías
+    # Por ahora retornamos una respuesta básica
+    return ORJSONResponse(content={
+        "categorias": [],
+        "total": 0
+    })
@@ -2,13 +2,19 @@
 Endpoints de tiendas con nomenclatura en español y manejo de caracteres especiales
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request
+from fastapi.responses import ORJSONResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-import time
+import re
+from time import perf_counter_ns
 
-from app.core.database import get_db
-from app.services.store_service import store_service
+from fastapi_cache.decorator import cache
+
+from app.core.cache import CachedResponseCoder, response_cache_key_builder
+from app.core.database import get_async_read_db
+from app.core.etag import is_not_modified
+from app.api.deps import StoreServiceDep
 from app.schemas.store import (
     StoreSearchResponse, StoreDetailResponse, NearbyStoresResponse,
     StoreServicesResponse, SupermarketsListResponse
@@ -17,6 +23,18 @@ from app.schemas.common import ErrorResponse
 
 router = APIRouter()
 
+# UUID canónico (8-4-4-4-12) y lista separada por comas de ellos
+_UUID_PATTERN = r"[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}"
+_UUID_RE = re.compile(_UUID_PATTERN)
+_UUID_CSV_RE = re.compile(rf"\s*{_UUID_PATTERN}\s*(?:,\s*{_UUID_PATTERN}\s*)*")
+
+# Servicios aceptados en /con-servicios/buscar (en minúsculas)
+_VALID_SERVICES: frozenset[str] = frozenset({
+    "farmacia", "panaderia", "estacionamiento", "cajero_automatico",
+    "foto_copiado", "envio_dinero", "optica", "veterinaria"
+})
+_VALID_SERVICES_TEXT = ", ".join(sorted(_VALID_SERVICES))
+
 
 @router.get(
     "/buscar-por-comuna",
@@ -30,11 +48,12 @@ router = APIRouter()
     }
 )
 async def buscar_tiendas_por_comuna(
+    store_service: StoreServiceDep,
     termino: str = Query(
         ..., min_length=1, max_length=100, pattern=r"^[\w\s-]+$", description="Término de búsqueda (comuna)"
     ),
     limite: int = Query(50, ge=1, le=100, description="Número máximo de resultados"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Buscar tiendas por comuna con manejo inteligente de caracteres especiales.
@@ -50,26 +69,18 @@ async def buscar_tiendas_por_comuna(
     - "Penalolen" → encuentra tiendas en Peñalolén
     - "Las Condes" → encuentra tiendas en Las Condes
     """
-    try:
-        start_time = time.time()
-        
-        stores = store_service.search_by_commune(db, termino, limite)
-        
-        end_time = time.time()
-        response_time = int((end_time - start_time) * 1000)
-        
-        return {
-            "tiendas": stores,
-            "total": len(stores),
-            "termino_busqueda": termino,
-            "tiempo_respuesta_ms": response_time
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al buscar tiendas: {str(e)}"
-        )
+    start_ns = perf_counter_ns()
+    
+    stores = await store_service.search_by_commune(db, termino, limite)
+    
+    response_time = (perf_counter_ns() - start_ns) // 1_000_000
+    
+    return {
+        "tiendas": stores,
+        "total": len(stores),
+        "termino_busqueda": termino,
+        "tiempo_respuesta_ms": response_time
+    }
 
 
 @router.get(
@@ -84,13 +95,14 @@ async def buscar_tiendas_por_comuna(
     }
 )
 async def obtener_tiendas_cercanas(
+    store_service: StoreServiceDep,
     lat: float = Query(..., ge=-90, le=90, description="Latitud"),
     lon: float = Query(..., ge=-180, le=180, description="Longitud"),
     radio_km: float = Query(10.0, ge=0.1, le=50, description="Radio de búsqueda en kilómetros"),
     tipo_supermercado: Optional[str] = Query(None, description="Tipo de supermercado (retail/mayorista)"),
     abierto_ahora: bool = Query(False, description="Solo tiendas abiertas ahora"),
     limite: int = Query(50, ge=1, le=100, description="Número máximo de resultados"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtener tiendas cercanas a una ubicación.
@@ -108,42 +120,33 @@ async def obtener_tiendas_cercanas(
     - **tipo_supermercado**: "retail" o "mayorista"
     - **abierto_ahora**: Filtrar solo tiendas abiertas
     """
-    try:
-        # Validar tipo de supermercado
-        if tipo_supermercado and tipo_supermercado not in ["retail", "mayorista"]:
-            raise HTTPException(
-                status_code=400,
-                detail="tipo_supermercado debe ser 'retail' o 'mayorista'"
-            )
-        
-        stores = store_service.get_nearby_stores(
-            db=db,
-            lat=lat,
-            lon=lon,
-            radio_km=radio_km,
-            tipo_supermercado=tipo_supermercado,
-            abierto_ahora=abierto_ahora,
-            limite=limite
-        )
-        
-        return {
-            "tiendas": stores,
-            "total": len(stores),
-            "ubicacion_busqueda": {"lat": lat, "lon": lon},
-            "radio_km": radio_km,
-            "filtros_aplicados": {
-                "tipo_supermercado": tipo_supermercado,
-                "abierto_ahora": abierto_ahora
-            }
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    # Validar tipo de supermercado
+    if tipo_supermercado and tipo_supermercado not in ["retail", "mayorista"]:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al obtener tiendas cercanas: {str(e)}"
+            status_code=400,
+            detail="tipo_supermercado debe ser 'retail' o 'mayorista'"
         )
+    
+    stores = await store_service.get_nearby_stores(
+        db=db,
+        lat=lat,
+        lon=lon,
+        radio_km=radio_km,
+        tipo_supermercado=tipo_supermercado,
+        abierto_ahora=abierto_ahora,
+        limite=limite
+    )
+    
+    return {
+        "tiendas": stores,
+        "total": len(stores),
+        "ubicacion_busqueda": {"lat": lat, "lon": lon},
+        "radio_km": radio_km,
+        "filtros_aplicados": {
+            "tipo_supermercado": tipo_supermercado,
+            "abierto_ahora": abierto_ahora
+        }
+    }
 
 
 @router.get(
@@ -158,8 +161,10 @@ async def obtener_tiendas_cercanas(
     }
 )
 async def obtener_tienda(
+    store_service: StoreServiceDep,
+    request: Request,
     tienda_id: UUID = Path(..., description="ID único de la tienda"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtener información detallada de una tienda.
@@ -171,25 +176,22 @@ async def obtener_tienda(
     - Horarios de atención
     - Servicios disponibles
     - Información de contacto
+    
+    Responde `304 Not Modified` si `If-None-Match` coincide con el ETag actual.
     """
-    try:
-        store = store_service.get_store_by_id(db, tienda_id)
-        
-        if not store:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Tienda con ID {tienda_id} no encontrada"
-            )
-        
-        return store
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    entry = await store_service.get_store_with_etag_async(db, tienda_id)
+    
+    if not entry:
         raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al obtener tienda: {str(e)}"
+            status_code=404,
+            detail=f"Tienda con ID {tienda_id} no encontrada"
         )
+    
+    store, etag = entry
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    return ORJSONResponse(content=store, headers={"ETag": etag})
 
 
 @router.get(
@@ -203,12 +205,13 @@ async def obtener_tienda(
     }
 )
 async def obtener_tiendas_con_productos(
+    store_service: StoreServiceDep,
     producto_ids: str = Query(..., description="IDs de productos separados por comas"),
     lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitud"),
     lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitud"),
     radio_km: float = Query(10.0, ge=0.1, le=50, description="Radio de búsqueda"),
     limite: int = Query(50, ge=1, le=100, description="Número máximo de resultados"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtener tiendas que tienen productos específicos disponibles.
@@ -224,49 +227,40 @@ async def obtener_tiendas_con_productos(
     - **lat/lon**: Coordenadas para filtro geográfico
     - **radio_km**: Radio de búsqueda
     """
-    try:
-        # Parsear IDs de productos
-        try:
-            product_uuids = [UUID(pid.strip()) for pid in producto_ids.split(",")]
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail="Formato de IDs de productos inválido. Use UUIDs separados por comas."
-            )
-        
-        # Validar coordenadas
-        if (lat is None) != (lon is None):
-            raise HTTPException(
-                status_code=400,
-                detail="Debe proporcionar tanto latitud como longitud, o ninguna"
-            )
-        
-        stores = store_service.get_nearby_stores(
-            db=db,
-            lat=lat,
-            lon=lon,
-            radio_km=radio_km,
-            producto_ids=product_uuids,
-            limite=limite
+    # Parsear IDs de productos: una sola validación de la lista completa
+    if not _UUID_CSV_RE.fullmatch(producto_ids):
+        raise HTTPException(
+            status_code=400,
+            detail="Formato de IDs de productos inválido. Use UUIDs separados por comas."
         )
-        
-        return {
-            "tiendas": stores,
-            "total": len(stores),
-            "ubicacion_busqueda": {"lat": lat, "lon": lon} if lat and lon else None,
-            "radio_km": radio_km,
-            "filtros_aplicados": {
-                "productos_solicitados": len(product_uuids)
-            }
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    # Deduplicar preservando el orden
+    product_uuids = list(map(UUID, dict.fromkeys(pid.lower() for pid in _UUID_RE.findall(producto_ids))))
+    
+    # Validar coordenadas
+    if (lat is None) != (lon is None):
         raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al obtener tiendas con productos: {str(e)}"
+            status_code=400,
+            detail="Debe proporcionar tanto latitud como longitud, o ninguna"
         )
+    
+    stores = await store_service.get_nearby_stores(
+        db=db,
+        lat=lat,
+        lon=lon,
+        radio_km=radio_km,
+        producto_ids=product_uuids,
+        limite=limite
+    )
+    
+    return {
+        "tiendas": stores,
+        "total": len(stores),
+        "ubicacion_busqueda": {"lat": lat, "lon": lon} if lat and lon else None,
+        "radio_km": radio_km,
+        "filtros_aplicados": {
+            "productos_solicitados": len(product_uuids)
+        }
+    }
 
 
 @router.get(
@@ -280,12 +274,13 @@ async def obtener_tiendas_con_productos(
     }
 )
 async def buscar_tiendas_con_servicios(
+    store_service: StoreServiceDep,
     servicios: str = Query(..., description="Servicios separados por comas"),
     lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitud"),
     lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitud"),
     radio_km: float = Query(10.0, ge=0.1, le=50, description="Radio de búsqueda"),
     limite: int = Query(50, ge=1, le=100, description="Número máximo de resultados"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Buscar tiendas que ofrecen servicios específicos.
@@ -303,54 +298,40 @@ async def buscar_tiendas_con_servicios(
     - servicios="farmacia,panaderia" → tiendas con farmacia Y panadería
     - servicios="estacionamiento" → tiendas con estacionamiento
     """
-    try:
-        # Parsear servicios
-        services_list = [s.strip().lower() for s in servicios.split(",")]
-        
-        # Validar servicios
-        valid_services = [
-            "farmacia", "panaderia", "estacionamiento", "cajero_automatico",
-            "foto_copiado", "envio_dinero", "optica", "veterinaria"
-        ]
-        
-        invalid_services = [s for s in services_list if s not in valid_services]
-        if invalid_services:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Servicios inválidos: {', '.join(invalid_services)}. "
-                       f"Servicios válidos: {', '.join(valid_services)}"
-            )
-        
-        # Validar coordenadas
-        if (lat is None) != (lon is None):
-            raise HTTPException(
-                status_code=400,
-                detail="Debe proporcionar tanto latitud como longitud, o ninguna"
-            )
-        
-        stores = store_service.get_stores_with_services(
-            db=db,
-            servicios=services_list,
-            lat=lat,
-            lon=lon,
-            radio_km=radio_km,
-            limite=limite
+    # Parsear servicios
+    services_list = [s.strip().lower() for s in servicios.split(",")]
+    
+    # Validar servicios
+    invalid_services = [s for s in services_list if s not in _VALID_SERVICES]
+    if invalid_services:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Servicios inválidos: {', '.join(invalid_services)}. "
+                   f"Servicios válidos: {_VALID_SERVICES_TEXT}"
         )
-        
-        return {
-            "tiendas": stores,
-            "servicios_solicitados": services_list,
-            "total": len(stores),
-            "ubicacion": {"lat": lat, "lon": lon} if lat and lon else None
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    
+    # Validar coordenadas
+    if (lat is None) != (lon is None):
         raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al buscar tiendas con servicios: {str(e)}"
+            status_code=400,
+            detail="Debe proporcionar tanto latitud como longitud, o ninguna"
         )
+    
+    stores = await store_service.get_stores_with_services(
+        db=db,
+        servicios=services_list,
+        lat=lat,
+        lon=lon,
+        radio_km=radio_km,
+        limite=limite
+    )
+    
+    return {
+        "tiendas": stores,
+        "servicios_solicitados": services_list,
+        "total": len(stores),
+        "ubicacion": {"lat": lat, "lon": lon} if lat and lon else None
+    }
 
 
 @router.get(
@@ -362,10 +343,11 @@ async def buscar_tiendas_con_servicios(
         200: {"description": "Supermercados obtenidos exitosamente"}
     }
 )
+@cache(expire=300, coder=CachedResponseCoder, key_builder=response_cache_key_builder)
 async def obtener_supermercados(
     tipo: Optional[str] = Query(None, description="Tipo de supermercado (retail/mayorista)"),
     activos_solamente: bool = Query(True, description="Solo supermercados activos"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Obtener lista de supermercados disponibles.
@@ -377,17 +359,9 @@ async def obtener_supermercados(
     - Número de tiendas
     - Políticas de compra mínima
     """
-    try:
-        # TODO: Implementar servicio de supermercados
-        # Por ahora retornamos una respuesta básica
-        return {
-            "supermercados": [],
-            "total": 0
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error interno al obtener supermercados: {str(e)}"
-        )
-
+    # TODO: Implementar servicio de supermercados
+    # Por ahora retornamos una respuesta básica
+    return ORJSONResponse(content={
+        "supermercados": [],
+        "total": 0
+    })
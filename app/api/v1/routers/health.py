@@ -1,18 +1,24 @@
 import asyncio
+import time
+from typing import Optional, Tuple
 
 from fastapi import APIRouter
 
 from app.core.cache import cache
-from app.core.database import check_database_connection
+from app.core.database import check_database_connection_async
 
 router = APIRouter(tags=["Health"])
 
+# Resultado del último chequeo: los probes del balanceador llegan varias
+# veces por segundo y no deben traducirse en consultas a DB/Redis cada vez
+HEALTH_CACHE_TTL = 1.0
+_cache: Optional[Tuple[float, dict]] = None
+_lock = asyncio.Lock()
+
 
 async def check_db(timeout: float = 1.0) -> bool:
     try:
-        return await asyncio.wait_for(
-            asyncio.to_thread(check_database_connection), timeout
-        )
+        return await asyncio.wait_for(check_database_connection_async(), timeout)
     except Exception:
         return False
 
@@ -30,10 +36,21 @@ async def check_redis(timeout: float = 1.0) -> bool:
 
 @router.get("/health")
 async def health() -> dict:
-    db_ok, redis_ok = await asyncio.gather(check_db(), check_redis())
-    status = "ok" if db_ok and redis_ok else "degraded"
-    return {
-        "status": status,
-        "database": "ok" if db_ok else "error",
-        "redis": "ok" if redis_ok else "error",
-    }
+    global _cache
+    if _cache and time.monotonic() - _cache[0] < HEALTH_CACHE_TTL:
+        return _cache[1]
+
+    async with _lock:
+        # Otro request pudo refrescar el resultado mientras se esperaba el lock
+        if _cache and time.monotonic() - _cache[0] < HEALTH_CACHE_TTL:
+            return _cache[1]
+
+        db_ok, redis_ok = await asyncio.gather(check_db(), check_redis())
+        status = "ok" if db_ok and redis_ok else "degraded"
+        result = {
+            "status": status,
+            "database": "ok" if db_ok else "error",
+            "redis": "ok" if redis_ok else "error",
+        }
+        _cache = (time.monotonic(), result)
+        return result
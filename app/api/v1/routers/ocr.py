@@ -1,13 +1,12 @@
 """Router OCR para extraer lista de productos desde imágenes"""
+import asyncio
 import logging
 import time
 from typing import List
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, File, HTTPException, UploadFile
 
-from app.core.database import get_db
-from app.services.ocr_service import ocr_service
+from app.api.deps import OCRServiceDep
 
 logger = logging.getLogger(__name__)
 
@@ -16,19 +15,28 @@ router = APIRouter()
 
 @router.post("/lista")
 async def obtener_lista_ocr(
-    images: List[UploadFile] = File(...),
-    db: Session = Depends(get_db)
+    ocr_service: OCRServiceDep,
+    images: List[UploadFile] = File(...)
 ):
     """Procesa imágenes y retorna lista de productos detectados"""
-    start_time = time.time()
-    productos = []
+    start_time = time.perf_counter()
+
+    async def _procesar(image: UploadFile) -> List[dict]:
+        # UploadFile ya está respaldado por un SpooledTemporaryFile:
+        # se pasa el archivo directamente en lugar de copiarlo a bytes
+        await image.seek(0)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            ocr_service.executor, ocr_service.extract_products_isolated, image.file
+        )
+
     try:
-        for image in images:
-            content = await image.read()
-            productos.extend(ocr_service.extract_products_from_image(content, db))
+        # OCR de cada imagen en paralelo; gather conserva el orden de entrada
+        resultados = await asyncio.gather(*(_procesar(image) for image in images))
+        productos = [producto for lote in resultados for producto in lote]
         return {"productos": productos}
     except Exception as exc:
         logger.error("Error en endpoint OCR: %s", exc)
         raise HTTPException(status_code=500, detail="Error procesando imágenes")
     finally:
-        logger.info("Procesamiento OCR completado en %.3fs", time.time() - start_time)
+        logger.info("Procesamiento OCR completado en %.3fs", time.perf_counter() - start_time)
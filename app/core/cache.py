@@ -1,137 +1,341 @@
 """Configuración de cache Redis para Cuanto Cuesta"""
-import json
-from typing import Any, Optional
-
+from collections import OrderedDict
+import fnmatch
+import functools
+import hashlib
+import inspect
+import re
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi.responses import Response
+from fastapi_cache.coder import JsonCoder
+import orjson
 from redis import asyncio as aioredis
 import structlog
 from redis.exceptions import RedisError
+from redis.utils import HIREDIS_AVAILABLE
 
 from app.core.config import settings
 
 logger = structlog.get_logger(__name__)
 
+# Claves no-str (p. ej. enteros) y tipos numpy se serializan como en json.dumps
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Claves por iteración de SCAN y por UNLINK en delete_pattern
+_SCAN_BATCH = 500
+
+# Prefijo de las respuestas HTTP que guarda fastapi-cache (FastAPICache.init)
+HTTP_CACHE_PREFIX = "cch"
+
+
+# Valores serializados sobre este tamaño se guardan comprimidos con zlib
+_COMPRESS_MIN_BYTES = 1024
+# Primer byte de un stream zlib; ningún documento JSON empieza con "x", así
+# que las entradas sin comprimir (y las previas a la compresión) se leen igual
+_ZLIB_HEADER = 0x78
+
+
+def _serialize(value: Any) -> bytes:
+    """Serializar un valor para guardarlo en Redis"""
+    blob = orjson.dumps(value, default=str, option=_ORJSON_OPTIONS)
+    if len(blob) > _COMPRESS_MIN_BYTES:
+        return zlib.compress(blob, 1)
+    return blob
+
+
+def _deserialize(blob: bytes) -> Any:
+    """Inverso de :func:`_serialize`"""
+    if blob[0] == _ZLIB_HEADER:
+        blob = zlib.decompress(blob)
+    return orjson.loads(blob)
+
+
+def _redis_glob_to_fnmatch(pattern: str) -> str:
+    """Traducir los escapes ``\\x`` de un patrón de Redis a la forma ``[x]`` de fnmatch"""
+    parts = []
+    chars = iter(pattern)
+    for char in chars:
+        if char == "\\":
+            parts.append("[" + next(chars, "\\") + "]")
+        else:
+            parts.append(char)
+    return "".join(parts)
+
+
+_GLOB_SPECIAL = frozenset("*?[]\\")
+
+
+def escape_glob(value: Any) -> str:
+    """Escapar un valor para que un patrón de SCAN lo trate como literal"""
+    return "".join(f"\\{char}" if char in _GLOB_SPECIAL else char for char in str(value))
+
+
+class _LocalTTLCache:
+    """
+    LRU en memoria del proceso con expiración por entrada.
+
+    Guarda los bytes serializados: cada acierto se decodifica a un objeto
+    nuevo, así los llamadores pueden modificar el resultado sin afectar a
+    otros requests.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        # Nunca más allá del TTL que tendrá la clave en Redis
+        ttl = min(ttl, self.ttl) if ttl else self.ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def pop_matching(self, pattern: str) -> None:
+        matches = re.compile(fnmatch.translate(_redis_glob_to_fnmatch(pattern))).match
+        for key in [k for k in self._data if matches(k)]:
+            del self._data[key]
+
 
 class RedisCache:
-    """Cliente Redis asíncrono para cache"""
+    """
+    Cliente Redis asíncrono para cache.
+
+    La conexión se abre en el arranque de la app (``lifespan``); si Redis no
+    está disponible las operaciones devuelven su valor por defecto (miss) y
+    el health check reintenta la conexión.
+
+    Con ``CACHE_L1_ENABLED`` las lecturas pasan primero por un LRU local de
+    ``CACHE_L1_TTL`` segundos; escrituras y borrados de este proceso lo
+    actualizan, los de otros procesos se ven al expirar la entrada local.
+    """
 
     def __init__(self):
         self.redis_client: aioredis.Redis | None = None
+        self._pool: aioredis.ConnectionPool | None = None
+        self._local = (
+            _LocalTTLCache(settings.CACHE_L1_MAXSIZE, settings.CACHE_L1_TTL)
+            if settings.CACHE_L1_ENABLED else None
+        )
 
     async def _connect(self) -> None:
-        """Conectar a Redis"""
+        """
+        Conectar a Redis.
+
+        El pool se crea una sola vez y se reutiliza en cada reconexión, con
+        un tope de ``REDIS_MAX_CONNECTIONS`` sockets; si se agota, la
+        operación falla como un error de Redis (un miss de cache).
+        """
         try:
-            self.redis_client = aioredis.from_url(
-                settings.REDIS_URL,
-                encoding="utf-8",
-                decode_responses=True,
-                socket_connect_timeout=5,
-                socket_timeout=5,
-                retry_on_timeout=True,
-            )
-            await self.redis_client.ping()
-            logger.info("Conexión a Redis exitosa")
+            if self._pool is None:
+                self._pool = aioredis.ConnectionPool.from_url(
+                    settings.REDIS_URL,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    socket_connect_timeout=5,
+                    socket_timeout=5,
+                    socket_keepalive=True,
+                    health_check_interval=30,
+                    retry_on_timeout=True,
+                )
+            client = aioredis.Redis(connection_pool=self._pool)
+            await client.ping()
+            self.redis_client = client
+            logger.info("Conexión a Redis exitosa", hiredis=HIREDIS_AVAILABLE)
         except RedisError:
             logger.exception("Error conectando a Redis")
             self.redis_client = None
 
+    async def close(self) -> None:
+        """Cerrar las conexiones del pool"""
+        self.redis_client = None
+        if self._pool is not None:
+            await self._pool.disconnect()
+            self._pool = None
+
     async def get(self, key: str) -> Optional[Any]:
         """Obtener valor del cache"""
-        if not self.redis_client:
-            await self._connect()
-        if not self.redis_client:
+        if self._local:
+            local_value = self._local.get(key)
+            if local_value is not None:
+                return _deserialize(local_value)
+
+        client = self.redis_client
+        if client is None:
             return None
 
         try:
-            value = await self.redis_client.get(key)
+            value = await client.get(key)
             if value:
-                return json.loads(value)
+                result = _deserialize(value)
+                if self._local:
+                    self._local.set(key, value)
+                return result
             return None
-        except (RedisError, json.JSONDecodeError):
+        except (RedisError, orjson.JSONDecodeError, zlib.error):
             logger.exception("Error obteniendo del cache", key=key)
             return None
 
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         """Establecer valor en el cache"""
-        if not self.redis_client:
-            await self._connect()
-        if not self.redis_client:
+        client = self.redis_client
+        if client is None:
             return False
 
         try:
-            serialized_value = json.dumps(value, default=str)
+            serialized_value = _serialize(value)
             if ttl:
-                await self.redis_client.setex(key, ttl, serialized_value)
+                await client.setex(key, ttl, serialized_value)
             else:
-                await self.redis_client.set(key, serialized_value)
+                await client.set(key, serialized_value)
+            if self._local:
+                self._local.set(key, serialized_value, ttl)
             return True
-        except (RedisError, json.JSONDecodeError):
+        except (RedisError, orjson.JSONEncodeError):
             logger.exception("Error estableciendo en cache", key=key)
             return False
 
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Obtener varios valores en un solo round-trip; ``None`` para los ausentes"""
+        if not keys:
+            return []
+        values = [self._local.get(key) for key in keys] if self._local else [None] * len(keys)
+        missing = [i for i, value in enumerate(values) if value is None]
+
+        client = self.redis_client
+        if missing and client is not None:
+            try:
+                fetched = await client.mget([keys[i] for i in missing])
+            except RedisError:
+                logger.exception("Error obteniendo claves del cache", keys=len(missing))
+                fetched = [None] * len(missing)
+            for i, value in zip(missing, fetched):
+                if value:
+                    values[i] = value
+                    if self._local:
+                        self._local.set(keys[i], value)
+
+        try:
+            return [_deserialize(value) if value else None for value in values]
+        except (orjson.JSONDecodeError, zlib.error):
+            logger.exception("Error decodificando claves del cache", keys=len(keys))
+            return [None] * len(keys)
+
+    async def mset(self, items: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """Establecer varios valores con un pipeline (un solo round-trip)"""
+        if not items:
+            return True
+        client = self.redis_client
+        if client is None:
+            return False
+
+        try:
+            serialized = {key: _serialize(value) for key, value in items.items()}
+            async with client.pipeline(transaction=False) as pipe:
+                for key, value in serialized.items():
+                    pipe.set(key, value, ex=ttl)
+                await pipe.execute()
+            if self._local:
+                for key, value in serialized.items():
+                    self._local.set(key, value, ttl)
+            return True
+        except (RedisError, orjson.JSONEncodeError):
+            logger.exception("Error estableciendo claves en cache", keys=len(items))
+            return False
+
     async def delete(self, key: str) -> bool:
         """Eliminar valor del cache"""
-        if not self.redis_client:
-            await self._connect()
-        if not self.redis_client:
+        if self._local:
+            self._local.pop(key)
+        client = self.redis_client
+        if client is None:
             return False
 
         try:
-            return bool(await self.redis_client.delete(key))
+            return bool(await client.delete(key))
         except RedisError:
             logger.exception("Error eliminando del cache", key=key)
             return False
 
     async def delete_pattern(self, pattern: str) -> int:
-        """Eliminar claves que coincidan con el patrón"""
-        if not self.redis_client:
-            await self._connect()
-        if not self.redis_client:
+        """
+        Eliminar claves que coincidan con el patrón.
+
+        Recorre el keyspace con SCAN (sin bloquear Redis como KEYS) y borra
+        por lotes con UNLINK, que libera la memoria en segundo plano.
+        """
+        if self._local:
+            self._local.pop_matching(pattern)
+        client = self.redis_client
+        if client is None:
             return 0
 
         try:
-            keys = await self.redis_client.keys(pattern)
-            if keys:
-                return await self.redis_client.delete(*keys)
-            return 0
+            deleted = 0
+            batch = []
+            async for key in client.scan_iter(match=pattern, count=_SCAN_BATCH):
+                batch.append(key)
+                if len(batch) >= _SCAN_BATCH:
+                    deleted += await client.unlink(*batch)
+                    batch.clear()
+            if batch:
+                deleted += await client.unlink(*batch)
+            return deleted
         except RedisError:
             logger.exception("Error eliminando patrón", pattern=pattern)
             return 0
 
     async def exists(self, key: str) -> bool:
         """Verificar si existe una clave"""
-        if not self.redis_client:
-            await self._connect()
-        if not self.redis_client:
+        client = self.redis_client
+        if client is None:
             return False
 
         try:
-            return bool(await self.redis_client.exists(key))
+            return bool(await client.exists(key))
         except RedisError:
             logger.exception("Error verificando existencia", key=key)
             return False
 
     async def increment(self, key: str, amount: int = 1) -> Optional[int]:
         """Incrementar valor numérico"""
-        if not self.redis_client:
-            await self._connect()
-        if not self.redis_client:
+        client = self.redis_client
+        if client is None:
             return None
 
         try:
-            return await self.redis_client.incrby(key, amount)
+            return await client.incrby(key, amount)
         except RedisError:
             logger.exception("Error incrementando", key=key)
             return None
 
     async def expire(self, key: str, ttl: int) -> bool:
         """Establecer TTL para una clave"""
-        if not self.redis_client:
-            await self._connect()
-        if not self.redis_client:
+        client = self.redis_client
+        if client is None:
             return False
 
         try:
-            return bool(await self.redis_client.expire(key, ttl))
+            return bool(await client.expire(key, ttl))
         except RedisError:
             logger.exception("Error estableciendo TTL", key=key)
             return False
@@ -146,6 +350,70 @@ def get_cache() -> RedisCache:
     return cache
 
 
+def sql_cache(ttl: int, coord_precision: int = 3, product_arg: Optional[str] = None):
+    """
+    Decorador de cache para métodos asíncronos de servicio ``(self, db, ...)``.
+
+    La clave es un hash de (nombre calificado, argumentos) sin la sesión de
+    base de datos; ``lat``/``lon`` se redondean a ``coord_precision`` decimales
+    para que usuarios del mismo sector compartan resultados. Los resultados
+    con clave ``"error"`` no se cachean.
+
+    Si se indica ``product_arg``, la clave queda bajo ``sql_cache:prod:<id>``
+    para poder invalidarla con :func:`invalidate_product_prices`.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(self, db, *args, **kwargs):
+            bound = signature.bind(self, db, *args, **kwargs)
+            bound.apply_defaults()
+            params = {
+                k: v for k, v in bound.arguments.items() if k not in ("self", "db")
+            }
+            for coord in ("lat", "lon"):
+                if params.get(coord) is not None:
+                    params[coord] = round(params[coord], coord_precision)
+
+            digest = hashlib.md5(repr(sorted(params.items())).encode()).hexdigest()
+            scope = f"prod:{params[product_arg]}:" if product_arg else ""
+            cache_key = f"sql_cache:{scope}{func.__qualname__}:{digest}"
+
+            cached_result = await cache.get(cache_key)
+            if cached_result is not None:
+                return cached_result
+
+            result = await func(self, db, *args, **kwargs)
+            if not (isinstance(result, dict) and "error" in result):
+                await cache.set(cache_key, result, ttl)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+async def invalidate_product_prices(product_id: str) -> None:
+    """
+    Eliminar del cache todo lo derivado de los precios de un producto:
+    resultados de ``sql_cache(product_arg=...)`` y respuestas HTTP cacheadas
+    en el namespace ``prod:<id>``.
+
+    Ambos se borran con SCAN/UNLINK (:meth:`RedisCache.delete_pattern`);
+    ``FastAPICache.clear`` ejecuta KEYS sobre todo el keyspace.
+    """
+    product = escape_glob(product_id)
+    await cache.delete_pattern(f"sql_cache:prod:{product}:*")
+    await cache.delete_pattern(f"{HTTP_CACHE_PREFIX}:prod:{product}:*")
+
+
+async def invalidate_all_product_prices() -> None:
+    """Eliminar el cache de precios de todos los productos"""
+    await cache.delete_pattern("sql_cache:prod:*")
+    await cache.delete_pattern(f"{HTTP_CACHE_PREFIX}:prod:*")
+
+
 # Funciones de utilidad para cache específico
 def cache_product_key(product_id: str) -> str:
     """Generar clave de cache para producto"""
@@ -163,7 +431,127 @@ def cache_price_key(product_id: str, store_id: str) -> str:
 
 
 def cache_search_key(query: str, filters: dict) -> str:
-    """Generar clave de cache para búsqueda"""
-    filter_str = "_".join([f"{k}:{v}" for k, v in sorted(filters.items())])
-    return f"search:{query}:{filter_str}"
-
+    """
+    Generar clave de cache para búsqueda: hash de largo fijo sobre
+    ``(query, filtros)`` serializados de forma canónica, sin colisiones por
+    valores que contengan ``:`` o ``_``.
+    """
+    canonical = orjson.dumps([query, filters], default=str, option=orjson.OPT_SORT_KEYS)
+    return f"search:{hashlib.blake2b(canonical, digest_size=16).hexdigest()}"
+
+
+# Soporte para cache de respuestas HTTP (fastapi-cache)
+def etag_for(body: bytes) -> str:
+    """ETag débil y estable entre procesos para un cuerpo de respuesta."""
+    return f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def version_etag(resource_id: str, updated_at: Optional[datetime]) -> str:
+    """ETag débil derivado de ``(id, updated_at)``, sin hashear el cuerpo."""
+    stamp = int(updated_at.timestamp()) if updated_at else 0
+    return f'W/"{resource_id}-{stamp}"'
+
+
+def with_etag(response: Response) -> Response:
+    """Agregar el header ``ETag`` calculado sobre el cuerpo ya serializado."""
+    response.headers["ETag"] = etag_for(response.body)
+    return response
+
+
+class CachedResponseCoder(JsonCoder):
+    """
+    Coder para respuestas ya serializadas.
+
+    Guarda el cuerpo JSON tal cual y en un acierto lo devuelve como
+    ``Response`` sin volver a decodificar ni validar el payload.
+    Si la respuesta trae ``ETag`` se guarda como primera línea para que los
+    aciertos lo devuelvan sin volver a hashear el cuerpo.
+    Acepta el valor en bytes (cliente compartido) o ya decodificado a str.
+    """
+
+    @classmethod
+    def encode(cls, value):
+        body = super().encode(value)
+        etag = value.headers.get("etag") if isinstance(value, Response) else None
+        if etag:
+            return etag.encode() + b"\n" + body
+        return body
+
+    @classmethod
+    def decode(cls, value):
+        if isinstance(value, str):
+            value = value.encode()
+        _, body = cls._split_etag(value)
+        return super().decode(body)
+
+    @classmethod
+    def decode_as_type(cls, value, *, type_=None):
+        if isinstance(value, str):
+            value = value.encode()
+        etag, body = cls._split_etag(value)
+        headers = {"ETag": etag} if etag else None
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    @staticmethod
+    def _split_etag(value: bytes):
+        if value.startswith(b'W/"'):
+            etag, _, body = value.partition(b"\n")
+            return etag.decode(), body
+        return None, value
+
+
+_KEY_PARAM_TYPES = (str, int, float, bool, UUID, type(None))
+
+
+def response_cache_key_builder(
+    func,
+    namespace: str = "",
+    *,
+    request=None,
+    response=None,
+    args=(),
+    kwargs=None,
+    coord_precision: int = 3,
+) -> str:
+    """
+    Clave de cache para respuestas de endpoints.
+
+    Solo los parámetros simples forman parte de la clave (se ignoran sesiones
+    y servicios inyectados) y las coordenadas se cuantizan a
+    ``coord_precision`` decimales (3 ≈ 110 m) para aumentar la tasa de
+    aciertos.
+    """
+    params = {
+        k: v for k, v in (kwargs or {}).items()
+        if isinstance(v, _KEY_PARAM_TYPES)
+    }
+    for coord in ("lat", "lon"):
+        if params.get(coord) is not None:
+            params[coord] = round(params[coord], coord_precision)
+    query = ":".join(f"{k}={v}" for k, v in sorted(params.items()))
+    return f"{namespace}:{func.__name__}:{query}"
+
+
+def product_cache_key_builder(
+    func,
+    namespace: str = "",
+    *,
+    request=None,
+    response=None,
+    args=(),
+    kwargs=None,
+) -> str:
+    """
+    Igual que :func:`response_cache_key_builder` pero anteponiendo
+    ``producto_id``; con ``namespace="prod"`` las claves quedan bajo
+    ``prod:<id>`` y se invalidan por producto.
+    """
+    producto_id = (kwargs or {}).get("producto_id")
+    key = response_cache_key_builder(
+        func, namespace, request=request, response=response, args=args, kwargs=kwargs
+    )
+    return key.replace(f"{namespace}:", f"{namespace}:{producto_id}:", 1)
+
+
+# Búsquedas: coordenadas a 2 decimales (~1 km), más aciertos entre vecinos
+search_cache_key_builder = functools.partial(response_cache_key_builder, coord_precision=2)
@@ -11,8 +11,45 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
 
+    # Pool de conexiones por proceso. Con N workers el total es
+    # N × (DB_POOL_SIZE + DB_MAX_OVERFLOW) por engine (síncrono y asíncrono
+    # cuentan por separado) y debe quedar bajo max_connections de Postgres
+    # menos las conexiones reservadas. DB_POOL_TIMEOUT corto: si el pool se
+    # agota el request falla rápido en vez de encolarse.
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 5
+    DB_POOL_RECYCLE: int = 1800
+    # Tope por sentencia para las consultas OLTP (ms). Las tareas de
+    # mantenimiento lo desactivan en su propia conexión.
+    DB_STATEMENT_TIMEOUT_MS: int = 5000
+    # Procesos worker (misma variable que usan uvicorn/gunicorn). La CLI de
+    # uvicorn la lee directamente; el runner de app.main la pasa como workers.
+    # Cachés en memoria (L1, health) y start_time quedan por worker.
+    WEB_CONCURRENCY: int = 1
+    # Límites de uvicorn por worker: sobre UVICORN_LIMIT_CONCURRENCY
+    # conexiones/tareas activas responde 503 en vez de encolar sin tope.
+    # UVICORN_LIMIT_MAX_REQUESTS recicla el proceso tras N requests; uvicorn
+    # no relanza workers caídos, así que solo sirve bajo un supervisor que lo
+    # haga (None = desactivado).
+    UVICORN_LIMIT_CONCURRENCY: int | None = 256
+    UVICORN_LIMIT_MAX_REQUESTS: int | None = None
+    # PgBouncer en modo transacción (p. ej. el pooler de Supabase en 6543):
+    # sin pool propio (NullPool) para no duplicar el pooling. None = detectar
+    # por el puerto de la URL.
+    DB_PGBOUNCER: bool | None = None
+
+    # Réplica de solo lectura para los GET; si no se define se lee del primario
+    DATABASE_READ_URL: str | None = None
+
+    # Conexión directa (sin pgbouncer en modo transacción) para LISTEN de
+    # cambios de precio; si no se define, la invalidación por NOTIFY se omite
+    PRICE_NOTIFY_DATABASE_URL: str | None = None
+
     # Redis Cache
     REDIS_URL: str | None = None
+    # Tope del único pool Redis del proceso (cache, cache HTTP y rate limit)
+    REDIS_MAX_CONNECTIONS: int = 64
 
     # JWT
     JWT_SECRET_KEY: str = "leon2017"
@@ -30,6 +67,11 @@ class Settings(BaseSettings):
     # Rate limiting
     RATE_LIMIT_PER_MINUTE: int = 100
     API_RATE_LIMIT_PER_MINUTE: int = 1000
+    # Detrás de un proxy la IP del socket es la del proxy: sin TRUSTED_PROXIES
+    # (IPs o CIDRs del proxy) todos los clientes comparten un solo contador,
+    # así que el límite solo se aplica con RATE_LIMIT_ENABLED
+    RATE_LIMIT_ENABLED: bool = False
+    TRUSTED_PROXIES: list[str] = []
 
     # Chile Configuration
     DEFAULT_TIMEZONE: str = "America/Santiago"
@@ -42,6 +84,11 @@ class Settings(BaseSettings):
     CACHE_TTL_PRICES: int = 1800
     CACHE_TTL_STORES: int = 7200
 
+    # Cache L1 en memoria del proceso delante de Redis
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_TTL: int = 60
+    CACHE_L1_MAXSIZE: int = 10_000
+
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "json"
@@ -49,6 +96,12 @@ class Settings(BaseSettings):
 
     # CORS
     CORS_ORIGINS: str = "*"
+    # Métodos y headers que la API usa de verdad: con listas explícitas la
+    # respuesta al preflight es fija en vez de reflejar lo que pide el cliente
+    CORS_ALLOWED_METHODS: list[str] = ["GET", "POST", "DELETE", "OPTIONS"]
+    CORS_ALLOWED_HEADERS: list[str] = [
+        "Authorization", "Content-Type", "If-None-Match", "X-Request-ID", "X-User-ID",
+    ]
     ALLOWED_HOSTS: list[str] = ["*"]
 
     model_config = SettingsConfigDict(
@@ -57,9 +110,16 @@ class Settings(BaseSettings):
         extra="ignore",
     )
 
+    @property
+    def CORS_ORIGINS_LIST(self) -> list[str]:
+        """Orígenes CORS de ``CORS_ORIGINS`` (separados por coma)"""
+        return [origin.strip() for origin in self.CORS_ORIGINS.split(",") if origin.strip()]
+
     def model_post_init(self, __context):  # type: ignore[override]
         if not self.REDIS_URL and self.DEBUG:
             self.REDIS_URL = "redis://localhost:6379/0"
+        if self.DB_PGBOUNCER is None:
+            self.DB_PGBOUNCER = ":6543/" in self.DATABASE_URL
 
 
 @lru_cache()
@@ -2,33 +2,149 @@
 Configuración de base de datos para Cuanto Cuesta
 Incluye soporte para el Conversation Service y gestión de contexto conversacional
 """
-from sqlalchemy import create_engine, MetaData, text
+from sqlalchemy import create_engine, event, MetaData, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from contextlib import asynccontextmanager
 import structlog
 import asyncio
 from typing import AsyncGenerator
+from uuid import uuid4
 
 from app.core.config import settings
 
 logger = structlog.get_logger(__name__)
 
+# Opciones de pool compartidas por los engines síncrono y asíncrono
+IS_POSTGRES = settings.DATABASE_URL.startswith("postgresql://")
+if not IS_POSTGRES:
+    pool_options = {}
+elif settings.DB_PGBOUNCER:
+    # PgBouncer ya mantiene el pool: cada checkout abre y cierra la conexión
+    pool_options = {"poolclass": NullPool}
+else:
+    pool_options = {
+        "pool_pre_ping": True,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+# Parámetros de sesión para consultas OLTP cortas y parametrizadas: sin
+# JIT (compilar con LLVM cuesta más que lo que ahorra en consultas de pocos
+# ms), plan genérico estable para los prepared statements y un tope por
+# sentencia. Se envían al abrir la conexión; PgBouncer en modo transacción
+# rechaza parámetros de arranque que no conoce, así que ahí solo va el nombre
+# de la aplicación.
+APPLICATION_NAME = "cuanto-cuesta-api"
+SERVER_SETTINGS = {
+    "jit": "off",
+    "plan_cache_mode": "force_generic_plan",
+    "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS),
+}
+
+
+def _sync_connect_args() -> dict:
+    if not IS_POSTGRES:
+        return {}
+    connect_args = {"sslmode": "require", "application_name": APPLICATION_NAME}
+    if not settings.DB_PGBOUNCER:
+        connect_args["options"] = " ".join(
+            f"-c {name}={value}" for name, value in SERVER_SETTINGS.items()
+        )
+    return connect_args
+
+
 # Configuración del engine de base de datos
 engine = create_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    pool_size=2,
-    max_overflow=5,
-    connect_args={"sslmode": "require"},
+    connect_args=_sync_connect_args(),
+    **pool_options,
 )
 
 # Configuración de sesiones
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine asíncrono (asyncpg) para endpoints que no deben bloquear el event loop
+def build_async_engine(database_url: str):
+    """Crear un engine asyncpg/aiosqlite con las opciones de pool compartidas"""
+    options = {"echo": settings.DEBUG, **pool_options}
+    if database_url.startswith("postgresql://"):
+        async_url = database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+        connect_args = {
+            "ssl": "require",
+            "server_settings": {"application_name": APPLICATION_NAME},
+        }
+        if not settings.DB_PGBOUNCER:
+            connect_args["server_settings"].update(SERVER_SETTINGS)
+        else:
+            # En modo transacción los prepared statements no sobreviven entre
+            # transacciones: sin cache de statements (ni el de asyncpg ni el
+            # del dialecto) y con nombres únicos para que no choquen entre
+            # conexiones del servidor que PgBouncer reparte
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+        options["connect_args"] = connect_args
+    elif database_url.startswith("sqlite://"):
+        async_url = database_url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    else:
+        async_url = database_url
+    return create_async_engine(async_url, **options)
+
+
+async_engine = build_async_engine(settings.DATABASE_URL)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+def primary_pool_ceiling() -> int | None:
+    """
+    Máximo de conexiones de este proceso contra el primario (engines
+    síncrono y asíncrono); ``None`` si no hay pool propio (NullPool/SQLite)
+    """
+    if "pool_size" not in pool_options:
+        return None
+    return 2 * (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+
+
+# Engine de lectura: réplica si está configurada, si no el mismo primario
+async_read_engine = (
+    build_async_engine(settings.DATABASE_READ_URL)
+    if settings.DATABASE_READ_URL else async_engine
+)
+
+
+
+class ReadOnlySession(Session):
+    """Sesión cuyas transacciones se abren en modo READ ONLY"""
+
+
+@event.listens_for(ReadOnlySession, "after_begin")
+def _set_transaction_read_only(session, transaction, connection):
+    # Solo al abrir la transacción: los requests resueltos desde cache no
+    # llegan a tomar una conexión
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+
+
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine,
+    class_=AsyncSession,
+    sync_session_class=ReadOnlySession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # Configuración de metadatos con esquemas
 metadata = MetaData()
 
@@ -51,40 +167,50 @@ def get_db():
         db.close()
 
 
-async def get_database_session() -> Session:
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     """
-    Obtener sesión de base de datos para el conversation service
-    
-    Returns:
-        Session: Sesión de SQLAlchemy
+    Dependency asíncrona: una sesión por request sobre el engine asyncpg
     """
-    db = SessionLocal()
-    try:
-        return db
-    except Exception:
-        logger.exception("Error creando sesión de base de datos")
-        db.close()
-        raise
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            logger.exception("Error en sesión asíncrona de base de datos")
+            await db.rollback()
+            raise
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency asíncrona de solo lectura para endpoints GET: usa la réplica
+    (DATABASE_READ_URL) cuando existe y sus transacciones son READ ONLY
+    """
+    async with AsyncReadSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            logger.exception("Error en sesión de lectura de base de datos")
+            await db.rollback()
+            raise
 
 
 @asynccontextmanager
-async def get_async_db_session() -> AsyncGenerator[Session, None]:
+async def get_async_db_session() -> AsyncGenerator[AsyncSession, None]:
     """
-    Context manager para sesiones de base de datos asíncronas
+    Context manager para sesiones de base de datos asíncronas (asyncpg),
+    sin bloquear el event loop
     
     Yields:
-        Session: Sesión de base de datos
+        AsyncSession: Sesión de base de datos
     """
-    db = SessionLocal()
-    try:
-        yield db
-        db.commit()
-    except Exception:
-        logger.exception("Error en sesión asíncrona")
-        db.rollback()
-        raise
-    finally:
-        db.close()
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            logger.exception("Error en sesión asíncrona")
+            await db.rollback()
+            raise
 
 
 def create_database():
@@ -103,9 +229,6 @@ def create_database():
         Base.metadata.create_all(bind=engine)
         logger.info("Tablas de base de datos creadas exitosamente")
         
-        # Crear índices adicionales para conversation service
-        create_conversation_indexes()
-        
         # Crear funciones de base de datos para conversation service
         create_conversation_functions()
         
@@ -116,54 +239,47 @@ def create_database():
 
 def create_conversation_indexes():
     """
-    Crear índices específicos para optimizar el conversation service
+    Crear índices específicos para optimizar el conversation service.
+
+    Usa CREATE INDEX CONCURRENTLY para no bloquear escrituras en tablas con
+    tráfico; Postgres no lo admite dentro de una transacción, así que cada
+    sentencia va sola en modo AUTOCOMMIT. Es una tarea de mantenimiento
+    (``scripts/create_conversation_indexes.py``), no parte del arranque.
     """
+    # Postgres solo admite funciones IMMUTABLE en el predicado de un índice
+    # parcial: los filtros por NOW() quedan en las consultas, no en el índice
+    indexes = [
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_interactions_recent
+        ON user_interactions (user_id, timestamp DESC)
+        """,
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contextual_anchors_active
+        ON contextual_anchors (user_id, is_active, confidence_score DESC)
+        WHERE is_active = true
+        """,
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_context_changes_recent
+        ON context_changes (user_id, detection_timestamp DESC)
+        """,
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_anonymous_cache_region_fresh
+        ON anonymous_cache (region_code, created_at DESC)
+        """,
+        """
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_usuarios_active_temp
+        ON usuarios (is_temporary, last_activity DESC)
+        """,
+    ]
+
     try:
-        with engine.connect() as connection:
-            # Índices compuestos para consultas frecuentes (con IF NOT EXISTS)
-            indexes = [
-                """
-                CREATE INDEX IF NOT EXISTS idx_user_interactions_recent 
-                ON user_interactions (user_id, timestamp DESC) 
-                WHERE timestamp > NOW() - INTERVAL '30 days'
-                """,
-                
-                """
-                CREATE INDEX IF NOT EXISTS idx_contextual_anchors_active 
-                ON contextual_anchors (user_id, is_active, confidence_score DESC) 
-                WHERE is_active = true
-                """,
-                
-                """
-                CREATE INDEX IF NOT EXISTS idx_context_changes_recent 
-                ON context_changes (user_id, detection_timestamp DESC) 
-                WHERE detection_timestamp > NOW() - INTERVAL '7 days'
-                """,
-                
-                """
-                CREATE INDEX IF NOT EXISTS idx_anonymous_cache_region_fresh 
-                ON anonymous_cache (region_code, created_at DESC) 
-                WHERE expires_at > NOW()
-                """,
-                
-                """
-                CREATE INDEX IF NOT EXISTS idx_usuarios_active_temp 
-                ON usuarios (is_temporary, last_activity DESC) 
-                WHERE expires_at IS NULL OR expires_at > NOW()
-                """
-            ]
-            
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            # Un índice sobre una tabla grande supera el statement_timeout OLTP
+            connection.execute(text("SET statement_timeout = 0"))
             for index_sql in indexes:
-                try:
-                    connection.execute(text(index_sql))
-                except Exception as e:
-                    if "already exists" in str(e) or "ya existe" in str(e):
-                        logger.debug(f"Índice ya existe (normal): {e}")
-                    else:
-                        logger.exception("Error creando índice")
-                
+                connection.execute(text(index_sql))
         logger.info("Índices del conversation service creados exitosamente")
-        
+
     except Exception:
         logger.exception("Error creando índices del conversation service")
 
@@ -173,7 +289,7 @@ def create_conversation_functions():
     Crear funciones de base de datos para optimizar el conversation service
     """
     try:
-        with engine.connect() as connection:
+        with engine.begin() as connection:
             # Función para limpiar usuarios expirados
             cleanup_function = """
             CREATE OR REPLACE FUNCTION cleanup_expired_users()
@@ -197,7 +313,7 @@ def create_conversation_functions():
                 anchor_id UUID,
                 new_value JSONB
             )
-            RETURNS FLOAT AS $$
+            RETURNS FLOAT STABLE PARALLEL SAFE AS $$
             DECLARE
                 current_value JSONB;
                 drift_score FLOAT;
@@ -233,7 +349,7 @@ def create_conversation_functions():
                 avg_satisfaction FLOAT,
                 most_common_intent TEXT,
                 interaction_frequency FLOAT
-            ) AS $$
+            ) STABLE PARALLEL SAFE AS $$
             BEGIN
                 RETURN QUERY
                 SELECT 
@@ -248,11 +364,9 @@ def create_conversation_functions():
             $$ LANGUAGE plpgsql;
             """
             
-            functions = [cleanup_function, drift_function, stats_function]
-            
-            for function_sql in functions:
-                connection.execute(text(function_sql))
-                
+            # Las tres definiciones en un solo round-trip y una transacción
+            connection.execute(text(cleanup_function + drift_function + stats_function))
+
         logger.info("Funciones del conversation service creadas exitosamente")
         
     except Exception:
@@ -273,6 +387,20 @@ def check_database_connection():
         return False
 
 
+async def check_database_connection_async() -> bool:
+    """
+    Verificar conexión a la base de datos con el engine asíncrono,
+    sin ocupar un hilo del threadpool
+    """
+    try:
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        logger.exception("Error conectando a base de datos")
+        return False
+
+
 def check_conversation_tables():
     """
     Verificar que las tablas del conversation service existan
@@ -287,15 +415,16 @@ def check_conversation_tables():
     
     try:
         with engine.connect() as connection:
-            for table in required_tables:
-                result = connection.execute(text(
-                    "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = :table_name)"
-                ), {"table_name": table})
-                
-                if not result.scalar():
-                    logger.exception("Tabla requerida no existe", table=table)
-                    return False
-                    
+            existing = connection.execute(text(
+                "SELECT table_name FROM information_schema.tables "
+                "WHERE table_schema = current_schema() AND table_name = ANY(:names)"
+            ), {"names": required_tables}).scalars().all()
+
+        missing = sorted(set(required_tables) - set(existing))
+        if missing:
+            logger.error("Tablas requeridas no existen", tables=missing)
+            return False
+
         logger.info("Todas las tablas del conversation service están presentes")
         return True
         
@@ -334,33 +463,50 @@ def initialize_conversation_service_db():
 
 def cleanup_expired_data():
     """
-    Limpiar datos expirados del conversation service
+    Limpiar datos expirados del conversation service.
+
+    Los tres DELETE van en una sola sentencia con CTEs: un round-trip y una
+    transacción. Todos ven la misma foto de ``usuarios``, así que los
+    usuarios temporales que se eliminan aquí también cuentan para el
+    filtro de interacciones antiguas.
     """
     try:
-        with engine.connect() as connection:
-            # Limpiar usuarios expirados
-            result = connection.execute(text("SELECT cleanup_expired_users()"))
-            deleted_users = result.scalar()
-            
-            # Limpiar cache expirado
-            connection.execute(text(
-                "DELETE FROM anonymous_cache WHERE expires_at < NOW()"
-            ))
-            
-            # Limpiar interacciones muy antiguas de usuarios temporales
-            connection.execute(text("""
-                DELETE FROM user_interactions 
-                WHERE user_id IN (
-                    SELECT user_id FROM usuarios 
-                    WHERE is_temporary = true 
-                    AND last_activity < NOW() - INTERVAL '90 days'
+        with engine.begin() as connection:
+            connection.execute(text("SET LOCAL statement_timeout = 0"))
+            deleted_users, deleted_cache, deleted_interactions = connection.execute(text("""
+                WITH expired_users AS (
+                    DELETE FROM usuarios
+                    WHERE is_temporary = true
+                    AND expires_at < NOW()
+                    RETURNING 1
+                ),
+                expired_cache AS (
+                    DELETE FROM anonymous_cache
+                    WHERE expires_at < NOW()
+                    RETURNING 1
+                ),
+                old_interactions AS (
+                    DELETE FROM user_interactions
+                    WHERE user_id IN (
+                        SELECT user_id FROM usuarios
+                        WHERE is_temporary = true
+                        AND last_activity < NOW() - INTERVAL '90 days'
+                    )
+                    AND timestamp < NOW() - INTERVAL '90 days'
+                    RETURNING 1
                 )
-                AND timestamp < NOW() - INTERVAL '90 days'
-            """))
-            
-            connection.commit()
-            
-        logger.info(f"Limpieza completada: {deleted_users} usuarios expirados eliminados")
+                SELECT
+                    (SELECT COUNT(*) FROM expired_users),
+                    (SELECT COUNT(*) FROM expired_cache),
+                    (SELECT COUNT(*) FROM old_interactions)
+            """)).one()
+
+        logger.info(
+            "Limpieza completada",
+            usuarios=deleted_users,
+            cache=deleted_cache,
+            interacciones=deleted_interactions,
+        )
         
     except Exception:
         logger.exception("Error en limpieza de datos")
@@ -368,7 +514,10 @@ def cleanup_expired_data():
 
 def get_database_stats():
     """
-    Obtener estadísticas de la base de datos del conversation service
+    Obtener estadísticas de la base de datos del conversation service.
+
+    Los conteos por tabla son la estimación de filas vivas que mantiene
+    Postgres (``pg_stat_user_tables.n_live_tup``), sin recorrer las tablas.
     
     Returns:
         dict: Estadísticas de uso
@@ -377,13 +526,16 @@ def get_database_stats():
         with engine.connect() as connection:
             stats = {}
             
-            # Contar registros por tabla
+            # Filas estimadas por tabla, en una sola consulta al catálogo
             tables = ['usuarios', 'user_context', 'user_interactions', 
                      'contextual_anchors', 'anonymous_cache', 'context_changes']
             
+            counts = dict(connection.execute(text(
+                "SELECT relname, n_live_tup FROM pg_stat_user_tables "
+                "WHERE schemaname = current_schema() AND relname = ANY(:tables)"
+            ), {"tables": tables}).all())
             for table in tables:
-                result = connection.execute(text(f"SELECT COUNT(*) FROM {table}"))
-                stats[f"{table}_count"] = result.scalar()
+                stats[f"{table}_count"] = counts.get(table, 0)
             
             # Estadísticas adicionales
             result = connection.execute(text("""
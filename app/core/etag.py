@@ -0,0 +1,64 @@
+"""Respuestas 304 para requests condicionales con ``If-None-Match``."""
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class ETagMiddleware:
+    """
+    Middleware ASGI que responde ``304 Not Modified`` cuando el ``ETag`` de
+    una respuesta 200 a un GET coincide con ``If-None-Match``.
+
+    Solo mira los headers de inicio de la respuesta: el cuerpo se descarta
+    sin enviarse, así que el cliente no vuelve a pagar el payload.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = None
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value
+                break
+        if if_none_match is None:
+            await self.app(scope, receive, send)
+            return
+
+        not_modified = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal not_modified
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = message.get("headers", [])
+                etag = next((v for k, v in headers if k == b"etag"), None)
+                if etag is not None and _matches(if_none_match, etag):
+                    not_modified = True
+                    keep = (b"etag", b"cache-control", b"vary", b"x-process-time")
+                    await send({
+                        "type": "http.response.start",
+                        "status": 304,
+                        "headers": [(k, v) for k, v in headers if k in keep],
+                    })
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+            if not_modified:
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """True si el ``If-None-Match`` del request ya cubre ``etag``."""
+    if_none_match = request.headers.get("if-none-match")
+    return if_none_match is not None and _matches(if_none_match.encode(), etag.encode())
+
+
+def _matches(if_none_match: bytes, etag: bytes) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(b",")]
+    return b"*" in tags or etag in tags
@@ -0,0 +1,118 @@
+"""Invalidación de cache dirigida por NOTIFY de Postgres.
+
+El trigger ``pricing.notify_price_changed`` emite el ``product_id`` por el
+canal ``price_changed`` en cada INSERT/UPDATE de ``pricing.prices``; este
+listener borra en el acto las entradas de cache de ese producto, de modo que
+las comparaciones no sirvan precios viejos hasta que expire el TTL.
+
+Postgres ya colapsa los NOTIFY idénticos de una misma transacción; además
+los ids que llegan dentro de ``DEBOUNCE_SECONDS`` se juntan y se invalidan
+una sola vez, desde una única tarea, para que un lote del scraper no dispare
+una tarea y un SCAN por fila.
+"""
+import asyncio
+from typing import Awaitable, Callable, Optional, Set
+
+import asyncpg
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+PRICE_CHANGED_CHANNEL = "price_changed"
+DEBOUNCE_SECONDS = 0.5
+RECONNECT_MAX_DELAY = 30.0
+
+
+class PriceChangeListener:
+    """
+    Conexión dedicada que escucha ``price_changed`` y llama ``on_change``.
+
+    Si la conexión se cae se reabre con backoff exponencial; como los NOTIFY
+    emitidos mientras tanto se pierden, al reconectar se llama
+    ``on_reconnect`` (si se indicó) para invalidar todo lo que pudo quedar
+    viejo.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        on_change: Callable[[str], Awaitable[None]],
+        on_reconnect: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        # asyncpg espera un DSN libpq sin el sufijo de driver de SQLAlchemy
+        self.dsn = dsn.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self.on_change = on_change
+        self.on_reconnect = on_reconnect
+        self._conn: Optional[asyncpg.Connection] = None
+        self._pending: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def start(self) -> None:
+        """Abrir la conexión y suscribirse al canal."""
+        self._closing = False
+        await self._connect()
+        logger.info("Escuchando cambios de precio", channel=PRICE_CHANGED_CHANNEL)
+
+    async def _connect(self) -> None:
+        conn = await asyncpg.connect(self.dsn)
+        conn.add_termination_listener(self._on_termination)
+        await conn.add_listener(PRICE_CHANGED_CHANNEL, self._handle)
+        self._conn = conn
+
+    def _handle(self, connection, pid, channel, payload) -> None:
+        self._pending.add(payload)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        await asyncio.sleep(DEBOUNCE_SECONDS)
+        # Los ids que llegan mientras se invalida se procesan en la siguiente vuelta
+        while self._pending:
+            product_ids, self._pending = self._pending, set()
+            for product_id in product_ids:
+                try:
+                    await self.on_change(product_id)
+                except Exception:  # pragma: no cover - no debe tumbar el listener
+                    logger.exception("Error invalidando cache de precios", product_id=product_id)
+
+    def _on_termination(self, connection) -> None:
+        if self._closing or connection is not self._conn:
+            return
+        logger.warning("Conexión de cambios de precio cerrada, reconectando")
+        self._conn = None
+        self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 1.0
+        while not self._closing:
+            try:
+                await self._connect()
+            except (OSError, asyncpg.PostgresError) as exc:
+                logger.warning("No se pudo reconectar el listener de precios", error=str(exc), retry_in=delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+
+            logger.info("Listener de precios reconectado", channel=PRICE_CHANGED_CHANNEL)
+            if self.on_reconnect:
+                try:
+                    await self.on_reconnect()
+                except Exception:  # pragma: no cover - no debe tumbar el listener
+                    logger.exception("Error invalidando cache de precios tras reconectar")
+            return
+
+    async def stop(self) -> None:
+        """Cancelar la suscripción, las tareas pendientes y cerrar la conexión."""
+        self._closing = True
+        for task in (self._flush_task, self._reconnect_task):
+            if task and not task.done():
+                task.cancel()
+        if self._conn is None:
+            return
+        try:
+            await self._conn.remove_listener(PRICE_CHANGED_CHANNEL, self._handle)
+        finally:
+            await self._conn.close()
+            self._conn = None
@@ -0,0 +1,100 @@
+"""Rate limiting por ventana fija con un único script Lua en Redis."""
+from ipaddress import ip_address, ip_network
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, Request
+from redis.exceptions import RedisError
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+# INCR + EXPIRE (solo en el primer hit de la ventana) + comparación en un
+# único EVALSHA: una ida y vuelta a Redis por request y sin carreras.
+RATE_LIMIT_LUA = """
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+if current > tonumber(ARGV[2]) then
+    return 0
+end
+return 1
+"""
+
+RATE_LIMIT_MESSAGE = "Demasiadas solicitudes, intenta nuevamente más tarde."
+
+
+class RateLimiter:
+    """
+    Dependency que limita a ``times`` requests por ``seconds`` por cliente.
+
+    El script se registra una vez sobre ``app.state.redis`` y se guarda en
+    ``app.state.rate_limit_script``; si Redis no está disponible la request
+    se deja pasar. No hace nada mientras ``RATE_LIMIT_ENABLED`` esté apagado.
+
+    El cliente es la IP del socket, salvo que venga de un proxy de
+    ``trusted_proxies``: entonces se recorre ``X-Forwarded-For`` de derecha a
+    izquierda y se usa el primer salto que no es un proxy de confianza (lo
+    que el cliente escriba a la izquierda no se toma en cuenta).
+    """
+
+    def __init__(
+        self,
+        times: int,
+        seconds: int = 60,
+        scope: str = "",
+        trusted_proxies: Optional[Iterable[str]] = None,
+    ):
+        self.times = times
+        self.seconds = seconds
+        self.scope = scope
+        if trusted_proxies is None:
+            trusted_proxies = settings.TRUSTED_PROXIES
+        self.trusted_proxies = [ip_network(proxy, strict=False) for proxy in trusted_proxies]
+
+    def _is_trusted(self, host: str) -> bool:
+        try:
+            address = ip_address(host.strip())
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_proxies)
+
+    def client_ip(self, request: Request) -> str:
+        """IP del cliente que origina la request"""
+        host = request.client.host if request.client else "anonymous"
+        if not self.trusted_proxies or not self._is_trusted(host):
+            return host
+        forwarded = request.headers.get("x-forwarded-for", "")
+        for hop in reversed(forwarded.split(",")):
+            hop = hop.strip()
+            if hop and not self._is_trusted(hop):
+                return hop
+        return host
+
+    async def __call__(self, request: Request) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        state = request.app.state
+        script = getattr(state, "rate_limit_script", None)
+        if script is None:
+            redis = getattr(state, "redis", None)
+            if redis is None:
+                return
+            script = state.rate_limit_script = redis.register_script(RATE_LIMIT_LUA)
+
+        key = f"rl:{self.scope}:{self.client_ip(request)}"
+        try:
+            allowed = await script(keys=[key], args=[self.seconds, self.times])
+        except RedisError:
+            logger.exception("Error aplicando rate limit", key=key)
+            return
+
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail=RATE_LIMIT_MESSAGE,
+                headers={"Retry-After": str(self.seconds)},
+            )
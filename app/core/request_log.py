@@ -0,0 +1,70 @@
+"""Contexto de logging y tiempo de proceso por request."""
+import time
+from os import urandom
+
+import structlog
+from structlog.contextvars import bind_contextvars, clear_contextvars
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = structlog.get_logger(__name__)
+
+
+class RequestLogMiddleware:
+    """
+    Middleware ASGI que asocia ``request_id``/``user_id`` a los logs del
+    request, agrega ``X-Process-Time`` y emite una sola línea por respuesta.
+
+    Al ser ASGI puro no crea una tarea ni un stream intermedio por request
+    como ``@app.middleware("http")``. El ``request_id`` generado son 96 bits
+    aleatorios en hex: solo correlaciona logs, no necesita ser un UUID.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = user_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+            elif name == b"x-user-id":
+                user_id = value.decode("latin-1")
+        bind_contextvars(
+            request_id=request_id or urandom(12).hex(),
+            user_id=user_id or "anonymous",
+        )
+
+        start = time.perf_counter()
+        status_code = None
+        elapsed = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, elapsed
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = round(time.perf_counter() - start, 3)
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-process-time", str(elapsed).encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            logger.exception("Error procesando request", method=scope["method"], path=scope["path"])
+            raise
+        else:
+            logger.info(
+                "Response",
+                method=scope["method"],
+                path=scope["path"],
+                status_code=status_code,
+                process_time=elapsed,
+            )
+        finally:
+            clear_contextvars()
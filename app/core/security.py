@@ -1,7 +1,8 @@
 """
 Configuración de seguridad y autenticación para Cuanto Cuesta
 """
-from datetime import datetime, timedelta
+import time
+from datetime import timedelta
 from typing import Any, Union, Optional
 from jose import jwt, JWTError
 from passlib.context import CryptContext
@@ -25,13 +26,12 @@ def create_access_token(
     Crear token de acceso JWT
     """
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        lifetime = int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(
-            minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
-        )
+        lifetime = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
     
-    to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
+    # ``exp`` en segundos epoch (RFC 7519), sin pasar por datetime
+    to_encode = {"exp": int(time.time()) + lifetime, "sub": str(subject), "type": "access"}
     encoded_jwt = jwt.encode(
         to_encode, 
         settings.JWT_SECRET_KEY, 
@@ -48,13 +48,11 @@ def create_refresh_token(
     Crear token de refresh JWT
     """
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        lifetime = int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(
-            days=settings.REFRESH_TOKEN_EXPIRE_DAYS
-        )
+        lifetime = settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
     
-    to_encode = {"exp": expire, "sub": str(subject), "type": "refresh"}
+    to_encode = {"exp": int(time.time()) + lifetime, "sub": str(subject), "type": "refresh"}
     encoded_jwt = jwt.encode(
         to_encode, 
         settings.JWT_SECRET_KEY, 
@@ -1,25 +1,27 @@
 """Aplicación principal FastAPI para Cuanto Cuesta"""
+import gzip
 import logging
 import sys
-import uuid
 import time
 from contextlib import asynccontextmanager
 
+import asyncpg
+import orjson
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.openapi.utils import get_openapi
 
 import structlog
-from structlog.contextvars import bind_contextvars, clear_contextvars
 
 from openai import OpenAIError
 from redis.exceptions import RedisError
 from sqlalchemy.exc import SQLAlchemyError
 
-from redis import asyncio as aioredis
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
 
 try:
     from fastapi_limiter import FastAPILimiter
@@ -27,6 +29,17 @@ except ImportError:
     FastAPILimiter = None
 
 from app.core.config import settings
+from app.core.cache import (
+    HTTP_CACHE_PREFIX,
+    cache,
+    invalidate_all_product_prices,
+    invalidate_product_prices,
+)
+from app.core.database import AsyncSessionLocal, primary_pool_ceiling
+from app.core.etag import ETagMiddleware
+from app.core.request_log import RequestLogMiddleware
+from app.core.price_notifications import PriceChangeListener
+from app.services.conversation_service import ConversationService
 from app.api.v1.api import api_router
 from app.api.v1.routers.health import router as health_router
 
@@ -75,22 +88,58 @@ async def lifespan(app: FastAPI):
         logger.error("REDIS_URL inválida", redis_url=safe_url)
         raise RuntimeError("Invalid REDIS_URL")
 
-    redis = aioredis.from_url(redis_url, encoding="utf-8", decode_responses=True)
-    try:
-        await redis.ping()
-    except Exception as exc:  # pragma: no cover - network failure
-        logger.error("No se pudo conectar a Redis", redis_url=safe_url, error=str(exc))
-        raise RuntimeError("Redis ping failed") from exc
+    # Un solo pool Redis por proceso (REDIS_MAX_CONNECTIONS): rate limit,
+    # cache HTTP y cache de servicios usan el cliente del cache de servicios
+    await cache._connect()
+    redis = cache.redis_client
+    if redis is None:  # pragma: no cover - network failure
+        logger.error("No se pudo conectar a Redis", redis_url=safe_url)
+        raise RuntimeError("Redis ping failed")
 
     app.state.redis = redis
+
+    pool_ceiling = primary_pool_ceiling()
+    if pool_ceiling:
+        logger.info(
+            "Pool de base de datos",
+            max_conexiones_proceso=pool_ceiling,
+            workers=settings.WEB_CONCURRENCY,
+            max_conexiones_total=pool_ceiling * settings.WEB_CONCURRENCY,
+        )
     if FastAPILimiter:
         # Initialize limiter with shared Redis client
         await FastAPILimiter.init(app.state.redis)
 
+    # Cache de respuestas HTTP sobre el mismo cliente Redis
+    FastAPICache.init(RedisBackend(app.state.redis), prefix=HTTP_CACHE_PREFIX)
+
+    # OpenAPI serializado y comprimido una sola vez por proceso
+    render_openapi()
+
+    # Servicio de conversación único por proceso
+    app.state.conv_service = ConversationService(session_factory=AsyncSessionLocal)
+
+    # Invalidación inmediata del cache de precios vía LISTEN/NOTIFY
+    price_listener = None
+    if settings.PRICE_NOTIFY_DATABASE_URL:
+        price_listener = PriceChangeListener(
+            settings.PRICE_NOTIFY_DATABASE_URL,
+            invalidate_product_prices,
+            on_reconnect=invalidate_all_product_prices,
+        )
+        try:
+            await price_listener.start()
+        except (OSError, asyncpg.PostgresError) as exc:
+            logger.error("No se pudo iniciar el listener de precios", error=str(exc))
+            price_listener = None
+
     try:
         yield
     finally:
-        await redis.close()
+        if price_listener:
+            await price_listener.stop()
+        await app.state.conv_service.close()
+        await cache.close()
         logger.info("Cerrando aplicación...")
 
 app = FastAPI(
@@ -104,45 +153,30 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     lifespan=lifespan,
+    # orjson para todas las respuestas JSON (routers incluidos)
+    default_response_class=ORJSONResponse,
 )
 
 # CORS y TrustedHosts
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.CORS_ORIGINS.split(","),
+    allow_origins=settings.CORS_ORIGINS_LIST,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=settings.CORS_ALLOWED_METHODS,
+    allow_headers=settings.CORS_ALLOWED_HEADERS,
 )
 if not settings.DEBUG:
     app.add_middleware(TrustedHostMiddleware, allowed_hosts=settings.ALLOWED_HOSTS)
+# 304 para GET condicionales sobre respuestas con ETag
+app.add_middleware(ETagMiddleware)
 
-# Middleware de logging y métricas
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
-    user_id = request.headers.get("X-User-ID", "anonymous")
-    bind_contextvars(request_id=request_id, user_id=user_id)
-
-    start = time.time()
-    logger.info("Request", method=request.method, url=str(request.url))
-    try:
-        response = await call_next(request)
-    except Exception:
-        logger.exception("Error procesando request")
-        clear_contextvars()
-        raise
-
-    elapsed = round(time.time() - start, 3)
-    logger.info("Response", status_code=response.status_code, process_time=elapsed, path=request.url.path)
-    response.headers["X-Process-Time"] = str(elapsed)
-    clear_contextvars()
-    return response
+# Contexto de logs y X-Process-Time; último en agregarse = más externo
+app.add_middleware(RequestLogMiddleware)
 
 # Exception handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "success": False,
@@ -158,7 +192,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 @app.exception_handler(OpenAIError)
 async def openai_exception_handler(request: Request, exc: OpenAIError):
     logger.exception("Error en OpenAI")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False,
@@ -174,7 +208,7 @@ async def openai_exception_handler(request: Request, exc: OpenAIError):
 @app.exception_handler(RedisError)
 async def redis_exception_handler(request: Request, exc: RedisError):
     logger.exception("Error en Redis")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False,
@@ -190,7 +224,7 @@ async def redis_exception_handler(request: Request, exc: RedisError):
 @app.exception_handler(SQLAlchemyError)
 async def db_exception_handler(request: Request, exc: SQLAlchemyError):
     logger.exception("Error en base de datos")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False,
@@ -206,7 +240,7 @@ async def db_exception_handler(request: Request, exc: SQLAlchemyError):
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     logger.exception("Error no manejado")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False,
@@ -256,26 +290,64 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
-# Root endpoint
+
+def render_openapi() -> None:
+    """Pre-renderizar el schema OpenAPI en JSON plano y gzip (nivel 9)."""
+    raw = orjson.dumps(app.openapi())
+    app.state.openapi_json = raw
+    app.state.openapi_gz = gzip.compress(raw, 9)
+
+
+# Reemplaza la ruta por defecto de FastAPI, que re-serializa el schema en
+# cada request, por una que sirve los bytes pre-renderizados
+app.router.routes = [
+    route for route in app.router.routes
+    if getattr(route, "path", None) != app.openapi_url
+]
+
+
+@app.get(app.openapi_url, include_in_schema=False)
+async def openapi_json(request: Request):
+    if not hasattr(app.state, "openapi_gz"):
+        render_openapi()
+    headers = {"Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(app.state.openapi_gz, media_type="application/json", headers=headers)
+    return Response(app.state.openapi_json, media_type="application/json", headers=headers)
+
+# Root endpoint: el cuerpo es fijo, se serializa una sola vez al importar
+ROOT_JSON = orjson.dumps({
+    "message": "¡Bienvenido a Cuanto Cuesta API!",
+    "version": settings.PROJECT_VERSION,
+    "health_url": "/health",
+    "docs_url": "/docs",
+    "features": [
+        "Búsqueda inteligente", "Comparación en tiempo real",
+        "Geolocalización con PostGIS", "Manejo de caracteres especiales",
+        "Optimización de listas", "API multi-plataforma"
+    ],
+})
+
+
 @app.get("/", tags=["Root"])
 async def root():
-    return {
-        "message": "¡Bienvenido a Cuanto Cuesta API!",
-        "version": settings.PROJECT_VERSION,
-        "health_url": "/health",
-        "docs_url": "/docs",
-        "features": [
-            "Búsqueda inteligente", "Comparación en tiempo real",
-            "Geolocalización con PostGIS", "Manejo de caracteres especiales",
-            "Optimización de listas", "API multi-plataforma"
-        ],
-    }
+    return Response(ROOT_JSON, media_type="application/json")
 
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=settings.DEBUG,
+        loop="uvloop",
+        http="httptools",
+        # --reload solo admite un proceso
+        workers=settings.WEB_CONCURRENCY,
+        reload=settings.DEBUG and settings.WEB_CONCURRENCY == 1,
         log_level=settings.LOG_LEVEL.lower(),
+        access_log=False,
+        proxy_headers=False,
+        limit_concurrency=settings.UVICORN_LIMIT_CONCURRENCY,
+        limit_max_requests=settings.UVICORN_LIMIT_MAX_REQUESTS,
+        timeout_keep_alive=5,
     )
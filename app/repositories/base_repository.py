@@ -1,7 +1,7 @@
 """
 Repositorio base para operaciones CRUD comunes
 """
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, List, Optional, Sequence, Type, TypeVar, Union
 from uuid import UUID
 
 from fastapi.encoders import jsonable_encoder
@@ -19,14 +19,18 @@ UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """Repositorio base con operaciones CRUD comunes"""
     
-    def __init__(self, model: Type[ModelType]):
+    def __init__(self, model: Type[ModelType], load_options: Sequence[Any] = ()):
         """
         Repositorio CRUD con modelo por defecto.
         
         **Parámetros**
         * `model`: Clase del modelo SQLAlchemy
+        * `load_options`: Opciones de carga (``joinedload``/``selectinload``)
+          aplicadas en las lecturas de registros activos, para evitar N+1
+          al serializar relaciones
         """
         self.model = model
+        self.load_options = tuple(load_options)
     
     def get(self, db: Session, id: Union[UUID, str]) -> Optional[ModelType]:
         """Obtener registro por ID"""
@@ -117,7 +121,7 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     
     def get_active(self, db: Session, id: Union[UUID, str]) -> Optional[ModelType]:
         """Obtener registro activo por ID"""
-        query = db.query(self.model).filter(self.model.id == id)
+        query = db.query(self.model).options(*self.load_options).filter(self.model.id == id)
         
         # Verificar si el modelo tiene campo is_active
         if hasattr(self.model, 'is_active'):
@@ -125,6 +129,19 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         
         return query.first()
     
+    def get_multi_active_by_ids(
+        self,
+        db: Session,
+        ids: List[Union[UUID, str]]
+    ) -> List[ModelType]:
+        """Obtener registros activos para un conjunto de IDs en una sola consulta"""
+        query = db.query(self.model).options(*self.load_options).filter(self.model.id.in_(ids))
+        
+        if hasattr(self.model, 'is_active'):
+            query = query.filter(self.model.is_active == True)
+        
+        return query.all()
+    
     def get_multi_active(
         self, 
         db: Session, 
@@ -134,7 +151,7 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         filters: Optional[Dict[str, Any]] = None
     ) -> List[ModelType]:
         """Obtener múltiples registros activos"""
-        query = db.query(self.model)
+        query = db.query(self.model).options(*self.load_options)
         
         # Filtrar solo activos si el modelo tiene el campo
         if hasattr(self.model, 'is_active'):
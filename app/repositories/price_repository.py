@@ -1,6 +1,7 @@
 """
 Repositorio de precios con comparación y análisis
 """
+from collections import defaultdict
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 from datetime import datetime, timedelta
@@ -68,19 +69,12 @@ class PriceRepository(BaseRepository[Price, dict, dict]):
         
         # Agregar cálculo de distancia si se proporcionan coordenadas
         if latitude is not None and longitude is not None:
-            user_location = f"POINT({longitude} {latitude})"
-            base_query += f""",
+            base_query += """,
                 ROUND(
-                    ST_Distance(
-                        s.location,
-                        ST_GeogFromText('{user_location}')
-                    ) / 1000, 2
+                    (ST_Distance(s.location, ST_MakePoint(:lon, :lat)::geography) / 1000)::numeric, 2
                 ) as distance_km,
                 ROUND(
-                    ST_Distance(
-                        s.location,
-                        ST_GeogFromText('{user_location}')
-                    ) / 1000 * 2.5, 0
+                    (ST_Distance(s.location, ST_MakePoint(:lon, :lat)::geography) / 1000 * 2.5)::numeric, 0
                 ) as estimated_time_minutes
             """
         
@@ -106,15 +100,15 @@ class PriceRepository(BaseRepository[Price, dict, dict]):
         if not include_mayoristas:
             base_query += " AND sm.type = 'retail'"
         
-        # Filtro geográfico
+        # Filtro geográfico: ST_DWithin sobre geography usa el índice GiST
+        # ix_stores_location; coordenadas y radio van como parámetros para
+        # que el plan sea reutilizable entre ubicaciones distintas.
+        params: Dict[str, Any] = {'product_id': product_id}
         if latitude is not None and longitude is not None:
-            base_query += f"""
-                AND ST_DWithin(
-                    s.location,
-                    ST_GeogFromText('{user_location}'),
-                    {radius_km * 1000}
-                )
+            base_query += """
+                AND ST_DWithin(s.location, ST_MakePoint(:lon, :lat)::geography, :radius_m)
             """
+            params.update(lat=latitude, lon=longitude, radius_m=radius_km * 1000)
         
         # Ordenamiento
         if latitude is not None and longitude is not None:
@@ -122,8 +116,8 @@ class PriceRepository(BaseRepository[Price, dict, dict]):
         else:
             base_query += " ORDER BY p.normal_price ASC"
         
-        result = db.execute(text(base_query), {'product_id': product_id})
-        return [dict(row) for row in result]
+        result = db.execute(text(base_query), params)
+        return [dict(row._mapping) for row in result]
     
     def get_best_price_for_product(
         self,
@@ -162,7 +156,120 @@ class PriceRepository(BaseRepository[Price, dict, dict]):
         prices = self.get_current_prices_for_product(
             db, product_id, latitude, longitude, radius_km, include_mayoristas
         )
+        return self._build_comparison(product_id, prices)
+
+    def get_current_prices_for_products(
+        self,
+        db: Session,
+        product_ids: List[UUID],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: float = 10.0,
+        include_mayoristas: bool = False
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Obtener precios actuales de varios productos en una sola consulta,
+        agrupados por ID de producto
+        """
+        base_query = """
+            SELECT 
+                p.id as price_id,
+                p.product_id,
+                p.store_id,
+                p.normal_price,
+                p.discount_price,
+                p.discount_percentage,
+                p.stock_status,
+                p.promotion_description,
+                p.promotion_valid_until,
+                p.scraped_at,
+                s.name as store_name,
+                s.address as store_address,
+                s.commune as store_commune,
+                s.phone as store_phone,
+                sm.name as supermarket_name,
+                sm.type as supermarket_type,
+                sm.logo_url as supermarket_logo
+        """
+        
+        params = {'product_ids': list(product_ids)}
+        geo = latitude is not None and longitude is not None
+        if geo:
+            params.update(lon=longitude, lat=latitude, radius_m=radius_km * 1000)
+            base_query += """,
+                ROUND(
+                    (ST_Distance(s.location, ST_MakePoint(:lon, :lat)::geography) / 1000)::numeric, 2
+                ) as distance_km,
+                ROUND(
+                    (ST_Distance(s.location, ST_MakePoint(:lon, :lat)::geography) / 1000 * 2.5)::numeric, 0
+                ) as estimated_time_minutes
+            """
         
+        base_query += """
+            FROM pricing.prices p
+            JOIN stores.stores s ON p.store_id = s.id
+            JOIN stores.supermarkets sm ON s.supermarket_id = sm.id
+            WHERE 
+                p.product_id = ANY(:product_ids)
+                AND p.is_active = true
+                AND s.is_active = true
+                AND sm.is_active = true
+                AND p.stock_status = 'available'
+                AND (p.product_id, p.store_id, p.scraped_at) IN (
+                    SELECT product_id, store_id, MAX(scraped_at)
+                    FROM pricing.prices
+                    WHERE product_id = ANY(:product_ids) AND is_active = true
+                    GROUP BY product_id, store_id
+                )
+        """
+        
+        if not include_mayoristas:
+            base_query += " AND sm.type = 'retail'"
+        
+        if geo:
+            base_query += """
+                AND ST_DWithin(s.location, ST_MakePoint(:lon, :lat)::geography, :radius_m)
+                ORDER BY distance_km ASC, p.normal_price ASC
+            """
+        else:
+            base_query += " ORDER BY p.normal_price ASC"
+        
+        grouped: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for row in db.execute(text(base_query), params):
+            price = dict(row._mapping)
+            grouped[str(price['product_id'])].append(price)
+        return grouped
+
+    def get_price_comparisons(
+        self,
+        db: Session,
+        product_ids: List[UUID],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: float = 10.0,
+        include_mayoristas: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtener comparación de precios para varios productos con una sola consulta
+        """
+        prices_by_product = self.get_current_prices_for_products(
+            db, product_ids, latitude, longitude, radius_km, include_mayoristas
+        )
+        return {
+            str(product_id): self._build_comparison(
+                product_id, prices_by_product.get(str(product_id), [])
+            )
+            for product_id in product_ids
+        }
+
+    def _build_comparison(
+        self,
+        product_id: UUID,
+        prices: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Calcular estadísticas y recomendaciones a partir de los precios actuales
+        """
         if not prices:
             return {
                 "product_id": product_id,
@@ -275,13 +382,9 @@ class PriceRepository(BaseRepository[Price, dict, dict]):
         """
         
         if latitude is not None and longitude is not None:
-            user_location = f"POINT({longitude} {latitude})"
-            base_query += f""",
+            base_query += """,
                 ROUND(
-                    ST_Distance(
-                        s.location,
-                        ST_GeogFromText('{user_location}')
-                    ) / 1000, 2
+                    (ST_Distance(s.location, ST_MakePoint(:lon, :lat)::geography) / 1000)::numeric, 2
                 ) as distance_km
             """
         
@@ -305,25 +408,24 @@ class PriceRepository(BaseRepository[Price, dict, dict]):
                 )
         """
         
+        params: Dict[str, Any] = {
+            'min_discount': min_discount_percentage,
+            'limit': limit,
+        }
         if latitude is not None and longitude is not None:
-            base_query += f"""
-                AND ST_DWithin(
-                    s.location,
-                    ST_GeogFromText('{user_location}'),
-                    {radius_km * 1000}
-                )
+            base_query += """
+                AND ST_DWithin(s.location, ST_MakePoint(:lon, :lat)::geography, :radius_m)
                 ORDER BY p.discount_percentage DESC, distance_km ASC
             """
+            params.update(lat=latitude, lon=longitude, radius_m=radius_km * 1000)
         else:
             base_query += " ORDER BY p.discount_percentage DESC"
         
-        base_query += f" LIMIT {limit}"
+        base_query += " LIMIT :limit"
         
-        result = db.execute(text(base_query), {
-            'min_discount': min_discount_percentage
-        })
+        result = db.execute(text(base_query), params)
         
-        return [dict(row) for row in result]
+        return [dict(row._mapping) for row in result]
     
     def get_average_price_by_commune(
         self,
@@ -362,6 +464,41 @@ class PriceRepository(BaseRepository[Price, dict, dict]):
         result = db.execute(query, {'product_id': product_id})
         return [dict(row) for row in result]
 
+    
+    def get_commune_trends(
+        self,
+        db: Session,
+        product_id: UUID
+    ) -> List[Dict[str, Any]]:
+        """
+        Obtener tendencias de precio por comuna desde la vista materializada
+        (refrescada periódicamente por el worker RQ)
+        """
+        query = text("""
+            SELECT 
+                commune,
+                store_count,
+                avg_normal_price,
+                avg_effective_price,
+                min_price,
+                max_price,
+                refreshed_at
+            FROM pricing.mv_tendencias_comuna
+            WHERE product_id = :product_id
+            ORDER BY avg_effective_price ASC
+        """)
+        
+        result = db.execute(query, {'product_id': product_id})
+        return [dict(row._mapping) for row in result]
+
+    def refresh_commune_trends(self, db: Session) -> None:
+        """
+        Refrescar la vista materializada de tendencias sin bloquear lecturas
+        """
+        # Recorre todos los precios: sin el statement_timeout de las conexiones OLTP
+        db.execute(text("SET LOCAL statement_timeout = 0"))
+        db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY pricing.mv_tendencias_comuna"))
+        db.commit()
 
 # Instancia global del repositorio
 price_repository = PriceRepository()
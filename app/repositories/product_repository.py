@@ -1,10 +1,10 @@
 """
 Repositorio de productos con búsqueda avanzada
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
-from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, and_, text
+from sqlalchemy.orm import Session, contains_eager, joinedload, selectinload
+from sqlalchemy import func, lambda_stmt, or_, and_, text, tuple_
 from sqlalchemy.sql import select
 
 from app.models.product import Product
@@ -13,11 +13,20 @@ from app.repositories.base_repository import BaseRepository
 from app.utils.sanitizer import sanitize_text
 
 
+def _relevance(search_term: str):
+    """Relevancia de un producto: mejor similitud entre nombre y marca"""
+    return func.greatest(
+        func.similarity(Product.name, search_term),
+        func.similarity(Product.brand, search_term)
+    )
+
+
 class ProductRepository(BaseRepository[Product, dict, dict]):
     """Repositorio de productos con funcionalidades específicas"""
     
     def __init__(self):
-        super().__init__(Product)
+        # La categoría se serializa con cada producto: cargarla en el mismo SELECT
+        super().__init__(Product, load_options=(joinedload(Product.category),))
     
     def search_products(
         self,
@@ -25,66 +34,72 @@ class ProductRepository(BaseRepository[Product, dict, dict]):
         search_term: str,
         category_id: Optional[UUID] = None,
         limit: int = 50,
-        skip: int = 0
-    ) -> List[Product]:
+        skip: int = 0,
+        after: Optional[Tuple[float, UUID]] = None
+    ) -> Tuple[List[Tuple[Product, float]], int]:
         """
-        Búsqueda inteligente de productos usando texto completo y similitud
+        Búsqueda inteligente de productos usando texto completo y similitud.
+        Retorna la página pedida como pares (producto, relevancia) y el total
+        de coincidencias, calculado en la misma consulta con COUNT(*) OVER().
+        
+        `after` es la clave (relevancia, id) de la última fila de la página
+        anterior (paginación keyset); con `after` el total cuenta solo las
+        filas posteriores al cursor.
+        
+        La consulta se arma con lambda_stmt: SQLAlchemy cachea la construcción
+        y la clave de cache por forma de la consulta, y los valores de cada
+        request pasan como parámetros.
         """
         search_term = sanitize_text(search_term)
         if not search_term:
             raise ValueError("search_term")
-        query = db.query(Product).join(Category)
+        like_term = f'%{search_term}%'
         
-        # Filtrar solo productos activos
-        query = query.filter(Product.is_active == True)
+        # Reutilizar el JOIN de categoría para poblar la relación sin N+1
+        stmt = lambda_stmt(
+            lambda: select(
+                Product,
+                _relevance(search_term).label("relevance"),
+                func.count().over().label("total")
+            )
+            .join(Category)
+            .options(contains_eager(Product.category))
+            .where(Product.is_active == True)
+        )
         
         # Filtrar por categoría si se especifica
         if category_id:
-            query = query.filter(Product.category_id == category_id)
-        
-        # Búsqueda por texto usando múltiples estrategias
-        if search_term:
-            search_conditions = []
-            
-            # 1. Búsqueda de texto completo usando tsvector
-            search_conditions.append(
-                Product.search_vector.match(search_term)
-            )
-            
-            # 2. Búsqueda por similitud en nombre
-            search_conditions.append(
-                func.similarity(Product.name, search_term) > 0.3
-            )
-            
-            # 3. Búsqueda por similitud en marca
-            search_conditions.append(
-                func.similarity(Product.brand, search_term) > 0.3
-            )
-            
-            # 4. Búsqueda ILIKE para coincidencias parciales
-            search_conditions.append(
-                Product.name.ilike(f'%{search_term}%')
-            )
-            search_conditions.append(
-                Product.brand.ilike(f'%{search_term}%')
+            stmt += lambda s: s.where(Product.category_id == category_id)
+        
+        # Búsqueda por texto usando múltiples estrategias (OR):
+        # texto completo (tsvector), similitud en nombre/marca e ILIKE parcial
+        stmt += lambda s: s.where(
+            or_(
+                Product.search_vector.match(search_term),
+                func.similarity(Product.name, search_term) > 0.3,
+                func.similarity(Product.brand, search_term) > 0.3,
+                Product.name.ilike(like_term),
+                Product.brand.ilike(like_term)
             )
-            
-            # Combinar todas las condiciones con OR
-            query = query.filter(or_(*search_conditions))
-            
-            # Ordenar por relevancia
-            query = query.order_by(
-                func.greatest(
-                    func.similarity(Product.name, search_term),
-                    func.similarity(Product.brand, search_term)
-                ).desc(),
-                Product.name
+        )
+        
+        # Continuar después de la última fila vista en lugar de OFFSET
+        if after is not None:
+            last_relevance, last_id = after
+            stmt += lambda s: s.where(
+                tuple_(_relevance(search_term), Product.id) < tuple_(last_relevance, last_id)
             )
-        else:
-            # Sin término de búsqueda, ordenar alfabéticamente
-            query = query.order_by(Product.name)
         
-        return query.offset(skip).limit(limit).all()
+        # Ordenar por relevancia; el id desempata y hace estable el cursor
+        stmt += lambda s: s.order_by(_relevance(search_term).desc(), Product.id.desc())
+        
+        if after is None and skip:
+            stmt += lambda s: s.offset(skip)
+        stmt += lambda s: s.limit(limit)
+        
+        rows = db.execute(stmt).all()
+        total = rows[0].total if rows else 0
+        return [(row.Product, row.relevance) for row in rows], total
     
     def get_by_barcode(self, db: Session, barcode: str) -> Optional[Product]:
         """Obtener producto por código de barras"""
@@ -132,7 +147,8 @@ class ProductRepository(BaseRepository[Product, dict, dict]):
         """
         from app.models.price import Price
         
-        return db.query(Product).join(Price).filter(
+        # selectinload: un JOIN a categorías rompería el GROUP BY
+        return db.query(Product).options(selectinload(Product.category)).join(Price).filter(
             Product.is_active == True
         ).group_by(Product.id).order_by(
             func.count(Price.id).desc()
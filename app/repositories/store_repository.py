@@ -3,21 +3,23 @@ Repositorio de tiendas con búsqueda geográfica y manejo de caracteres especial
 """
 from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
-from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, and_, text
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, literal, or_, and_, text
+from geoalchemy2 import Geography
 from geoalchemy2.functions import ST_DWithin, ST_Distance, ST_GeogFromText
 
 from app.models.store import Store
 from app.models.supermarket import Supermarket
 from app.repositories.base_repository import BaseRepository
-from app.utils.sanitizer import sanitize_text
+from app.utils.sanitizer import normalize_search_term, sanitize_text
 
 
 class StoreRepository(BaseRepository[Store, dict, dict]):
     """Repositorio de tiendas con funcionalidades geográficas"""
     
     def __init__(self):
-        super().__init__(Store)
+        # El supermercado se serializa con cada tienda
+        super().__init__(Store, load_options=(joinedload(Store.supermarket),))
     
     def search_by_commune(
         self,
@@ -29,9 +31,12 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
         Búsqueda inteligente de tiendas por comuna con manejo de caracteres especiales
         Encuentra "Ñuñoa" con cualquier variación: "Nunoa", "nunoa", "NUNOA"
         """
-        search_term = sanitize_text(search_term)
+        search_term = normalize_search_term(sanitize_text(search_term))
         if not search_term:
             raise ValueError("search_term")
+        # commune_normalized = lower(unaccent(commune)) (trigger) con índice GIN
+        # gin_trgm_ops: tanto `%` como LIKE usan el índice
+        like_term = search_term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
         query = text("""
             SELECT 
                 s.id,
@@ -46,23 +51,17 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
                 ST_Y(s.location::geometry) as latitude,
                 s.opening_hours,
                 s.services,
-                GREATEST(
-                    similarity(s.commune, :search_term),
-                    similarity(s.commune_normalized, lower(unaccent(:search_term)))
-                ) as similarity_score
+                similarity(s.commune_normalized, :search_term) as similarity_score
             FROM stores.stores s
             JOIN stores.supermarkets sm ON s.supermarket_id = sm.id
             WHERE 
                 s.is_active = true
                 AND sm.is_active = true
                 AND (
-                    -- Búsqueda exacta
-                    s.commune ILIKE '%' || :search_term || '%'
                     -- Búsqueda normalizada (sin acentos)
-                    OR s.commune_normalized ILIKE '%' || lower(unaccent(:search_term)) || '%'
-                    -- Búsqueda por similitud
-                    OR similarity(s.commune, :search_term) > 0.3
-                    OR similarity(s.commune_normalized, lower(unaccent(:search_term))) > 0.3
+                    s.commune_normalized LIKE :like_term
+                    -- Búsqueda por similitud (umbral pg_trgm.similarity_threshold = 0.3)
+                    OR s.commune_normalized % :search_term
                 )
             ORDER BY similarity_score DESC, s.name
             LIMIT :limit
@@ -70,10 +69,11 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
         
         result = db.execute(query, {
             'search_term': search_term,
+            'like_term': f"%{like_term}%",
             'limit': limit
         })
         
-        return [dict(row) for row in result]
+        return [dict(row._mapping) for row in result]
     
     def get_nearby_stores(
         self,
@@ -87,9 +87,6 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
         """
         Obtener tiendas cercanas a una ubicación con cálculo de distancia
         """
-        # Crear punto geográfico
-        user_location = f"POINT({longitude} {latitude})"
-        
         query = text("""
             SELECT 
                 s.id,
@@ -109,40 +106,31 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
                 s.has_bakery,
                 s.has_parking,
                 ROUND(
-                    ST_Distance(
-                        s.location,
-                        ST_GeogFromText(:user_location)
-                    ) / 1000, 2
+                    (ST_Distance(s.location, ST_MakePoint(:lon, :lat)::geography) / 1000)::numeric, 2
                 ) as distance_km,
                 ROUND(
-                    ST_Distance(
-                        s.location,
-                        ST_GeogFromText(:user_location)
-                    ) / 1000 * 2.5, 0
+                    (ST_Distance(s.location, ST_MakePoint(:lon, :lat)::geography) / 1000 * 2.5)::numeric, 0
                 ) as estimated_time_minutes
             FROM stores.stores s
             JOIN stores.supermarkets sm ON s.supermarket_id = sm.id
             WHERE 
                 s.is_active = true
                 AND sm.is_active = true
-                AND ST_DWithin(
-                    s.location,
-                    ST_GeogFromText(:user_location),
-                    :radius_meters
-                )
+                AND ST_DWithin(s.location, ST_MakePoint(:lon, :lat)::geography, :radius_meters)
                 AND (:supermarket_type IS NULL OR sm.type = :supermarket_type)
             ORDER BY distance_km ASC
             LIMIT :limit
         """)
         
         result = db.execute(query, {
-            'user_location': user_location,
+            'lon': longitude,
+            'lat': latitude,
             'radius_meters': radius_km * 1000,  # Convertir km a metros
             'supermarket_type': supermarket_type,
             'limit': limit
         })
         
-        return [dict(row) for row in result]
+        return [dict(row._mapping) for row in result]
     
     def get_stores_with_products(
         self,
@@ -156,9 +144,10 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
         """
         Obtener tiendas que tienen productos específicos disponibles
         """
-        product_ids_str = "','".join([str(pid) for pid in product_ids])
+        params: Dict[str, Any] = {'product_ids': list(product_ids), 'limit': limit}
+        geo = latitude is not None and longitude is not None
         
-        base_query = f"""
+        base_query = """
             SELECT 
                 s.id,
                 s.name,
@@ -174,6 +163,18 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
                 COUNT(DISTINCT p.product_id) as products_available,
                 ARRAY_AGG(DISTINCT p.product_id) as available_product_ids,
                 AVG(p.normal_price) as avg_price
+        """
+        
+        # Distancia calculada sobre s.location (geography) en la misma pasada
+        if geo:
+            params.update(lon=longitude, lat=latitude, radius_m=radius_km * 1000)
+            base_query += """,
+                ROUND(
+                    (ST_Distance(s.location, ST_MakePoint(:lon, :lat)::geography) / 1000)::numeric, 2
+                ) as distance_km
+            """
+        
+        base_query += """
             FROM stores.stores s
             JOIN stores.supermarkets sm ON s.supermarket_id = sm.id
             JOIN pricing.prices p ON s.id = p.store_id
@@ -182,47 +183,31 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
                 AND sm.is_active = true
                 AND p.is_active = true
                 AND p.stock_status = 'available'
-                AND p.product_id IN ('{product_ids_str}')
+                AND p.product_id = ANY(:product_ids)
         """
         
         # Agregar filtro geográfico si se proporcionan coordenadas
-        if latitude is not None and longitude is not None:
-            user_location = f"POINT({longitude} {latitude})"
-            base_query += f"""
-                AND ST_DWithin(
-                    s.location,
-                    ST_GeogFromText('{user_location}'),
-                    {radius_km * 1000}
-                )
+        if geo:
+            base_query += """
+                AND ST_DWithin(s.location, ST_MakePoint(:lon, :lat)::geography, :radius_m)
             """
         
-        base_query += f"""
+        base_query += """
             GROUP BY s.id, s.name, s.address, s.commune, s.region, 
                      sm.name, sm.type, s.location, s.opening_hours, s.services
             HAVING COUNT(DISTINCT p.product_id) > 0
         """
         
-        # Agregar cálculo de distancia y ordenamiento
-        if latitude is not None and longitude is not None:
-            user_location = f"POINT({longitude} {latitude})"
-            base_query = f"""
-                SELECT *,
-                    ROUND(
-                        ST_Distance(
-                            ST_GeogFromText('POINT(' || longitude || ' ' || latitude || ')'),
-                            ST_GeogFromText('{user_location}')
-                        ) / 1000, 2
-                    ) as distance_km
-                FROM ({base_query}) subquery
-                ORDER BY products_available DESC, distance_km ASC
-            """
+        # Ordenamiento
+        if geo:
+            base_query += " ORDER BY products_available DESC, distance_km ASC"
         else:
             base_query += " ORDER BY products_available DESC, s.name"
         
-        base_query += f" LIMIT {limit}"
+        base_query += " LIMIT :limit"
         
-        result = db.execute(text(base_query))
-        return [dict(row) for row in result]
+        result = db.execute(text(base_query), params)
+        return [dict(row._mapping) for row in result]
     
     def get_by_supermarket(
         self,
@@ -241,7 +226,7 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
             query = query.filter(
                 or_(
                     Store.commune.ilike(f'%{commune}%'),
-                    Store.commune_normalized.ilike(f'%{commune.lower()}%')
+                    Store.commune_normalized.like(f'%{normalize_search_term(commune)}%')
                 )
             )
         
@@ -257,14 +242,9 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
         """
         Calcular distancia entre una tienda y una ubicación
         """
-        user_location = f"POINT({longitude} {latitude})"
-        
         query = text("""
             SELECT ROUND(
-                ST_Distance(
-                    s.location,
-                    ST_GeogFromText(:user_location)
-                ) / 1000, 2
+                (ST_Distance(s.location, ST_MakePoint(:lon, :lat)::geography) / 1000)::numeric, 2
             ) as distance_km
             FROM stores.stores s
             WHERE s.id = :store_id
@@ -272,7 +252,8 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
         
         result = db.execute(query, {
             'store_id': store_id,
-            'user_location': user_location
+            'lon': longitude,
+            'lat': latitude
         }).first()
         
         return result.distance_km if result else None
@@ -297,11 +278,19 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
         longitude: Optional[float] = None,
         radius_km: float = 10.0,
         limit: int = 50
-    ) -> List[Store]:
+    ) -> List[Tuple[Store, Optional[float]]]:
         """
-        Obtener tiendas que tienen servicios específicos
+        Obtener tiendas que tienen servicios específicos junto con su
+        distancia en km (None si no se indican coordenadas)
         """
-        query = db.query(Store).filter(Store.is_active == True)
+        geo = latitude is not None and longitude is not None
+        if geo:
+            user_location = func.ST_MakePoint(longitude, latitude).cast(Geography)
+            distance_km = (func.ST_Distance(Store.location, user_location) / 1000).label("distance_km")
+            query = db.query(Store, distance_km)
+        else:
+            query = db.query(Store, literal(None).label("distance_km"))
+        query = query.options(*self.load_options).filter(Store.is_active == True)
         
         # Filtrar por servicios
         service_conditions = []
@@ -322,17 +311,17 @@ class StoreRepository(BaseRepository[Store, dict, dict]):
             query = query.filter(or_(*service_conditions))
         
         # Filtro geográfico si se proporcionan coordenadas
-        if latitude is not None and longitude is not None:
-            user_location = func.ST_GeogFromText(f"POINT({longitude} {latitude})")
+        if geo:
             query = query.filter(
                 func.ST_DWithin(Store.location, user_location, radius_km * 1000)
             )
             # Ordenar por distancia
-            query = query.order_by(
-                func.ST_Distance(Store.location, user_location)
-            )
+            query = query.order_by(distance_km)
         
-        return query.limit(limit).all()
+        return [
+            (store, round(float(distance), 2) if distance is not None else None)
+            for store, distance in query.limit(limit).all()
+        ]
 
 
 # Instancia global del repositorio
@@ -2,10 +2,9 @@
 Schemas comunes para la API
 """
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
 from uuid import UUID
 from datetime import datetime
-from decimal import Decimal
 
 
 class ResponseBase(BaseModel):
@@ -33,13 +32,12 @@ class LocationParams(BaseModel):
     lat: float = Field(..., ge=-90, le=90, description="Latitud")
     lon: float = Field(..., ge=-180, le=180, description="Longitud")
     
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "lat": -33.4489,
-                "lon": -70.6693
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "lat": -33.4489,
+            "lon": -70.6693
         }
+    })
 
 
 class CoordinatesResponse(BaseModel):
@@ -70,9 +68,11 @@ class PriceInfo(BaseModel):
     porcentaje_descuento: float = Field(0, description="Porcentaje de descuento")
     precio_efectivo: float = Field(..., description="Precio efectivo (con descuento si aplica)")
     
-    @validator('precio_efectivo', always=True)
-    def calculate_effective_price(cls, v, values):
+    @field_validator('precio_efectivo')
+    @classmethod
+    def calculate_effective_price(cls, v, info: ValidationInfo):
         """Calcular precio efectivo automáticamente"""
+        values = info.data
         if 'precio_descuento' in values and values['precio_descuento']:
             return values['precio_descuento']
         return values.get('precio_normal', 0)
@@ -103,9 +103,11 @@ class SearchFilters(BaseModel):
     radio_km: float = Field(10.0, ge=0.1, le=50, description="Radio de búsqueda en kilómetros")
     incluir_mayoristas: bool = Field(False, description="Incluir supermercados mayoristas")
     
-    @validator('precio_max')
-    def validate_price_range(cls, v, values):
+    @field_validator('precio_max')
+    @classmethod
+    def validate_price_range(cls, v, info: ValidationInfo):
         """Validar que precio_max sea mayor que precio_min"""
+        values = info.data
         if v is not None and 'precio_min' in values and values['precio_min'] is not None:
             if v <= values['precio_min']:
                 raise ValueError('precio_max debe ser mayor que precio_min')
@@ -142,15 +144,12 @@ class RecommendationResponse(BaseModel):
     explicacion: str = Field(..., description="Explicación de la recomendación")
 
 
-# Configuración global para todos los schemas
-class Config:
-    """Configuración base para schemas"""
-    use_enum_values = True
-    validate_assignment = True
-    populate_by_name = True
-    json_encoders = {
-        datetime: lambda v: v.isoformat(),
-        Decimal: lambda v: float(v),
-        UUID: lambda v: str(v)
-    }
+# Configuración global para todos los schemas. Sin json_encoders: pydantic-core
+# serializa datetime/UUID de forma nativa (mismo formato ISO / str)
+BASE_MODEL_CONFIG = ConfigDict(
+    use_enum_values=True,
+    validate_assignment=True,
+    populate_by_name=True,
+    from_attributes=True,
+)
 
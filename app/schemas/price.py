@@ -2,13 +2,13 @@
 Schemas para precios con nomenclatura en español
 """
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from uuid import UUID
 from datetime import datetime
 
 from app.schemas.common import (
     ProductBasicInfo, StoreBasicInfo, StatisticsResponse, 
-    RecommendationResponse, Config
+    RecommendationResponse, BASE_MODEL_CONFIG
 )
 
 
@@ -20,16 +20,15 @@ class PriceComparisonRequest(BaseModel):
     radio_km: float = Field(10.0, ge=0.1, le=50, description="Radio de búsqueda en kilómetros")
     incluir_mayoristas: bool = Field(False, description="Incluir supermercados mayoristas")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "producto_id": "123e4567-e89b-12d3-a456-426614174000",
-                "lat": -33.4489,
-                "lon": -70.6693,
-                "radio_km": 10.0,
-                "incluir_mayoristas": False
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "producto_id": "123e4567-e89b-12d3-a456-426614174000",
+            "lat": -33.4489,
+            "lon": -70.6693,
+            "radio_km": 10.0,
+            "incluir_mayoristas": False
         }
+    })
 
 
 class PriceDetailResponse(BaseModel):
@@ -52,22 +51,21 @@ class PriceDetailResponse(BaseModel):
     distancia_km: Optional[float] = Field(None, description="Distancia en kilómetros")
     tiempo_estimado_min: Optional[int] = Field(None, description="Tiempo estimado en minutos")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "tienda_id": "123e4567-e89b-12d3-a456-426614174000",
-                "supermercado": "Jumbo",
-                "tienda_nombre": "Jumbo Ñuñoa",
-                "comuna": "Ñuñoa",
-                "precio_normal": 1250,
-                "precio_descuento": 990,
-                "porcentaje_descuento": 20.8,
-                "precio_efectivo": 990,
-                "stock_disponible": True,
-                "distancia_km": 2.5,
-                "tiempo_estimado_min": 8
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "tienda_id": "123e4567-e89b-12d3-a456-426614174000",
+            "supermercado": "Jumbo",
+            "tienda_nombre": "Jumbo Ñuñoa",
+            "comuna": "Ñuñoa",
+            "precio_normal": 1250,
+            "precio_descuento": 990,
+            "porcentaje_descuento": 20.8,
+            "precio_efectivo": 990,
+            "stock_disponible": True,
+            "distancia_km": 2.5,
+            "tiempo_estimado_min": 8
         }
+    })
 
 
 class PriceComparisonResponse(BaseModel):
@@ -85,27 +83,58 @@ class PriceComparisonResponse(BaseModel):
         None, description="Explicación de la sugerencia de marca"
     )
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "producto": {
-                    "id": "123e4567-e89b-12d3-a456-426614174000",
-                    "nombre": "Pan Integral Bimbo",
-                    "marca": "Bimbo"
-                },
-                "precios": [
-                    {
-                        "tienda_nombre": "Jumbo Ñuñoa",
-                        "precio_normal": 1250,
-                        "precio_descuento": 990,
-                        "porcentaje_descuento": 20.8,
-                        "distancia_km": 2.5
-                    }
-                ],
-                "ahorro_maximo": 260,
-                "recomendacion": "Mejor precio en Jumbo Ñuñoa con 20.8% descuento"
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "producto": {
+                "id": "123e4567-e89b-12d3-a456-426614174000",
+                "nombre": "Pan Integral Bimbo",
+                "marca": "Bimbo"
+            },
+            "precios": [
+                {
+                    "tienda_nombre": "Jumbo Ñuñoa",
+                    "precio_normal": 1250,
+                    "precio_descuento": 990,
+                    "porcentaje_descuento": 20.8,
+                    "distancia_km": 2.5
+                }
+            ],
+            "ahorro_maximo": 260,
+            "recomendacion": "Mejor precio en Jumbo Ñuñoa con 20.8% descuento"
         }
+    })
+
+
+class PriceComparisonBatchRequest(BaseModel):
+    """Request para comparación de precios de varios productos"""
+    producto_ids: List[UUID] = Field(
+        ..., min_length=1, max_length=100, description="IDs de los productos a comparar"
+    )
+    lat: Optional[float] = Field(None, ge=-90, le=90, description="Latitud")
+    lon: Optional[float] = Field(None, ge=-180, le=180, description="Longitud")
+    radio_km: float = Field(10.0, ge=0.1, le=50, description="Radio de búsqueda en kilómetros")
+    incluir_mayoristas: bool = Field(False, description="Incluir supermercados mayoristas")
+    
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "producto_ids": [
+                "123e4567-e89b-12d3-a456-426614174000",
+                "123e4567-e89b-12d3-a456-426614174001"
+            ],
+            "lat": -33.4489,
+            "lon": -70.6693,
+            "radio_km": 10.0
+        }
+    })
+
+
+class PriceComparisonBatchResponse(BaseModel):
+    """Respuesta de comparación de precios de varios productos"""
+    comparaciones: List[PriceComparisonResponse] = Field(..., description="Comparación por producto")
+    no_encontrados: List[str] = Field(default_factory=list, description="IDs de productos no encontrados")
+    total_productos: int = Field(..., description="Total de productos comparados")
+    
+    model_config = BASE_MODEL_CONFIG
 
 
 class BestDealsRequest(BaseModel):
@@ -116,16 +145,15 @@ class BestDealsRequest(BaseModel):
     radio_km: float = Field(10.0, ge=0.1, le=50, description="Radio de búsqueda")
     limite: int = Field(50, ge=1, le=100, description="Número máximo de ofertas")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "min_descuento": 25.0,
-                "lat": -33.4489,
-                "lon": -70.6693,
-                "radio_km": 15.0,
-                "limite": 30
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "min_descuento": 25.0,
+            "lat": -33.4489,
+            "lon": -70.6693,
+            "radio_km": 15.0,
+            "limite": 30
         }
+    })
 
 
 class DealResponse(BaseModel):
@@ -140,8 +168,7 @@ class DealResponse(BaseModel):
     distancia_km: Optional[float] = Field(None, description="Distancia en kilómetros")
     tiempo_estimado_min: Optional[int] = Field(None, description="Tiempo estimado en minutos")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
 
 class BestDealsResponse(BaseModel):
@@ -152,8 +179,7 @@ class BestDealsResponse(BaseModel):
     ubicacion: Optional[Dict[str, float]] = Field(None, description="Ubicación utilizada")
     ahorro_total_disponible: float = Field(..., description="Ahorro total disponible")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
 
 class PriceHistoryRequest(BaseModel):
@@ -162,14 +188,13 @@ class PriceHistoryRequest(BaseModel):
     tienda_id: UUID = Field(..., description="ID de la tienda")
     dias: int = Field(30, ge=1, le=365, description="Número de días de historial")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "producto_id": "123e4567-e89b-12d3-a456-426614174000",
-                "tienda_id": "456e7890-e89b-12d3-a456-426614174000",
-                "dias": 30
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "producto_id": "123e4567-e89b-12d3-a456-426614174000",
+            "tienda_id": "456e7890-e89b-12d3-a456-426614174000",
+            "dias": 30
         }
+    })
 
 
 class PriceHistoryEntry(BaseModel):
@@ -182,8 +207,7 @@ class PriceHistoryEntry(BaseModel):
     estado_stock: str = Field(..., description="Estado del stock")
     fecha_hora_actualizacion: str = Field(..., description="Timestamp de actualización")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
 
 class PriceHistoryStatistics(BaseModel):
@@ -196,8 +220,7 @@ class PriceHistoryStatistics(BaseModel):
     dias_con_descuento: int = Field(..., description="Días con descuento")
     descuento_promedio: float = Field(..., description="Descuento promedio")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
 
 class PriceHistoryResponse(BaseModel):
@@ -208,8 +231,7 @@ class PriceHistoryResponse(BaseModel):
     estadisticas: PriceHistoryStatistics = Field(..., description="Estadísticas del período")
     periodo_dias: int = Field(..., description="Período analizado en días")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
 
 class PriceAlertRequest(BaseModel):
@@ -220,15 +242,14 @@ class PriceAlertRequest(BaseModel):
     radio_km: float = Field(10.0, ge=0.1, le=50, description="Radio de búsqueda")
     activa: bool = Field(True, description="Si la alerta está activa")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "producto_id": "123e4567-e89b-12d3-a456-426614174000",
-                "precio_objetivo": 800,
-                "radio_km": 15.0,
-                "activa": True
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "producto_id": "123e4567-e89b-12d3-a456-426614174000",
+            "precio_objetivo": 800,
+            "radio_km": 15.0,
+            "activa": True
         }
+    })
 
 
 class PriceAlertResponse(BaseModel):
@@ -242,6 +263,5 @@ class PriceAlertResponse(BaseModel):
     fecha_creacion: str = Field(..., description="Fecha de creación")
     activa: bool = Field(True, description="Si la alerta está activa")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
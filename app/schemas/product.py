@@ -2,10 +2,10 @@
 Schemas para productos con nomenclatura en español
 """
 from typing import Optional, List
-from pydantic import BaseModel, Field, StrictStr
+from pydantic import BaseModel, ConfigDict, Field, StrictStr
 from uuid import UUID
 
-from app.schemas.common import CategoryInfo, PriceInfo, Config
+from app.schemas.common import CategoryInfo, PriceInfo, BASE_MODEL_CONFIG
 
 
 class ProductSearchRequest(BaseModel):
@@ -22,19 +22,18 @@ class ProductSearchRequest(BaseModel):
     limite: int = Field(50, ge=1, le=100, description="Número máximo de resultados")
     skip: int = Field(0, ge=0, description="Número de resultados a omitir")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "q": "pan integral",
-                "categoria_id": None,
-                "precio_min": 500,
-                "precio_max": 2000,
-                "lat": -33.4489,
-                "lon": -70.6693,
-                "radio_km": 10.0,
-                "limite": 20
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "q": "pan integral",
+            "categoria_id": None,
+            "precio_min": 500,
+            "precio_max": 2000,
+            "lat": -33.4489,
+            "lon": -70.6693,
+            "radio_km": 10.0,
+            "limite": 20
         }
+    })
 
 
 class ProductResponse(BaseModel):
@@ -64,25 +63,24 @@ class ProductResponse(BaseModel):
         None, description="Explicación de la sugerencia de marca"
     )
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "id": "123e4567-e89b-12d3-a456-426614174000",
-                "nombre": "Pan Integral",
-                "marca": "Bimbo",
-                "categoria": "Panadería",
-                "codigo_barras": "7802900123456",
-                "tipo_unidad": "unidad",
-                "tamaño_unidad": "500g",
-                "nombre_completo": "Bimbo Pan Integral",
-                "precio_mejor": 990,
-                "precio_normal": 1250,
-                "tiene_descuento": True,
-                "porcentaje_descuento": 20.8,
-                "tienda_mejor_precio": "Jumbo Ñuñoa",
-                "tiendas_disponibles": 5
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "id": "123e4567-e89b-12d3-a456-426614174000",
+            "nombre": "Pan Integral",
+            "marca": "Bimbo",
+            "categoria": "Panadería",
+            "codigo_barras": "7802900123456",
+            "tipo_unidad": "unidad",
+            "tamaño_unidad": "500g",
+            "nombre_completo": "Bimbo Pan Integral",
+            "precio_mejor": 990,
+            "precio_normal": 1250,
+            "tiene_descuento": True,
+            "porcentaje_descuento": 20.8,
+            "tienda_mejor_precio": "Jumbo Ñuñoa",
+            "tiendas_disponibles": 5
         }
+    })
 
 
 class ProductDetailResponse(BaseModel):
@@ -99,37 +97,38 @@ class ProductDetailResponse(BaseModel):
     nombre_completo: str = Field(..., description="Nombre completo con marca")
     unidad_display: str = Field(..., description="Unidad formateada para mostrar")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
 
 class ProductSearchResponse(BaseModel):
     """Respuesta de búsqueda de productos"""
     productos: List[ProductResponse] = Field(..., description="Lista de productos encontrados")
     total: int = Field(..., description="Total de productos encontrados")
+    siguiente_cursor: Optional[str] = Field(
+        None, description="Cursor para pedir la página siguiente (null si no hay más)"
+    )
     termino_busqueda: str = Field(..., description="Término de búsqueda utilizado")
     filtros_aplicados: dict = Field(..., description="Filtros aplicados en la búsqueda")
     tiempo_respuesta_ms: Optional[int] = Field(None, description="Tiempo de respuesta en milisegundos")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "productos": [
-                    {
-                        "id": "123e4567-e89b-12d3-a456-426614174000",
-                        "nombre": "Pan Integral",
-                        "marca": "Bimbo",
-                        "categoria": "Panadería",
-                        "precio_mejor": 990,
-                        "precio_promedio": 1250,
-                        "tiendas_disponibles": 5
-                    }
-                ],
-                "total": 25,
-                "termino_busqueda": "pan integral",
-                "tiempo_respuesta_ms": 150
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "productos": [
+                {
+                    "id": "123e4567-e89b-12d3-a456-426614174000",
+                    "nombre": "Pan Integral",
+                    "marca": "Bimbo",
+                    "categoria": "Panadería",
+                    "precio_mejor": 990,
+                    "precio_promedio": 1250,
+                    "tiendas_disponibles": 5
+                }
+            ],
+            "total": 25,
+            "termino_busqueda": "pan integral",
+            "tiempo_respuesta_ms": 150
         }
+    })
 
 
 class PopularProductsResponse(BaseModel):
@@ -138,8 +137,7 @@ class PopularProductsResponse(BaseModel):
     criterio: str = Field("popularidad", description="Criterio de ordenamiento")
     limite: int = Field(..., description="Límite de productos retornados")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
 
 class ProductDiscountsResponse(BaseModel):
@@ -149,8 +147,7 @@ class ProductDiscountsResponse(BaseModel):
     ubicacion: Optional[dict] = Field(None, description="Ubicación utilizada para filtrar")
     total_ofertas: int = Field(..., description="Total de ofertas encontradas")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
 
 class ProductBarcodeRequest(BaseModel):
@@ -159,12 +156,11 @@ class ProductBarcodeRequest(BaseModel):
         ..., min_length=8, max_length=20, pattern=r"^[0-9]+$", description="Código de barras del producto"
     )
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "codigo_barras": "7802900123456"
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "codigo_barras": "7802900123456"
         }
+    })
 
 
 class CategoryResponse(BaseModel):
@@ -177,8 +173,7 @@ class CategoryResponse(BaseModel):
     icono_url: Optional[str] = Field(None, description="URL del icono")
     total_productos: int = Field(0, description="Total de productos en esta categoría")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
 
 class CategoriesListResponse(BaseModel):
@@ -186,6 +181,5 @@ class CategoriesListResponse(BaseModel):
     categorias: List[CategoryResponse] = Field(..., description="Lista de categorías")
     total: int = Field(..., description="Total de categorías")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
@@ -2,10 +2,10 @@
 Schemas para tiendas con nomenclatura en español
 """
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field, StrictStr
+from pydantic import BaseModel, ConfigDict, Field, StrictStr
 from uuid import UUID
 
-from app.schemas.common import CoordinatesResponse, SupermarketInfo, Config
+from app.schemas.common import CoordinatesResponse, SupermarketInfo, BASE_MODEL_CONFIG
 
 
 class StoreSearchRequest(BaseModel):
@@ -15,13 +15,12 @@ class StoreSearchRequest(BaseModel):
     )
     limite: int = Field(50, ge=1, le=100, description="Número máximo de resultados")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "termino": "Ñuñoa",
-                "limite": 20
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "termino": "Ñuñoa",
+            "limite": 20
         }
+    })
 
 
 class NearbyStoresRequest(BaseModel):
@@ -34,17 +33,16 @@ class NearbyStoresRequest(BaseModel):
     abierto_ahora: bool = Field(False, description="Solo tiendas abiertas ahora")
     limite: int = Field(50, ge=1, le=100, description="Número máximo de resultados")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "lat": -33.4489,
-                "lon": -70.6693,
-                "radio_km": 10.0,
-                "tipo_supermercado": "retail",
-                "abierto_ahora": True,
-                "limite": 20
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "lat": -33.4489,
+            "lon": -70.6693,
+            "radio_km": 10.0,
+            "tipo_supermercado": "retail",
+            "abierto_ahora": True,
+            "limite": 20
         }
+    })
 
 
 class StoreResponse(BaseModel):
@@ -68,27 +66,26 @@ class StoreResponse(BaseModel):
     precio_promedio: Optional[float] = Field(None, description="Precio promedio (si aplica)")
     puntuacion_similitud: Optional[float] = Field(None, description="Puntuación de similitud en búsqueda")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "id": "123e4567-e89b-12d3-a456-426614174000",
-                "nombre": "Jumbo Ñuñoa",
-                "supermercado": "Jumbo",
-                "tipo_supermercado": "retail",
-                "direccion": "Av. Irarrázaval 4750",
-                "comuna": "Ñuñoa",
-                "region": "Región Metropolitana",
-                "telefono": "+56 2 2345 6789",
-                "coordenadas": {
-                    "latitud": -33.4489,
-                    "longitud": -70.6693
-                },
-                "distancia_km": 2.5,
-                "tiempo_estimado": 8,
-                "abierto_ahora": True,
-                "servicios": ["farmacia", "panaderia", "estacionamiento"]
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "id": "123e4567-e89b-12d3-a456-426614174000",
+            "nombre": "Jumbo Ñuñoa",
+            "supermercado": "Jumbo",
+            "tipo_supermercado": "retail",
+            "direccion": "Av. Irarrázaval 4750",
+            "comuna": "Ñuñoa",
+            "region": "Región Metropolitana",
+            "telefono": "+56 2 2345 6789",
+            "coordenadas": {
+                "latitud": -33.4489,
+                "longitud": -70.6693
+            },
+            "distancia_km": 2.5,
+            "tiempo_estimado": 8,
+            "abierto_ahora": True,
+            "servicios": ["farmacia", "panaderia", "estacionamiento"]
         }
+    })
 
 
 class StoreDetailResponse(BaseModel):
@@ -109,8 +106,7 @@ class StoreDetailResponse(BaseModel):
     tiene_estacionamiento: bool = Field(False, description="Si tiene estacionamiento")
     nombre_completo: str = Field(..., description="Nombre completo de la tienda")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
 
 class StoreSearchResponse(BaseModel):
@@ -120,22 +116,21 @@ class StoreSearchResponse(BaseModel):
     termino_busqueda: str = Field(..., description="Término de búsqueda utilizado")
     tiempo_respuesta_ms: Optional[int] = Field(None, description="Tiempo de respuesta en milisegundos")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "tiendas": [
-                    {
-                        "id": "123e4567-e89b-12d3-a456-426614174000",
-                        "nombre": "Jumbo Ñuñoa",
-                        "supermercado": "Jumbo",
-                        "comuna": "Ñuñoa",
-                        "direccion": "Av. Irarrázaval 4750"
-                    }
-                ],
-                "total": 5,
-                "termino_busqueda": "Ñuñoa"
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "tiendas": [
+                {
+                    "id": "123e4567-e89b-12d3-a456-426614174000",
+                    "nombre": "Jumbo Ñuñoa",
+                    "supermercado": "Jumbo",
+                    "comuna": "Ñuñoa",
+                    "direccion": "Av. Irarrázaval 4750"
+                }
+            ],
+            "total": 5,
+            "termino_busqueda": "Ñuñoa"
         }
+    })
 
 
 class NearbyStoresResponse(BaseModel):
@@ -146,43 +141,41 @@ class NearbyStoresResponse(BaseModel):
     radio_km: float = Field(..., description="Radio de búsqueda utilizado")
     filtros_aplicados: Dict[str, Any] = Field(..., description="Filtros aplicados")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "tiendas": [
-                    {
-                        "id": "123e4567-e89b-12d3-a456-426614174000",
-                        "nombre": "Jumbo Ñuñoa",
-                        "supermercado": "Jumbo",
-                        "distancia_km": 2.5,
-                        "tiempo_estimado": 8
-                    }
-                ],
-                "total": 15,
-                "ubicacion_busqueda": {"lat": -33.4489, "lon": -70.6693},
-                "radio_km": 10.0
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "tiendas": [
+                {
+                    "id": "123e4567-e89b-12d3-a456-426614174000",
+                    "nombre": "Jumbo Ñuñoa",
+                    "supermercado": "Jumbo",
+                    "distancia_km": 2.5,
+                    "tiempo_estimado": 8
+                }
+            ],
+            "total": 15,
+            "ubicacion_busqueda": {"lat": -33.4489, "lon": -70.6693},
+            "radio_km": 10.0
         }
+    })
 
 
 class StoreServicesRequest(BaseModel):
     """Request para tiendas con servicios específicos"""
-    servicios: List[str] = Field(..., min_items=1, description="Lista de servicios requeridos")
+    servicios: List[str] = Field(..., min_length=1, description="Lista de servicios requeridos")
     lat: Optional[float] = Field(None, ge=-90, le=90, description="Latitud")
     lon: Optional[float] = Field(None, ge=-180, le=180, description="Longitud")
     radio_km: float = Field(10.0, ge=0.1, le=50, description="Radio de búsqueda")
     limite: int = Field(50, ge=1, le=100, description="Número máximo de resultados")
     
-    class Config(Config):
-        json_schema_extra = {
-            "example": {
-                "servicios": ["farmacia", "panaderia"],
-                "lat": -33.4489,
-                "lon": -70.6693,
-                "radio_km": 5.0,
-                "limite": 20
-            }
+    model_config = ConfigDict(**BASE_MODEL_CONFIG, json_schema_extra={
+        "example": {
+            "servicios": ["farmacia", "panaderia"],
+            "lat": -33.4489,
+            "lon": -70.6693,
+            "radio_km": 5.0,
+            "limite": 20
         }
+    })
 
 
 class StoreServicesResponse(BaseModel):
@@ -192,8 +185,7 @@ class StoreServicesResponse(BaseModel):
     total: int = Field(..., description="Total de tiendas encontradas")
     ubicacion: Optional[Dict[str, float]] = Field(None, description="Ubicación utilizada")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
 
 class SupermarketResponse(BaseModel):
@@ -209,8 +201,7 @@ class SupermarketResponse(BaseModel):
     pickup_disponible: bool = Field(True, description="Si tiene pickup")
     total_tiendas: int = Field(0, description="Total de tiendas")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
 
 class SupermarketsListResponse(BaseModel):
@@ -218,6 +209,5 @@ class SupermarketsListResponse(BaseModel):
     supermercados: List[SupermarketResponse] = Field(..., description="Lista de supermercados")
     total: int = Field(..., description="Total de supermercados")
     
-    class Config(Config):
-        pass
+    model_config = BASE_MODEL_CONFIG
 
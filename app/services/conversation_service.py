@@ -21,15 +21,17 @@ import json
 import logging
 import math
 import numpy as np
-from collections import deque
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any, Union
 from dataclasses import dataclass, asdict
 from enum import Enum
 import uuid
 import asyncio
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from contextlib import asynccontextmanager
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.database import build_async_engine
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO)
@@ -112,32 +114,31 @@ class DriftDetectionResult:
 
 class WeightedMovingAverage:
     """
-    Implementa sistema de promedio móvil ponderado con pesos exponenciales
+    Implementa sistema de promedio móvil ponderado con pesos exponenciales.
+    
+    Usa la forma recursiva del descuento geométrico, manteniendo solo dos
+    acumuladores por métrica en lugar de la serie completa:
+    
+        omega = (1 - alpha) * omega + w * valor
+        Omega = (1 - alpha) * Omega + w
+        promedio = omega / Omega
+    
+    donde ``w`` es el peso por antigüedad del nuevo dato.
     """
     
     def __init__(self, window_size: int = 20, alpha: float = 0.3):
-        self.window_size = window_size
+        self.window_size = window_size  # Horizonte efectivo aproximado (referencial)
         self.alpha = alpha  # Factor de suavizado exponencial
-        self.data_points = deque(maxlen=window_size)
-        self.weights = self._calculate_weights()
-    
-    def _calculate_weights(self) -> np.ndarray:
-        """Calcula pesos exponenciales: más reciente = más importante"""
-        weights = []
-        for i in range(self.window_size):
-            weight = self.alpha * (1 - self.alpha) ** i
-            weights.append(weight)
-        return np.array(weights[::-1])  # Invertir para que el más reciente tenga mayor peso
+        self.decay = 1 - alpha
+        self.weighted_sum = 0.0  # omega
+        self.total_weight = 0.0  # Omega
     
     def update(self, new_value: float, timestamp: datetime) -> float:
-        """Actualiza con nuevo valor y retorna promedio ponderado"""
+        """Actualiza con nuevo valor en O(1) y retorna promedio ponderado"""
         age_weight = self._calculate_age_weight(timestamp)
         
-        self.data_points.append({
-            'value': new_value,
-            'timestamp': timestamp,
-            'age_weight': age_weight
-        })
+        self.weighted_sum = self.decay * self.weighted_sum + age_weight * new_value
+        self.total_weight = self.decay * self.total_weight + age_weight
         
         return self._calculate_weighted_average()
     
@@ -150,20 +151,8 @@ class WeightedMovingAverage:
         return math.exp(-age_hours / 168)  # Half-life de 1 semana
     
     def _calculate_weighted_average(self) -> float:
-        """Calcula promedio ponderado de los datos actuales"""
-        if not self.data_points:
-            return 0.0
-        
-        total_weight = 0.0
-        weighted_sum = 0.0
-        
-        for i, point in enumerate(self.data_points):
-            if i < len(self.weights):
-                weight = self.weights[i] * point['age_weight']
-                weighted_sum += point['value'] * weight
-                total_weight += weight
-        
-        return weighted_sum / total_weight if total_weight > 0 else 0.0
+        """Calcula promedio ponderado a partir de los acumuladores"""
+        return self.weighted_sum / self.total_weight if self.total_weight > 0 else 0.0
 
 
 class LocationHasher:
@@ -341,7 +330,8 @@ class DriftDetector:
         try:
             # Calcular distancia de Mahalanobis
             diff = new_features - mean_vector
-            mahalanobis_distance = np.sqrt(diff.T @ np.linalg.inv(cov_matrix) @ diff)
+            # solve evita invertir la covarianza explícitamente
+            mahalanobis_distance = np.sqrt(diff @ np.linalg.solve(cov_matrix, diff))
             
             # Threshold basado en distribución chi-cuadrado (6 variables, 95% confianza)
             threshold = 12.59
@@ -542,41 +532,31 @@ class ConversationService:
     - Aprender adaptativamente de las interacciones del usuario
     """
     
-    def __init__(self, database_session=None, database_url: str = None):
+    def __init__(self, database_url: str = None, session_factory=None):
         """
         Inicializar ConversationService
         
+        Los métodos públicos aceptan una sesión ``session`` adquirida por
+        request; la fábrica solo se usa cuando no se entrega una.
+        
         Args:
-            database_session: Sesión de base de datos existente (preferido)
             database_url: URL de base de datos (fallback)
+            session_factory: Fábrica de sesiones asíncronas (p. ej. AsyncSessionLocal)
         """
-        if database_session is not None:
-            # Usar sesión existente
-            self.db_session = database_session
-            self.engine = database_session.bind
-            self.SessionLocal = None  # No necesario cuando usamos sesión existente
+        self._owns_engine = False
+        if session_factory is not None:
+            self.engine = None
+            self.SessionLocal = session_factory
         else:
-            # Crear nueva conexión
+            # Crear engine asíncrono propio
             self.database_url = database_url or "sqlite:///conversation_context.db"
-            self.engine = create_engine(self.database_url)
-            self.SessionLocal = sessionmaker(bind=self.engine)
-            self.db_session = None
+            self.engine = build_async_engine(self.database_url)
+            self.SessionLocal = async_sessionmaker(
+                self.engine, class_=AsyncSession, expire_on_commit=False
+            )
+            self._owns_engine = True
         
-
-    def get_session(self):
-        """Obtener sesión de base de datos"""
-        if self.db_session is not None:
-            return self.db_session
-        elif self.SessionLocal is not None:
-            return self.SessionLocal()
-        else:
-            raise Exception("No hay sesión de base de datos disponible")
-    
-    def close_session(self, session):
-        """Cerrar sesión si fue creada por este servicio"""
-        if self.SessionLocal is not None and session != self.db_session:
-            session.close()
-                # Componentes del sistema
+        # Componentes del sistema
         self.drift_detector = DriftDetector()
         self.seasonal_analyzer = SeasonalAnalyzer()
         self.location_hasher = LocationHasher()
@@ -619,14 +599,30 @@ class ConversationService:
         }
         
         logger.info("ConversationService inicializado correctamente")
+
+    @asynccontextmanager
+    async def _session_scope(self, session=None):
+        """Usar la sesión del request si existe; si no, abrir una propia"""
+        if session is not None:
+            yield session
+        else:
+            async with self.SessionLocal() as own_session:
+                yield own_session
+
+    async def close(self):
+        """Liberar los recursos de base de datos propios del servicio"""
+        if self._owns_engine and self.engine is not None:
+            await self.engine.dispose()
     
-    async def process_user_interaction(self, user_id: str, interaction_data: Dict) -> Dict[str, Any]:
+    async def process_user_interaction(self, user_id: str, interaction_data: Dict,
+                                       session=None) -> Dict[str, Any]:
         """
         Procesa una nueva interacción del usuario y actualiza el contexto
         
         Args:
             user_id: Identificador único del usuario
             interaction_data: Datos de la interacción (productos, ubicación, decisión, etc.)
+            session: Sesión asíncrona del request (opcional)
         
         Returns:
             Dict con contexto actualizado y recomendaciones
@@ -646,21 +642,21 @@ class ConversationService:
             )
             
             # Cargar o crear perfil de usuario
-            user_profile = await self._load_or_create_user_profile(user_id)
+            user_profile = await self._load_or_create_user_profile(user_id, session=session)
             
             # Detectar cambios de contexto
             drift_result = await self._detect_context_drift(interaction, user_profile)
             
             # Actualizar contexto según resultado de detección
             updated_context = await self._update_user_context(
-                user_profile, interaction, drift_result
+                user_profile, interaction, drift_result, session=session
             )
             
             # Guardar interacción en base de datos
-            await self._save_interaction(interaction)
+            await self._save_interaction(interaction, session=session)
             
             # Actualizar cache anónimo si es apropiado
-            await self._update_anonymous_cache(interaction)
+            await self._update_anonymous_cache(interaction, session=session)
             
             # Generar respuesta contextual
             response = await self._generate_contextual_response(
@@ -675,9 +671,9 @@ class ConversationService:
             logger.error(f"Error procesando interacción para usuario {user_id}: {str(e)}")
             raise
     
-    async def _load_or_create_user_profile(self, user_id: str) -> Dict[str, Any]:
+    async def _load_or_create_user_profile(self, user_id: str, session=None) -> Dict[str, Any]:
         """Carga perfil existente o crea uno nuevo"""
-        async with self.SessionLocal() as session:
+        async with self._session_scope(session) as session:
             # Buscar usuario existente
             query = text("""
                 SELECT user_id, session_id, created_at, expires_at, is_temporary, privacy_consent
@@ -689,14 +685,14 @@ class ConversationService:
             
             if user_row:
                 # Usuario existente - cargar contexto completo
-                return await self._load_full_user_context(user_row.user_id)
+                return await self._load_full_user_context(user_row.user_id, session=session)
             else:
                 # Usuario nuevo - crear perfil
-                return await self._create_new_user_profile(user_id)
+                return await self._create_new_user_profile(user_id, session=session)
     
-    async def _load_full_user_context(self, user_id: str) -> Dict[str, Any]:
+    async def _load_full_user_context(self, user_id: str, session=None) -> Dict[str, Any]:
         """Carga el contexto completo del usuario desde la base de datos"""
-        async with self.SessionLocal() as session:
+        async with self._session_scope(session) as session:
             # Cargar anclas contextuales
             anchors_query = text("""
                 SELECT anchor_name, anchor_value, confidence_score, 
@@ -750,9 +746,9 @@ class ConversationService:
                 "context_history": []
             }
     
-    async def _create_new_user_profile(self, user_id: str) -> Dict[str, Any]:
+    async def _create_new_user_profile(self, user_id: str, session=None) -> Dict[str, Any]:
         """Crea un nuevo perfil de usuario"""
-        async with self.SessionLocal() as session:
+        async with self._session_scope(session) as session:
             # Crear registro de usuario
             user_insert = text("""
                 INSERT INTO usuarios (user_id, session_id, created_at, expires_at, is_temporary)
@@ -1038,7 +1034,8 @@ class ConversationService:
     
     async def _update_user_context(self, user_profile: Dict[str, Any], 
                                  interaction: UserInteraction,
-                                 drift_result: DriftDetectionResult) -> Dict[str, Any]:
+                                 drift_result: DriftDetectionResult,
+                                 session=None) -> Dict[str, Any]:
         """Actualiza el contexto del usuario basado en la nueva interacción y drift detectado"""
         
         anchors = user_profile["anchors"]
@@ -1059,11 +1056,11 @@ class ConversationService:
             await self._update_anchors_normal(anchors, interaction)
         
         # Guardar anclas actualizadas en base de datos
-        await self._save_updated_anchors(user_profile["user_id"], anchors)
+        await self._save_updated_anchors(user_profile["user_id"], anchors, session=session)
         
         # Registrar cambio de contexto si es necesario
         if drift_result.has_drift:
-            await self._log_context_change(user_profile["user_id"], drift_result)
+            await self._log_context_change(user_profile["user_id"], drift_result, session=session)
         
         return {
             "user_id": user_profile["user_id"],
@@ -1234,9 +1231,10 @@ class ConversationService:
             # Para otros tipos, usar nuevo valor si blend_ratio > 0.5
             return new_value if blend_ratio > 0.5 else old_value
     
-    async def _save_updated_anchors(self, user_id: str, anchors: Dict[str, ContextualAnchor]):
+    async def _save_updated_anchors(self, user_id: str, anchors: Dict[str, ContextualAnchor],
+                                    session=None):
         """Guarda anclas actualizadas en la base de datos"""
-        async with self.SessionLocal() as session:
+        async with self._session_scope(session) as session:
             for anchor_name, anchor in anchors.items():
                 if anchor.current_value is not None:
                     # Upsert anchor
@@ -1266,9 +1264,9 @@ class ConversationService:
             
             await session.commit()
     
-    async def _save_interaction(self, interaction: UserInteraction):
+    async def _save_interaction(self, interaction: UserInteraction, session=None):
         """Guarda interacción en la base de datos"""
-        async with self.SessionLocal() as session:
+        async with self._session_scope(session) as session:
             # Crear hash de ubicación para anonimización
             location_hash_data = self.location_hasher.create_location_hash(
                 interaction.ubicacion[0], interaction.ubicacion[1]
@@ -1359,12 +1357,12 @@ class ConversationService:
         else:
             return "very_low"
     
-    async def _update_anonymous_cache(self, interaction: UserInteraction):
+    async def _update_anonymous_cache(self, interaction: UserInteraction, session=None):
         """Actualiza cache anónimo con la interacción"""
         # Solo actualizar cache si la interacción es suficientemente común
         interaction_hash = self._create_interaction_hash(interaction)
         
-        async with self.SessionLocal() as session:
+        async with self._session_scope(session) as session:
             # Verificar si ya existe en cache
             check_query = text("""
                 SELECT cache_id, usage_count FROM anonymous_cache 
@@ -1425,9 +1423,10 @@ class ConversationService:
             
             await session.commit()
     
-    async def _log_context_change(self, user_id: str, drift_result: DriftDetectionResult):
+    async def _log_context_change(self, user_id: str, drift_result: DriftDetectionResult,
+                                  session=None):
         """Registra cambio de contexto en la base de datos"""
-        async with self.SessionLocal() as session:
+        async with self._session_scope(session) as session:
             insert_query = text("""
                 INSERT INTO context_changes 
                 (user_id, change_type, detection_algorithm, change_magnitude, 
@@ -1674,10 +1673,10 @@ class ConversationService:
         else:
             return "low"
     
-    async def get_user_context_summary(self, user_id: str) -> Dict[str, Any]:
+    async def get_user_context_summary(self, user_id: str, session=None) -> Dict[str, Any]:
         """Obtiene resumen del contexto del usuario para el GPT"""
         try:
-            user_profile = await self._load_or_create_user_profile(user_id)
+            user_profile = await self._load_or_create_user_profile(user_id, session=session)
             context_summary = self._generate_context_summary(user_profile)
             
             return {
@@ -1696,9 +1695,9 @@ class ConversationService:
                 "profile_exists": False
             }
     
-    async def cleanup_expired_data(self):
+    async def cleanup_expired_data(self, session=None):
         """Limpia datos expirados según políticas de retención"""
-        async with self.SessionLocal() as session:
+        async with self._session_scope(session) as session:
             try:
                 # Limpiar usuarios temporales expirados
                 cleanup_users_query = text("""
@@ -1742,8 +1741,6 @@ def create_conversation_service(database_url: str = None) -> ConversationService
 
 # Ejemplo de uso
 if __name__ == "__main__":
-    import asyncio
-    
     async def example_usage():
         """Ejemplo de uso del ConversationService"""
         
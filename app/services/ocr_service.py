@@ -1,9 +1,14 @@
 """Servicio OCR para extraer texto de imágenes"""
 import io
 import logging
+import os
+import queue
+import threading
 import time
 import unicodedata
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, Optional, Union
 
 try:
     from PIL import Image
@@ -12,16 +17,52 @@ except Exception:  # pragma: no cover - dependencias opcionales
     Image = None
     pytesseract = None
 
+try:
+    from tesserocr import PyTessBaseAPI
+except Exception:  # pragma: no cover - dependencia opcional (requiere libtesseract)
+    PyTessBaseAPI = None
+
 from sqlalchemy.orm import Session
 
+from app.core.database import SessionLocal
 from app.services.product_service import product_service
 
 logger = logging.getLogger(__name__)
 
+# Un worker y una instancia de Tesseract por CPU
+OCR_POOL_SIZE = os.cpu_count() or 1
+
 
 class OCRService:
     """Servicio que utiliza Tesseract para extraer texto de imágenes"""
 
+    def __init__(self):
+        # Executor dedicado: el OCR no compite con el threadpool por defecto
+        self.executor = ThreadPoolExecutor(max_workers=OCR_POOL_SIZE, thread_name_prefix="ocr")
+        self._tess_pool: Optional[queue.Queue] = None
+        self._tess_lock = threading.Lock()
+
+    @contextmanager
+    def _tess_api(self) -> Iterator["PyTessBaseAPI"]:
+        """
+        Toma una instancia persistente de tesserocr del pool (se crean una
+        sola vez) y la devuelve al terminar. Evita lanzar un proceso de
+        Tesseract por imagen como hace pytesseract.
+        """
+        if self._tess_pool is None:
+            with self._tess_lock:
+                if self._tess_pool is None:
+                    pool: queue.Queue = queue.Queue()
+                    for _ in range(OCR_POOL_SIZE):
+                        pool.put(PyTessBaseAPI(lang="spa"))
+                    self._tess_pool = pool
+        api = self._tess_pool.get()
+        try:
+            yield api
+        finally:
+            api.Clear()
+            self._tess_pool.put(api)
+
     @staticmethod
     def _check_dependencies() -> None:
         if Image is None or pytesseract is None:
@@ -34,23 +75,33 @@ class OCRService:
         without_accents = "".join(c for c in normalized if not unicodedata.combining(c))
         return without_accents.upper()
 
-    def extract_text(self, image_bytes: bytes) -> str:
-        """Extrae texto desde una imagen usando Tesseract"""
+    def extract_text(self, image: Union[bytes, BinaryIO]) -> str:
+        """
+        Extrae texto desde una imagen usando Tesseract.
+        Acepta bytes o un archivo binario (p.ej. el SpooledTemporaryFile de
+        un UploadFile) para no cargar la imagen completa en memoria.
+        """
         self._check_dependencies()
-        start_time = time.time()
+        start_time = time.perf_counter()
         try:
-            image = Image.open(io.BytesIO(image_bytes))
-            text = pytesseract.image_to_string(image, lang="spa")
+            source = io.BytesIO(image) if isinstance(image, (bytes, bytearray)) else image
+            image = Image.open(source)
+            if PyTessBaseAPI is not None:
+                with self._tess_api() as api:
+                    api.SetImage(image)
+                    text = api.GetUTF8Text()
+            else:
+                text = pytesseract.image_to_string(image, lang="spa")
             normalized = self.normalize_text(text)
-            logger.info("OCR procesado en %.3fs", time.time() - start_time)
+            logger.info("OCR procesado en %.3fs", time.perf_counter() - start_time)
             return normalized
         except Exception as exc:  # pragma: no cover - errores de OCR
             logger.error("Error procesando imagen OCR: %s", exc)
             raise
 
-    def extract_products_from_image(self, image_bytes: bytes, db: Session) -> List[dict]:
+    def extract_products_from_image(self, image: Union[bytes, BinaryIO], db: Session) -> List[dict]:
         """Obtiene productos coincidentes a partir del texto extraído"""
-        text = self.extract_text(image_bytes)
+        text = self.extract_text(image)
         lines = [line.strip() for line in text.splitlines() if line.strip()]
         products: List[dict] = []
         for line in lines:
@@ -59,6 +110,14 @@ class OCRService:
                 products.append(result["productos"][0])
         return products
 
+    def extract_products_isolated(self, image: Union[bytes, BinaryIO]) -> List[dict]:
+        """
+        Igual que extract_products_from_image pero con una sesión propia,
+        para ejecutarse en un hilo (las sesiones no son thread-safe)
+        """
+        with SessionLocal() as db:
+            return self.extract_products_from_image(image, db)
+
 
 # Instancia global del servicio
 ocr_service = OCRService()
@@ -1,16 +1,17 @@
 """Servicio de precios con comparación y análisis"""
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 from datetime import datetime, timedelta
 import json
 import logging
 
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.repositories.price_repository import price_repository
 from app.services.product_service import product_service
 from app.services.store_service import store_service
-from app.core.cache import cache, cache_price_key
+from app.core.cache import cache, cache_price_key, sql_cache
 from app.core.config import settings
 from openai_client import consulta_gpt
 
@@ -73,9 +74,10 @@ class PriceService:
             )
             return False
     
-    def compare_prices(
+    @sql_cache(ttl=settings.CACHE_TTL_PRICES, product_arg="product_id")
+    async def compare_prices(
         self,
-        db: Session,
+        db: AsyncSession,
         product_id: UUID,
         lat: Optional[float] = None,
         lon: Optional[float] = None,
@@ -85,26 +87,75 @@ class PriceService:
         """
         Comparar precios de un producto entre diferentes tiendas
         """
-        cache_key = f"price_comparison:{product_id}:{lat}:{lon}:{radio_km}:{incluir_mayoristas}"
-        
-        # Intentar obtener del cache
-        cached_comparison = self.cache.get(cache_key)
-        if cached_comparison:
-            return cached_comparison
-        
-        # Obtener información del producto
-        product_info = self.product_service.get_product_by_id(db, product_id)
+        # Producto (normalmente desde cache); sin producto no hay comparación
+        product_info = await self.product_service.get_product_by_id_async(db, product_id)
         if not product_info:
             return {
                 "error": "Producto no encontrado",
                 "product_id": str(product_id)
             }
-        
-        # Obtener comparación de precios
-        comparison_data = self.price_repo.get_price_comparison(
-            db, product_id, lat, lon, radio_km, incluir_mayoristas
+
+        comparison_data = await db.run_sync(
+            self.price_repo.get_price_comparison,
+            product_id, lat, lon, radio_km, incluir_mayoristas
         )
 
+        return self._format_comparison(
+            product_id, product_info, comparison_data,
+            lat, lon, radio_km, incluir_mayoristas
+        )
+
+    async def compare_prices_batch(
+        self,
+        db: AsyncSession,
+        product_ids: List[UUID],
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        radio_km: float = 10.0,
+        incluir_mayoristas: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Comparar precios de varios productos con una sola consulta de precios
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+
+        products_info = await self.product_service.get_products_by_ids_async(db, product_ids)
+        found_ids = [pid for pid in product_ids if str(pid) in products_info]
+
+        comparisons_data = {}
+        if found_ids:
+            comparisons_data = await db.run_sync(
+                self.price_repo.get_price_comparisons,
+                found_ids, lat, lon, radio_km, incluir_mayoristas
+            )
+
+        comparaciones = [
+            self._format_comparison(
+                pid, products_info[str(pid)], comparisons_data[str(pid)],
+                lat, lon, radio_km, incluir_mayoristas
+            )
+            for pid in found_ids
+        ]
+
+        return {
+            "comparaciones": comparaciones,
+            "no_encontrados": [str(pid) for pid in product_ids if str(pid) not in products_info],
+            "total_productos": len(comparaciones)
+        }
+
+    def _format_comparison(
+        self,
+        product_id: UUID,
+        product_info: Dict[str, Any],
+        comparison_data: Dict[str, Any],
+        lat: Optional[float],
+        lon: Optional[float],
+        radio_km: float,
+        incluir_mayoristas: bool
+    ) -> Dict[str, Any]:
+        """
+        Formatear la comparación de precios de un producto para la API
+        """
         # Manejar caso sin precios disponibles
         if not comparison_data["prices"]:
             result = {
@@ -132,7 +183,6 @@ class PriceService:
                     "incluir_mayoristas": incluir_mayoristas
                 }
             }
-            self.cache.set(cache_key, result, settings.CACHE_TTL_PRICES)
             return result
 
         # Formatear respuesta
@@ -198,38 +248,34 @@ class PriceService:
             }
         }
         
-        # Guardar en cache
-        self.cache.set(cache_key, result, settings.CACHE_TTL_PRICES)
-        
         return result
     
-    def get_best_deals(
+    @sql_cache(ttl=settings.CACHE_TTL_PRICES)
+    async def get_best_deals(
         self,
-        db: Session,
+        db: AsyncSession,
         min_descuento: float = 20.0,
         lat: Optional[float] = None,
         lon: Optional[float] = None,
         radio_km: float = 10.0,
         limite: int = 50
-    ) -> List[Dict[str, Any]]:
+    ) -> Tuple[List[Dict[str, Any]], float]:
         """
-        Obtener las mejores ofertas disponibles
+        Obtener las mejores ofertas disponibles junto con el ahorro total
+        de la página, acumulado en la misma pasada de formateo
         """
-        cache_key = f"best_deals:{min_descuento}:{lat}:{lon}:{radio_km}:{limite}"
-        
-        # Intentar obtener del cache
-        cached_deals = self.cache.get(cache_key)
-        if cached_deals:
-            return cached_deals
-        
         # Obtener ofertas de la base de datos
-        deals_data = self.price_repo.get_products_with_best_discounts(
-            db, min_descuento, lat, lon, radio_km, limite
+        deals_data = await db.run_sync(
+            self.price_repo.get_products_with_best_discounts,
+            min_descuento, lat, lon, radio_km, limite
         )
         
         # Formatear respuesta
         formatted_deals = []
+        total_savings = 0.0
         for deal in deals_data:
+            savings = float(deal['normal_price'] - deal['discount_price'])
+            total_savings += savings
             deal_info = {
                 "producto": {
                     "id": str(deal['product_id']),
@@ -239,7 +285,7 @@ class PriceService:
                 "precio_normal": float(deal['normal_price']),
                 "precio_descuento": float(deal['discount_price']),
                 "porcentaje_descuento": float(deal['discount_percentage']),
-                "ahorro": float(deal['normal_price'] - deal['discount_price']),
+                "ahorro": savings,
                 "tienda": {
                     "id": str(deal['store_id']),
                     "nombre": deal['store_name'],
@@ -257,14 +303,13 @@ class PriceService:
             
             formatted_deals.append(deal_info)
         
-        # Guardar en cache
-        self.cache.set(cache_key, formatted_deals, settings.CACHE_TTL_PRICES)
-        
-        return formatted_deals
+        return formatted_deals, total_savings
     
-    def get_price_history(
+    # Historial cambia menos: cache por más tiempo
+    @sql_cache(ttl=settings.CACHE_TTL_PRICES * 2, product_arg="product_id")
+    async def get_price_history(
         self,
-        db: Session,
+        db: AsyncSession,
         product_id: UUID,
         store_id: UUID,
         dias: int = 30
@@ -272,16 +317,10 @@ class PriceService:
         """
         Obtener historial de precios de un producto en una tienda
         """
-        cache_key = f"price_history:{product_id}:{store_id}:{dias}"
-        
-        # Intentar obtener del cache
-        cached_history = self.cache.get(cache_key)
-        if cached_history:
-            return cached_history
-        
-        # Obtener información del producto y tienda
-        product_info = self.product_service.get_product_by_id(db, product_id)
-        store_info = self.store_service.get_store_by_id(db, store_id)
+        # Secuencial sobre la sesión del request: producto y tienda suelen
+        # salir del cache y el historial solo se consulta si ambos existen
+        product_info = await self.product_service.get_product_by_id_async(db, product_id)
+        store_info = await self.store_service.get_store_by_id_async(db, store_id)
         
         if not product_info or not store_info:
             return {
@@ -290,8 +329,9 @@ class PriceService:
                 "store_id": str(store_id)
             }
         
-        # Obtener historial
-        history_data = self.price_repo.get_price_history(db, product_id, store_id, dias)
+        history_data = await db.run_sync(
+            self.price_repo.get_price_history, product_id, store_id, dias
+        )
         
         # Formatear historial
         formatted_history = []
@@ -325,18 +365,50 @@ class PriceService:
         else:
             statistics = {}
         
-        result = {
+        return {
             "producto": product_info,
             "tienda": store_info,
             "historial": formatted_history,
             "estadisticas": statistics,
             "periodo_dias": dias
         }
+    
+    async def get_price_trends(
+        self,
+        db: AsyncSession,
+        product_id: UUID
+    ) -> Dict[str, Any]:
+        """
+        Obtener tendencias de precio de un producto por comuna
+        """
+        product_info = await self.product_service.get_product_by_id_async(db, product_id)
+        if not product_info:
+            return {
+                "error": "Producto no encontrado",
+                "product_id": str(product_id)
+            }
         
-        # Guardar en cache por más tiempo (historial cambia menos)
-        self.cache.set(cache_key, result, settings.CACHE_TTL_PRICES * 2)
+        trends_data = await db.run_sync(self.price_repo.get_commune_trends, product_id)
         
-        return result
+        tendencias = [
+            {
+                "ranking": position,
+                "comuna": trend['commune'],
+                "total_tiendas": trend['store_count'],
+                "precio_promedio": float(trend['avg_effective_price']),
+                "precio_promedio_normal": float(trend['avg_normal_price']),
+                "precio_minimo": float(trend['min_price']),
+                "precio_maximo": float(trend['max_price'])
+            }
+            for position, trend in enumerate(trends_data, start=1)
+        ]
+        
+        return {
+            "producto_id": str(product_id),
+            "producto": product_info["nombre_completo"],
+            "tendencias_por_comuna": tendencias,
+            "actualizado_en": trends_data[0]['refreshed_at'].isoformat() if trends_data else None
+        }
     
     def _generate_recommendation(
         self,
@@ -1,18 +1,37 @@
 """
 Servicio de productos con lógica de negocio
 """
-from typing import List, Optional, Dict, Any
+import base64
+import json
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 
 from app.repositories.product_repository import product_repository
 from app.repositories.price_repository import price_repository
-from app.core.cache import cache, cache_product_key, cache_search_key
+from app.core.cache import cache, cache_product_key, cache_search_key, version_etag
 from app.core.config import settings
 from app.utils.sanitizer import sanitize_text
 
 
+def encode_search_cursor(relevance: float, product_id: UUID, total: int) -> str:
+    """Cursor opaco con la clave (relevancia, id) de la última fila y el total"""
+    raw = json.dumps([relevance, str(product_id), total], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, UUID, int]:
+    """Inverso de encode_search_cursor; ValueError si el cursor no es válido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        relevance, product_id, total = json.loads(base64.urlsafe_b64decode(padded))
+        return float(relevance), UUID(product_id), int(total)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("cursor") from exc
+
+
 class ProductService:
     """Servicio de productos con cache y lógica de negocio"""
     
@@ -21,9 +40,9 @@ class ProductService:
         self.price_repo = price_repository
         self.cache = cache
 
-    def get_products(
+    async def get_products(
         self,
-        db: Session,
+        db: AsyncSession,
         category_id: Optional[UUID] = None,
         limit: int = 50,
         skip: int = 0
@@ -37,10 +56,23 @@ class ProductService:
         }
         cache_key = cache_search_key("products_list", filters)
 
-        cached_products = self.cache.get(cache_key)
+        cached_products = await self.cache.get(cache_key)
         if cached_products:
             return cached_products
 
+        result = await db.run_sync(self._load_products_page, category_id, limit, skip)
+
+        await self.cache.set(cache_key, result, settings.CACHE_TTL_PRODUCTS)
+        return result
+
+    def _load_products_page(
+        self,
+        db: Session,
+        category_id: Optional[UUID],
+        limit: int,
+        skip: int
+    ) -> List[Dict[str, Any]]:
+        """Cargar y formatear una página de productos activos"""
         db_filters = {}
         if category_id:
             db_filters["category_id"] = category_id
@@ -49,7 +81,7 @@ class ProductService:
             db, skip=skip, limit=limit, filters=db_filters
         )
 
-        result = [
+        return [
             {
                 "id": str(p.id),
                 "nombre": p.name,
@@ -64,9 +96,6 @@ class ProductService:
             for p in products
         ]
 
-        self.cache.set(cache_key, result, settings.CACHE_TTL_PRODUCTS)
-        return result
-
     def search_products(
         self,
         db: Session,
@@ -78,44 +107,53 @@ class ProductService:
         lon: Optional[float] = None,
         radio_km: float = 10.0,
         limite: int = 50,
-        skip: int = 0
+        skip: int = 0,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Búsqueda inteligente de productos con cache
+        Búsqueda inteligente de productos sobre una sesión síncrona.
+        No usa cache (el cliente Redis es asíncrono): ver search_products_async.
+        
+        Con `cursor` (el `siguiente_cursor` de la página anterior) se pagina por
+        keyset y se ignora `skip`.
         """
         search_term = sanitize_text(search_term)
         if not search_term:
             raise HTTPException(status_code=422, detail="search_term")
 
-        # Generar clave de cache
-        filters = {
-            'category_id': str(category_id) if category_id else None,
-            'precio_min': precio_min,
-            'precio_max': precio_max,
-            'lat': lat,
-            'lon': lon,
-            'radio_km': radio_km,
-            'limite': limite,
-            'skip': skip
-        }
-        cache_key = cache_search_key(search_term, filters)
-        
-        # Intentar obtener del cache
-        cached_result = self.cache.get(cache_key)
-        if cached_result:
-            return cached_result
-        
+        after = None
+        if cursor:
+            try:
+                last_relevance, last_id, cursor_total = decode_search_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+            after = (last_relevance, last_id)
+
         # Buscar productos
         try:
-            products = self.product_repo.search_products(
-                db, search_term, category_id, limite, skip
+            rows, total = self.product_repo.search_products(
+                db, search_term, category_id, limite, skip, after=after
             )
         except ValueError:
             raise HTTPException(status_code=422, detail="search_term")
+        products = [product for product, _ in rows]
+        if after is not None:
+            # Con keyset el COUNT(*) OVER() solo ve las filas restantes
+            total = cursor_total
+        next_cursor = (
+            encode_search_cursor(rows[-1][1], rows[-1][0].id, total)
+            if len(rows) == limite else None
+        )
+        
+        # Precios actuales de todos los productos en una sola consulta
+        prices_by_product = self.price_repo.get_current_prices_for_products(
+            db, [product.id for product in products], lat, lon, radio_km
+        ) if products else {}
         
         # Enriquecer con información de precios
         enriched_products = []
         for product in products:
+            current_prices = prices_by_product.get(str(product.id), [])
             product_data = {
                 "id": str(product.id),
                 "nombre": product.name,
@@ -129,9 +167,10 @@ class ProductService:
             }
             
             # Obtener mejor precio si se proporcionan coordenadas
-            if lat is not None and lon is not None:
-                best_price = self.price_repo.get_best_price_for_product(
-                    db, product.id, lat, lon, radio_km
+            if lat is not None and lon is not None and current_prices:
+                best_price = min(
+                    current_prices,
+                    key=lambda x: x['discount_price'] or x['normal_price']
                 )
                 if best_price:
                     product_data.update({
@@ -143,10 +182,7 @@ class ProductService:
                     })
             
             # Contar tiendas disponibles
-            available_stores = len(self.price_repo.get_current_prices_for_product(
-                db, product.id, lat, lon, radio_km
-            ))
-            product_data["tiendas_disponibles"] = available_stores
+            product_data["tiendas_disponibles"] = len(current_prices)
             
             enriched_products.append(product_data)
         
@@ -162,10 +198,14 @@ class ProductService:
                         continue
                 filtered_products.append(product)
             enriched_products = filtered_products
+            # El rango de precios se filtra después de paginar: el total de la
+            # base de datos ya no aplica
+            total = len(enriched_products)
         
         result = {
             "productos": enriched_products,
-            "total": len(enriched_products),
+            "total": total,
+            "siguiente_cursor": next_cursor,
             "termino_busqueda": search_term,
             "filtros_aplicados": {
                 "categoria_id": str(category_id) if category_id else None,
@@ -175,15 +215,12 @@ class ProductService:
                 "radio_km": radio_km
             }
         }
-        
-        # Guardar en cache
-        self.cache.set(cache_key, result, settings.CACHE_TTL_PRODUCTS)
 
         return result
 
     async def search_products_async(
         self,
-        db,
+        db: AsyncSession,
         search_term: str,
         category_id: Optional[UUID] = None,
         precio_min: Optional[float] = None,
@@ -193,11 +230,31 @@ class ProductService:
         radio_km: float = 10.0,
         limite: int = 50,
         skip: int = 0,
+        cursor: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Async wrapper for search_products using AsyncSession."""
-        from sqlalchemy.ext.asyncio import AsyncSession
+        """Búsqueda de productos con cache usando AsyncSession."""
+        search_term = sanitize_text(search_term)
+        if not search_term:
+            raise HTTPException(status_code=422, detail="search_term")
 
-        async_session: AsyncSession = db
+        # Generar clave de cache
+        filters = {
+            'category_id': str(category_id) if category_id else None,
+            'precio_min': precio_min,
+            'precio_max': precio_max,
+            'lat': lat,
+            'lon': lon,
+            'radio_km': radio_km,
+            'limite': limite,
+            'skip': skip,
+            'cursor': cursor
+        }
+        cache_key = cache_search_key(search_term, filters)
+
+        # Intentar obtener del cache
+        cached_result = await self.cache.get(cache_key)
+        if cached_result:
+            return cached_result
 
         def sync_call(session):
             return self.search_products(
@@ -211,31 +268,113 @@ class ProductService:
                 radio_km=radio_km,
                 limite=limite,
                 skip=skip,
+                cursor=cursor,
             )
 
-        return await async_session.run_sync(sync_call)
+        result = await db.run_sync(sync_call)
+
+        # Guardar en cache
+        await self.cache.set(cache_key, result, settings.CACHE_TTL_PRODUCTS)
+
+        return result
     
-    def get_product_by_id(
+    async def get_product_by_id_async(
         self,
-        db: Session,
+        db: AsyncSession,
         product_id: UUID
     ) -> Optional[Dict[str, Any]]:
         """
         Obtener producto por ID con cache
         """
+        entry = await self.get_product_with_etag_async(db, product_id)
+        return entry[0] if entry else None
+
+    async def get_product_with_etag_async(
+        self,
+        db: AsyncSession,
+        product_id: UUID
+    ) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        Obtener producto por ID junto con su ETag de versión (id, updated_at).
+        Ambos se cachean juntos, así un acierto no toca la base de datos.
+        """
         cache_key = cache_product_key(str(product_id))
-        
-        # Intentar obtener del cache
-        cached_product = self.cache.get(cache_key)
-        if cached_product:
-            return cached_product
-        
-        # Obtener de la base de datos
+
+        cached = await self.cache.get(cache_key)
+        if cached and "etag" in cached:
+            return cached["producto"], cached["etag"]
+
+        entry = await db.run_sync(self._load_product_entry, product_id)
+        if not entry:
+            return None
+
+        await self.cache.set(cache_key, entry, settings.CACHE_TTL_PRODUCTS)
+
+        return entry["producto"], entry["etag"]
+
+    async def get_products_by_ids_async(
+        self,
+        db: AsyncSession,
+        product_ids: List[UUID]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtener varios productos por ID, indexados por ID. Comparten las
+        entradas de cache de :meth:`get_product_with_etag_async`: los aciertos
+        se leen con un solo MGET y los faltantes salen de una sola consulta.
+        """
+        cached = await self.cache.mget([cache_product_key(str(pid)) for pid in product_ids])
+
+        products = {}
+        missing = []
+        for product_id, entry in zip(product_ids, cached):
+            if entry and "etag" in entry:
+                products[str(product_id)] = entry["producto"]
+            else:
+                missing.append(product_id)
+
+        if missing:
+            entries = await db.run_sync(self._load_product_entries, missing)
+            await self.cache.mset(
+                {cache_product_key(pid): entry for pid, entry in entries.items()},
+                settings.CACHE_TTL_PRODUCTS
+            )
+            products.update((pid, entry["producto"]) for pid, entry in entries.items())
+
+        return products
+
+    def _load_product_entries(
+        self,
+        db: Session,
+        product_ids: List[UUID]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Cargar productos activos con su ETag, indexados por ID"""
+        products = self.product_repo.get_multi_active_by_ids(db, product_ids)
+        return {
+            str(product.id): {
+                "producto": self._format_product(product),
+                "etag": version_etag(str(product.id), product.updated_at)
+            }
+            for product in products
+        }
+
+    def _load_product_entry(
+        self,
+        db: Session,
+        product_id: UUID
+    ) -> Optional[Dict[str, Any]]:
+        """Cargar y formatear un producto activo junto con su ETag"""
         product = self.product_repo.get_active(db, product_id)
         if not product:
             return None
         
-        product_data = {
+        return {
+            "producto": self._format_product(product),
+            "etag": version_etag(str(product.id), product.updated_at)
+        }
+
+    def _format_product(self, product) -> Dict[str, Any]:
+        """Formatear un producto para la API"""
+        return {
             "id": str(product.id),
             "nombre": product.name,
             "marca": product.brand,
@@ -252,11 +391,6 @@ class ProductService:
             "nombre_completo": product.full_name,
             "unidad_display": product.display_unit
         }
-        
-        # Guardar en cache
-        self.cache.set(cache_key, product_data, settings.CACHE_TTL_PRODUCTS)
-
-        return product_data
 
     def get_alternative_brand(
         self,
@@ -270,20 +404,26 @@ class ProductService:
             return None
 
         # Buscar otros productos de la misma categoría
-        alternatives = self.product_repo.get_by_category(db, product.category_id)
-        for alt in alternatives:
-            if alt.id == product.id or alt.brand == product.brand:
-                continue
+        alternatives = [
+            alt for alt in self.product_repo.get_by_category(db, product.category_id)
+            if alt.id != product.id and alt.brand != product.brand
+        ]
+        if not alternatives:
+            return None
 
-            # Verificar que la marca alternativa tenga stock disponible
-            if self.price_repo.get_current_prices_for_product(db, alt.id):
+        # Verificar stock de todas las alternativas en una sola consulta
+        prices_by_product = self.price_repo.get_current_prices_for_products(
+            db, [alt.id for alt in alternatives]
+        )
+        for alt in alternatives:
+            if prices_by_product.get(str(alt.id)):
                 return alt.brand
 
         return None
     
-    def get_popular_products(
+    async def get_popular_products(
         self,
-        db: Session,
+        db: AsyncSession,
         limite: int = 20
     ) -> List[Dict[str, Any]]:
         """
@@ -292,10 +432,23 @@ class ProductService:
         cache_key = f"popular_products:{limite}"
         
         # Intentar obtener del cache
-        cached_products = self.cache.get(cache_key)
+        cached_products = await self.cache.get(cache_key)
         if cached_products:
             return cached_products
         
+        popular_products = await db.run_sync(self._load_popular_products, limite)
+        
+        # Guardar en cache por más tiempo (productos populares cambian menos)
+        await self.cache.set(cache_key, popular_products, settings.CACHE_TTL_PRODUCTS * 2)
+        
+        return popular_products
+
+    def _load_popular_products(
+        self,
+        db: Session,
+        limite: int
+    ) -> List[Dict[str, Any]]:
+        """Cargar y formatear productos populares"""
         products = self.product_repo.get_popular_products(db, limite)
         
         popular_products = []
@@ -310,14 +463,11 @@ class ProductService:
             }
             popular_products.append(product_data)
         
-        # Guardar en cache por más tiempo (productos populares cambian menos)
-        self.cache.set(cache_key, popular_products, settings.CACHE_TTL_PRODUCTS * 2)
-        
         return popular_products
     
-    def get_products_with_discounts(
+    async def get_products_with_discounts(
         self,
-        db: Session,
+        db: AsyncSession,
         min_descuento: float = 10.0,
         lat: Optional[float] = None,
         lon: Optional[float] = None,
@@ -330,12 +480,13 @@ class ProductService:
         cache_key = f"discounted_products:{min_descuento}:{lat}:{lon}:{radio_km}:{limite}"
         
         # Intentar obtener del cache
-        cached_products = self.cache.get(cache_key)
+        cached_products = await self.cache.get(cache_key)
         if cached_products:
             return cached_products
         
-        discounted_prices = self.price_repo.get_products_with_best_discounts(
-            db, min_descuento, lat, lon, radio_km, limite
+        discounted_prices = await db.run_sync(
+            self.price_repo.get_products_with_best_discounts,
+            min_descuento, lat, lon, radio_km, limite
         )
         
         products_with_discounts = []
@@ -363,13 +514,13 @@ class ProductService:
             products_with_discounts.append(product_info)
         
         # Cache por menos tiempo (ofertas cambian frecuentemente)
-        self.cache.set(cache_key, products_with_discounts, settings.CACHE_TTL_PRICES)
+        await self.cache.set(cache_key, products_with_discounts, settings.CACHE_TTL_PRICES)
         
         return products_with_discounts
     
-    def get_product_by_barcode(
+    async def get_product_by_barcode(
         self,
-        db: Session,
+        db: AsyncSession,
         barcode: str
     ) -> Optional[Dict[str, Any]]:
         """
@@ -378,18 +529,18 @@ class ProductService:
         cache_key = f"product_barcode:{barcode}"
         
         # Intentar obtener del cache
-        cached_product = self.cache.get(cache_key)
+        cached_product = await self.cache.get(cache_key)
         if cached_product:
             return cached_product
         
-        product = self.product_repo.get_by_barcode(db, barcode)
+        product = await db.run_sync(self.product_repo.get_by_barcode, barcode)
         if not product:
             return None
         
-        product_data = self.get_product_by_id(db, product.id)
+        product_data = await self.get_product_by_id_async(db, product.id)
         
         # Guardar en cache
-        self.cache.set(cache_key, product_data, settings.CACHE_TTL_PRODUCTS)
+        await self.cache.set(cache_key, product_data, settings.CACHE_TTL_PRODUCTS)
         
         return product_data
 
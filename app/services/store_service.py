@@ -1,13 +1,14 @@
 """
 Servicio de tiendas con búsqueda geográfica y manejo de caracteres especiales
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 
 from app.repositories.store_repository import store_repository
-from app.core.cache import cache, cache_store_key
+from app.core.cache import cache, cache_store_key, version_etag
 from app.core.config import settings
 from app.utils.sanitizer import sanitize_text
 
@@ -19,9 +20,9 @@ class StoreService:
         self.store_repo = store_repository
         self.cache = cache
     
-    def search_by_commune(
+    async def search_by_commune(
         self,
-        db: Session,
+        db: AsyncSession,
         termino: str,
         limite: int = 50
     ) -> List[Dict[str, Any]]:
@@ -35,13 +36,13 @@ class StoreService:
         cache_key = f"stores_commune:{termino.lower()}:{limite}"
         
         # Intentar obtener del cache
-        cached_stores = self.cache.get(cache_key)
+        cached_stores = await self.cache.get(cache_key)
         if cached_stores:
             return cached_stores
         
         # Buscar en la base de datos
         try:
-            stores_data = self.store_repo.search_by_commune(db, termino, limite)
+            stores_data = await db.run_sync(self.store_repo.search_by_commune, termino, limite)
         except ValueError:
             raise HTTPException(status_code=422, detail="termino")
         
@@ -68,13 +69,13 @@ class StoreService:
             formatted_stores.append(store_info)
         
         # Guardar en cache
-        self.cache.set(cache_key, formatted_stores, settings.CACHE_TTL_STORES)
+        await self.cache.set(cache_key, formatted_stores, settings.CACHE_TTL_STORES)
         
         return formatted_stores
     
-    def get_nearby_stores(
+    async def get_nearby_stores(
         self,
-        db: Session,
+        db: AsyncSession,
         lat: float,
         lon: float,
         radio_km: float = 10.0,
@@ -90,18 +91,20 @@ class StoreService:
         
         # Si se especifican productos, no usar cache (muy específico)
         if not producto_ids:
-            cached_stores = self.cache.get(cache_key)
+            cached_stores = await self.cache.get(cache_key)
             if cached_stores:
                 return cached_stores
         
         # Obtener tiendas cercanas
         if producto_ids:
-            stores_data = self.store_repo.get_stores_with_products(
-                db, producto_ids, lat, lon, radio_km, limite
+            stores_data = await db.run_sync(
+                self.store_repo.get_stores_with_products,
+                producto_ids, lat, lon, radio_km, limite
             )
         else:
-            stores_data = self.store_repo.get_nearby_stores(
-                db, lat, lon, radio_km, tipo_supermercado, limite
+            stores_data = await db.run_sync(
+                self.store_repo.get_nearby_stores,
+                lat, lon, radio_km, tipo_supermercado, limite
             )
         
         # Formatear respuesta
@@ -137,31 +140,62 @@ class StoreService:
         
         # Guardar en cache solo si no se especificaron productos
         if not producto_ids:
-            self.cache.set(cache_key, formatted_stores, settings.CACHE_TTL_STORES)
+            await self.cache.set(cache_key, formatted_stores, settings.CACHE_TTL_STORES)
         
         return formatted_stores
     
-    def get_store_by_id(
+    async def get_store_by_id_async(
         self,
-        db: Session,
+        db: AsyncSession,
         store_id: UUID
     ) -> Optional[Dict[str, Any]]:
         """
         Obtener tienda por ID con información completa
         """
+        entry = await self.get_store_with_etag_async(db, store_id)
+        return entry[0] if entry else None
+
+    async def get_store_with_etag_async(
+        self,
+        db: AsyncSession,
+        store_id: UUID
+    ) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        Obtener tienda por ID junto con su ETag de versión (id, updated_at).
+        Ambos se cachean juntos, así un acierto no toca la base de datos.
+        """
         cache_key = cache_store_key(str(store_id))
-        
-        # Intentar obtener del cache
-        cached_store = self.cache.get(cache_key)
-        if cached_store:
-            return cached_store
-        
-        # Obtener de la base de datos
+
+        cached = await self.cache.get(cache_key)
+        if cached and "etag" in cached:
+            return cached["tienda"], cached["etag"]
+
+        entry = await db.run_sync(self._load_store_entry, store_id)
+        if not entry:
+            return None
+
+        await self.cache.set(cache_key, entry, settings.CACHE_TTL_STORES)
+
+        return entry["tienda"], entry["etag"]
+
+    def _load_store_entry(
+        self,
+        db: Session,
+        store_id: UUID
+    ) -> Optional[Dict[str, Any]]:
+        """Cargar y formatear una tienda activa junto con su ETag"""
         store = self.store_repo.get_active(db, store_id)
         if not store:
             return None
         
-        store_data = {
+        return {
+            "tienda": self._format_store(store),
+            "etag": version_etag(str(store.id), store.updated_at)
+        }
+
+    def _format_store(self, store) -> Dict[str, Any]:
+        """Formatear el detalle de una tienda para la API"""
+        return {
             "id": str(store.id),
             "nombre": store.name,
             "supermercado": {
@@ -188,11 +222,6 @@ class StoreService:
             "tiene_estacionamiento": store.has_parking,
             "nombre_completo": store.full_name
         }
-        
-        # Guardar en cache
-        self.cache.set(cache_key, store_data, settings.CACHE_TTL_STORES)
-        
-        return store_data
     
     def calculate_distance(
         self,
@@ -206,9 +235,9 @@ class StoreService:
         """
         return self.store_repo.calculate_distance(db, store_id, lat, lon)
     
-    def get_stores_with_services(
+    async def get_stores_with_services(
         self,
-        db: Session,
+        db: AsyncSession,
         servicios: List[str],
         lat: Optional[float] = None,
         lon: Optional[float] = None,
@@ -221,16 +250,35 @@ class StoreService:
         cache_key = f"stores_services:{'_'.join(sorted(servicios))}:{lat}:{lon}:{radio_km}:{limite}"
         
         # Intentar obtener del cache
-        cached_stores = self.cache.get(cache_key)
+        cached_stores = await self.cache.get(cache_key)
         if cached_stores:
             return cached_stores
         
+        formatted_stores = await db.run_sync(
+            self._load_stores_with_services, servicios, lat, lon, radio_km, limite
+        )
+        
+        # Guardar en cache
+        await self.cache.set(cache_key, formatted_stores, settings.CACHE_TTL_STORES)
+        
+        return formatted_stores
+
+    def _load_stores_with_services(
+        self,
+        db: Session,
+        servicios: List[str],
+        lat: Optional[float],
+        lon: Optional[float],
+        radio_km: float,
+        limite: int
+    ) -> List[Dict[str, Any]]:
+        """Cargar y formatear tiendas con los servicios pedidos"""
         stores = self.store_repo.get_stores_with_services(
             db, servicios, lat, lon, radio_km, limite
         )
         
         formatted_stores = []
-        for store in stores:
+        for store, distance in stores:
             store_info = {
                 "id": str(store.id),
                 "nombre": store.name,
@@ -245,18 +293,13 @@ class StoreService:
                 "servicios_solicitados": [s for s in servicios if s in store.get_services_list()]
             }
             
-            # Calcular distancia si se proporcionan coordenadas
-            if lat is not None and lon is not None:
-                distance = self.calculate_distance(db, store.id, lat, lon)
-                if distance:
-                    store_info["distancia_km"] = distance
-                    store_info["tiempo_estimado"] = int(distance * 2.5)  # Estimación simple
+            # Distancia calculada en la misma consulta
+            if distance is not None:
+                store_info["distancia_km"] = distance
+                store_info["tiempo_estimado"] = int(distance * 2.5)  # Estimación simple
             
             formatted_stores.append(store_info)
         
-        # Guardar en cache
-        self.cache.set(cache_key, formatted_stores, settings.CACHE_TTL_STORES)
-        
         return formatted_stores
     
     def _format_services(self, store_data: Dict[str, Any]) -> List[str]:
@@ -15,6 +15,8 @@ import asyncio
 import logging
 from dataclasses import dataclass
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 
@@ -270,15 +272,25 @@ class DistanceCalculator:
         Returns:
             Lista de (nombre, distancia_km) ordenada por distancia
         """
-        distances = []
+        if not locations or max_results <= 0:
+            return []
+        
+        distances = haversine_km(
+            reference_point.lat,
+            reference_point.lng,
+            [coords.lat for _, coords in locations],
+            [coords.lng for _, coords in locations],
+        )
         
-        for name, coords in locations:
-            distance = self._haversine_distance(reference_point, coords)
-            distances.append((name, distance))
+        # Top-k sin ordenar todo el arreglo; orden estable entre empates
+        k = min(max_results, len(locations))
+        if k < len(locations):
+            candidates = np.argpartition(distances, k - 1)[:k]
+        else:
+            candidates = np.arange(len(locations))
+        nearest = candidates[np.lexsort((candidates, distances[candidates]))]
         
-        # Ordenar por distancia y retornar los más cercanos
-        distances.sort(key=lambda x: x[1])
-        return distances[:max_results]
+        return [(locations[i][0], round(float(distances[i]), 2)) for i in nearest]
     
     def is_within_radius(
         self,
@@ -328,6 +340,28 @@ class DistanceCalculator:
 
 # Funciones de utilidad adicionales
 
+def haversine_km(lat: float, lng: float, lats, lngs) -> np.ndarray:
+    """
+    Distancia Haversine vectorizada desde un punto a muchos destinos.
+    
+    Args:
+        lat, lng: Punto de referencia en grados
+        lats, lngs: Secuencias de latitudes y longitudes en grados
+        
+    Returns:
+        np.ndarray: Distancias en kilómetros (sin redondear)
+    """
+    lat1 = np.radians(lat)
+    lon1 = np.radians(lng)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lngs, dtype=np.float64))
+    
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
 def degrees_to_radians(degrees: float) -> float:
     """Convierte grados a radianes"""
     return degrees * math.pi / 180
@@ -1,4 +1,5 @@
 import re
+import unicodedata
 from html import escape
 
 SAFE_PATTERN = re.compile(r'[^\w\s-]', re.UNICODE)
@@ -9,3 +10,9 @@ def sanitize_text(value: str) -> str:
         return ""
     sanitized = SAFE_PATTERN.sub('', value)
     return escape(sanitized.strip())
+
+
+def normalize_search_term(value: str) -> str:
+    """Quitar acentos y pasar a minúsculas ("Ñuñoa" -> "nunoa"), igual que lower(unaccent())."""
+    normalized = unicodedata.normalize("NFKD", value or "")
+    return normalized.encode("ascii", "ignore").decode().lower().strip()
@@ -0,0 +1,55 @@
+"""add materialized view for price trends by commune
+
+Revision ID: 8b3e61c2d7a9
+Revises: 5af2b0a1e4f6
+Create Date: 2024-04-02 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8b3e61c2d7a9'
+down_revision = '5af2b0a1e4f6'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS pricing.mv_tendencias_comuna AS
+        SELECT
+            p.product_id,
+            s.commune,
+            COUNT(*) AS store_count,
+            ROUND(AVG(p.normal_price), 0) AS avg_normal_price,
+            ROUND(AVG(COALESCE(p.discount_price, p.normal_price)), 0) AS avg_effective_price,
+            ROUND(MIN(COALESCE(p.discount_price, p.normal_price)), 0) AS min_price,
+            ROUND(MAX(COALESCE(p.discount_price, p.normal_price)), 0) AS max_price,
+            NOW() AS refreshed_at
+        FROM pricing.prices p
+        JOIN stores.stores s ON p.store_id = s.id
+        WHERE
+            p.is_active = true
+            AND s.is_active = true
+            AND p.stock_status = 'available'
+            AND (p.product_id, p.store_id, p.scraped_at) IN (
+                SELECT product_id, store_id, MAX(scraped_at)
+                FROM pricing.prices
+                WHERE is_active = true
+                GROUP BY product_id, store_id
+            )
+        GROUP BY p.product_id, s.commune
+        WITH DATA
+    """)
+    # Índice único requerido por REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.create_index(
+        'ix_mv_tendencias_comuna_product_commune',
+        'mv_tendencias_comuna',
+        ['product_id', 'commune'],
+        unique=True,
+        schema='pricing'
+    )
+
+def downgrade():
+    op.drop_index('ix_mv_tendencias_comuna_product_commune', table_name='mv_tendencias_comuna', schema='pricing')
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS pricing.mv_tendencias_comuna")
@@ -0,0 +1,34 @@
+"""notify price changes for cache invalidation
+
+Revision ID: c4d1f9a7e2b3
+Revises: 8b3e61c2d7a9
+Create Date: 2024-04-09 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c4d1f9a7e2b3'
+down_revision = '8b3e61c2d7a9'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("""
+        CREATE OR REPLACE FUNCTION pricing.notify_price_changed()
+        RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('price_changed', NEW.product_id::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER price_changed_notify
+        AFTER INSERT OR UPDATE ON pricing.prices
+        FOR EACH ROW EXECUTE FUNCTION pricing.notify_price_changed()
+    """)
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS price_changed_notify ON pricing.prices")
+    op.execute("DROP FUNCTION IF EXISTS pricing.notify_price_changed()")
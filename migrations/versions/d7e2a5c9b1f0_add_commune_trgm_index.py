@@ -0,0 +1,50 @@
+"""normalize store communes and add trigram index for commune search
+
+Revision ID: d7e2a5c9b1f0
+Revises: c4d1f9a7e2b3
+Create Date: 2024-05-20 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd7e2a5c9b1f0'
+down_revision = 'c4d1f9a7e2b3'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    # unaccent() no es IMMUTABLE, así que commune_normalized se mantiene con
+    # un trigger en lugar de una columna generada
+    op.execute("""
+        CREATE OR REPLACE FUNCTION stores.set_commune_normalized()
+        RETURNS trigger AS $$
+        BEGIN
+            NEW.commune_normalized := lower(unaccent(NEW.commune));
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER stores_commune_normalized
+        BEFORE INSERT OR UPDATE OF commune ON stores.stores
+        FOR EACH ROW EXECUTE FUNCTION stores.set_commune_normalized()
+    """)
+    op.execute("UPDATE stores.stores SET commune_normalized = lower(unaccent(commune))")
+    op.create_index(
+        'ix_stores_commune_normalized_trgm',
+        'stores',
+        ['commune_normalized'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'commune_normalized': 'gin_trgm_ops'},
+        schema='stores'
+    )
+
+def downgrade():
+    op.drop_index('ix_stores_commune_normalized_trgm', table_name='stores', schema='stores')
+    op.execute("DROP TRIGGER IF EXISTS stores_commune_normalized ON stores.stores")
+    op.execute("DROP FUNCTION IF EXISTS stores.set_commune_normalized()")
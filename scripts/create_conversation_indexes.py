@@ -0,0 +1,14 @@
+"""
+Crear (o completar) los índices del conversation service sin bloquear
+escrituras. Idempotente: los índices existentes se omiten.
+
+Uso: python scripts/create_conversation_indexes.py
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import create_conversation_indexes
+
+if __name__ == "__main__":
+    create_conversation_indexes()
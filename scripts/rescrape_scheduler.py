@@ -3,6 +3,8 @@ import logging
 from app.core.database import SessionLocal
 from app.repositories.product_repository import product_repository
 from app.services.price_service import price_service
+from tasks import background_queue
+from tasks.jobs import refresh_price_trends
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,6 +19,8 @@ def run_cycle() -> None:
             price_service.needs_rescrape(db, product.id)
     finally:
         db.close()
+    # Refrescar tendencias por comuna con los precios recién actualizados
+    background_queue.enqueue(refresh_price_trends)
 
 if __name__ == "__main__":
     while True:
@@ -3,7 +3,7 @@
 Si RQ no está disponible o no hay REDIS_URL configurada,
 se utiliza un stub que ejecuta las tareas de forma síncrona.
 """
-from redis import asyncio as aioredis
+from redis import Redis
 
 from app.core.config import settings
 
@@ -28,11 +28,21 @@ if not settings.REDIS_URL or Queue is None:
 
             return _Job()
 
+        @staticmethod
+        def prepare_data(func, args=None, kwargs=None, **_options):
+            return (func, args or (), kwargs or {})
+
+        def enqueue_many(self, job_datas, pipeline=None):
+            return [
+                self.enqueue(func, *args, **kwargs)
+                for func, args, kwargs in job_datas
+            ]
+
     redis_conn = None
 else:  # pragma: no cover - requiere RQ y Redis reales
-    redis_conn = aioredis.from_url(
-        settings.REDIS_URL, encoding="utf-8", decode_responses=True
-    )
+    # RQ serializa los jobs en binario y usa un cliente síncrono; las
+    # llamadas desde endpoints async se ejecutan en un hilo aparte.
+    redis_conn = Redis.from_url(settings.REDIS_URL)
 
 # Cola por defecto para tareas en segundo plano
 background_queue: Queue = Queue("default", connection=redis_conn)
@@ -1,4 +1,5 @@
 """Tareas asíncronas reutilizando servicios existentes."""
+import asyncio
 from uuid import UUID
 
 from tasks import background_queue  # noqa: F401, imported for side effects
@@ -6,13 +7,25 @@ from tasks import background_queue  # noqa: F401, imported for side effects
 
 def scrape_prices(product_id: UUID) -> dict:
     """Scrapea precios para un producto utilizando el servicio de precios."""
-    from app.core.database import SessionLocal
+    from app.core.database import AsyncSessionLocal
     from app.services.price_service import price_service
 
+    async def _run() -> dict:
+        async with AsyncSessionLocal() as db:
+            # Se reutiliza el servicio existente para obtener/comparar precios
+            return await price_service.compare_prices(db, product_id)
+
+    return asyncio.run(_run())
+
+
+def refresh_price_trends() -> None:
+    """Refresca la vista materializada de tendencias de precio por comuna."""
+    from app.core.database import SessionLocal
+    from app.repositories.price_repository import price_repository
+
     db = SessionLocal()
     try:
-        # Se reutiliza el servicio existente para obtener/comparar precios
-        return price_service.compare_prices(db, product_id)
+        price_repository.refresh_commune_trends(db)
     finally:
         db.close()
 
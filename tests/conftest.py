@@ -6,6 +6,7 @@ import os
 import sys
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from fastapi.testclient import TestClient
 from sqlalchemy.dialects.postgresql import UUID as PGUUID
 from sqlalchemy.dialects.postgresql import JSONB
@@ -33,7 +34,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import app.main as app_main
 from app.main import app
-from app.core.database import get_db, Base
+from app.core.database import get_db, get_async_db, Base
 from app.core.config import settings
 
 # URL de base de datos de test
@@ -65,8 +66,30 @@ def override_get_db():
         db.close()
 
 
+# Engine asíncrono de test sobre el mismo archivo SQLite
+test_async_engine = create_async_engine(
+    "sqlite+aiosqlite:///./test.db",
+    execution_options={
+        "schema_translate_map": {"products": None, "stores": None, "pricing": None}
+    }
+)
+
+TestingAsyncSessionLocal = async_sessionmaker(
+    test_async_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+
+async def override_get_async_db():
+    """Override de la dependencia asíncrona de base de datos para tests"""
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 # Override de la dependencia
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 
 @pytest.fixture(scope="session")
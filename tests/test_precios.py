@@ -33,3 +33,18 @@ class TestPriceEndpoints:
         assert data["precios"] == []
         assert data["marca_sugerida"] == "Alternative Brand"
         assert "Alternative Brand" in data["explicacion"]
+
+    def test_comparar_precios_batch_requiere_ids(self, client: TestClient):
+        """El batch debe rechazar una lista vacía de productos"""
+        response = client.post("/api/v1/precios/comparar-batch", json={"producto_ids": []})
+
+        assert response.status_code == 422
+
+    def test_comparar_precios_batch_coordenadas_incompletas(self, client: TestClient):
+        """El batch debe exigir latitud y longitud juntas"""
+        response = client.post(
+            "/api/v1/precios/comparar-batch",
+            json={"producto_ids": [str(TestUtils.create_test_uuid())], "lat": -33.4489},
+        )
+
+        TestUtils.assert_response_error(response, 400)
@@ -26,17 +26,18 @@ async def test_limiter_initialized_with_client(monkeypatch):
 
     redis_instance = DummyRedis()
 
-    def dummy_from_url(url, *args, **kwargs):
-        return redis_instance
+    async def dummy_connect():
+        app_main.cache.redis_client = redis_instance
 
     limiter = MagicMock()
     limiter.init = AsyncMock()
 
     monkeypatch.setattr(app_main, "FastAPILimiter", limiter)
-    monkeypatch.setattr(app_main.aioredis, "from_url", dummy_from_url)
+    monkeypatch.setattr(app_main.cache, "redis_client", None)
+    monkeypatch.setattr(app_main.cache, "_connect", dummy_connect)
     monkeypatch.setattr(settings, "REDIS_URL", "redis://example:6379/0")
 
     async with app_main.lifespan(app_main.app):
-        pass
+        assert app_main.app.state.redis is redis_instance
 
     limiter.init.assert_awaited_once_with(redis_instance)
@@ -0,0 +1,255 @@
+import asyncio
+from decimal import Decimal
+from uuid import UUID
+
+from app.core import cache as cache_module
+
+
+class DummyCache:
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.store[key] = value
+        return True
+
+    async def delete_pattern(self, pattern):
+        prefix = pattern.rstrip("*")
+        keys = [k for k in self.store if k.startswith(prefix)]
+        for key in keys:
+            del self.store[key]
+        return len(keys)
+
+
+class BytesRedis:
+    """Cliente Redis falso que, como el real sin decode_responses, guarda bytes."""
+
+    def __init__(self):
+        self.store = {}
+        self.round_trips = 0
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value):
+        assert isinstance(value, bytes)
+        self.store[key] = value
+
+    async def setex(self, key, ttl, value):
+        await self.set(key, value)
+
+    async def mget(self, keys):
+        self.round_trips += 1
+        return [self.store.get(key) for key in keys]
+
+    async def scan_iter(self, match=None, count=None):
+        prefix = match.rstrip("*")
+        for key in list(self.store):
+            if key.startswith(prefix):
+                yield key
+
+    async def unlink(self, *keys):
+        self.round_trips += 1
+        return sum(self.store.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=True):
+        return BytesPipeline(self)
+
+
+class BytesPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, ex=None):
+        assert isinstance(value, bytes)
+        self.commands.append((key, value))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        self.redis.store.update(self.commands)
+
+
+class DummyService:
+    def __init__(self):
+        self.calls = 0
+
+    @cache_module.sql_cache(ttl=60)
+    async def compare(self, db, product_id, lat=None, lon=None):
+        self.calls += 1
+        if product_id == "missing":
+            return {"error": "Producto no encontrado"}
+        return {"product_id": product_id, "lat": lat}
+
+    @cache_module.sql_cache(ttl=60, product_arg="product_id")
+    async def history(self, db, product_id, dias=30):
+        self.calls += 1
+        return {"product_id": product_id, "dias": dias}
+
+
+def test_sql_cache_comparte_resultados_por_sector(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache", DummyCache())
+    service = DummyService()
+
+    first = asyncio.run(service.compare("db-1", "p1", lat=-33.44891, lon=-70.66931))
+    second = asyncio.run(service.compare("db-2", "p1", lat=-33.44889, lon=-70.66929))
+
+    assert first == second
+    assert service.calls == 1
+
+
+def test_sql_cache_no_guarda_errores(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache", DummyCache())
+    service = DummyService()
+
+    asyncio.run(service.compare(None, "missing"))
+    asyncio.run(service.compare(None, "missing"))
+
+    assert service.calls == 2
+
+
+def test_invalidate_product_prices_borra_solo_ese_producto(monkeypatch):
+    dummy = DummyCache()
+    monkeypatch.setattr(cache_module, "cache", dummy)
+    service = DummyService()
+    dummy.store["cch:prod:p1:comparar:lat=1"] = b"{}"
+    dummy.store["cch:prod:p2:comparar:lat=1"] = b"{}"
+
+    asyncio.run(service.history(None, "p1"))
+    asyncio.run(service.history(None, "p2"))
+    asyncio.run(cache_module.invalidate_product_prices("p1"))
+    asyncio.run(service.history(None, "p1"))
+    asyncio.run(service.history(None, "p2"))
+
+    assert service.calls == 3
+    assert "cch:prod:p1:comparar:lat=1" not in dummy.store
+    assert "cch:prod:p2:comparar:lat=1" in dummy.store
+
+
+def test_escape_glob_vale_para_redis_y_l1():
+    local = cache_module._LocalTTLCache(maxsize=10, ttl=60)
+    local.set("drift:a*b:1", b"1")
+    local.set("drift:aXb:1", b"1")
+
+    local.pop_matching(f"drift:{cache_module.escape_glob('a*b')}:*")
+
+    assert local.get("drift:a*b:1") is None
+    assert local.get("drift:aXb:1") == b"1"
+    assert cache_module.escape_glob("x'?[]") == "x'\\?\\[\\]"
+
+
+def test_search_cache_key_builder_agrupa_coordenadas_cercanas():
+    def buscar_productos():
+        pass
+
+    key_a = cache_module.search_cache_key_builder(
+        buscar_productos, "cch:", kwargs={"q": "leche", "lat": -33.4489, "lon": -70.6693, "db": object()}
+    )
+    key_b = cache_module.search_cache_key_builder(
+        buscar_productos, "cch:", kwargs={"q": "leche", "lat": -33.4512, "lon": -70.6711, "db": object()}
+    )
+
+    assert key_a == key_b == "cch::buscar_productos:lat=-33.45:lon=-70.67:q=leche"
+
+
+def test_redis_cache_serializa_tipos_no_json_como_texto():
+    redis_cache = cache_module.RedisCache()
+    redis_cache.redis_client = BytesRedis()
+    value = {
+        "id": UUID("12345678-1234-5678-1234-567812345678"),
+        "precio": Decimal("1290.50"),
+        1: "clave entera",
+    }
+
+    assert asyncio.run(redis_cache.set("k", value, ttl=60)) is True
+    assert asyncio.run(redis_cache.get("k")) == {
+        "id": "12345678-1234-5678-1234-567812345678",
+        "precio": "1290.50",
+        "1": "clave entera",
+    }
+
+
+def test_redis_cache_mget_mset_en_un_round_trip():
+    redis_cache = cache_module.RedisCache()
+    redis_cache.redis_client = BytesRedis()
+
+    assert asyncio.run(redis_cache.mset({"a": {"n": 1}, "b": [2]}, ttl=60)) is True
+    assert asyncio.run(redis_cache.mget(["a", "falta", "b"])) == [{"n": 1}, None, [2]]
+    assert redis_cache.redis_client.round_trips == 2
+    assert asyncio.run(redis_cache.mget([])) == []
+
+
+def test_redis_cache_delete_pattern_borra_por_lotes(monkeypatch):
+    monkeypatch.setattr(cache_module, "_SCAN_BATCH", 2)
+    redis_cache = cache_module.RedisCache()
+    redis_cache.redis_client = BytesRedis()
+    redis_cache.redis_client.store = {f"sql_cache:prod:p1:{i}": b"1" for i in range(5)}
+    redis_cache.redis_client.store["sql_cache:prod:p2:0"] = b"1"
+
+    assert asyncio.run(redis_cache.delete_pattern("sql_cache:prod:p1:*")) == 5
+    assert list(redis_cache.redis_client.store) == ["sql_cache:prod:p2:0"]
+    assert redis_cache.redis_client.round_trips == 3
+
+
+def test_cache_search_key_canonico_y_sin_colisiones():
+    key = cache_module.cache_search_key("leche", {"b": 1, "a": None})
+
+    assert key == cache_module.cache_search_key("leche", {"a": None, "b": 1})
+    assert len(key) == len("search:") + 32
+    assert cache_module.cache_search_key("x", {"a": "1_b:2"}) != cache_module.cache_search_key(
+        "x", {"a": "1", "b": "2"}
+    )
+
+
+def test_redis_cache_l1_evita_round_trip_y_entrega_copias():
+    redis_cache = cache_module.RedisCache()
+    redis_cache.redis_client = BytesRedis()
+    redis_cache.redis_client.store["producto:1"] = b'{"nombre":"Leche"}'
+
+    first = asyncio.run(redis_cache.get("producto:1"))
+    first["nombre"] = "modificado"
+    del redis_cache.redis_client.store["producto:1"]
+
+    assert asyncio.run(redis_cache.get("producto:1")) == {"nombre": "Leche"}
+
+    asyncio.run(redis_cache.delete_pattern("producto:*"))
+    assert asyncio.run(redis_cache.get("producto:1")) is None
+
+
+def test_local_ttl_cache_expira_y_desaloja_lru(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    local = cache_module._LocalTTLCache(maxsize=2, ttl=60)
+
+    local.set("a", b"1")
+    local.set("b", b"2", ttl=5)
+    local.get("a")
+    local.set("c", b"3")
+
+    assert local.get("b") is None
+    assert local.get("a") == b"1"
+    now[0] += 61
+    assert local.get("a") is None
+
+
+def test_redis_cache_comprime_valores_grandes():
+    redis_cache = cache_module.RedisCache()
+    redis_cache.redis_client = BytesRedis()
+    value = {"productos": [{"nombre": f"Leche entera {i}"} for i in range(100)]}
+
+    asyncio.run(redis_cache.set("grande", value))
+    asyncio.run(redis_cache.set("chico", {"n": 1}))
+    redis_cache._local = None
+
+    assert len(redis_cache.redis_client.store["grande"]) < len(cache_module.orjson.dumps(value))
+    assert redis_cache.redis_client.store["chico"] == b'{"n":1}'
+    assert asyncio.run(redis_cache.mget(["grande", "chico"])) == [value, {"n": 1}]
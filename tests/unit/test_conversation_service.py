@@ -0,0 +1,23 @@
+from datetime import datetime
+
+import pytest
+
+from app.services.conversation_service import WeightedMovingAverage
+
+
+def test_weighted_moving_average_recursivo_equivale_a_suma_ponderada():
+    wma = WeightedMovingAverage(alpha=0.3)
+    now = datetime.now()
+    values = [4.0, 2.0, 5.0, 3.0]
+
+    for value in values:
+        result = wma.update(value, now)
+
+    # Pesos geométricos: el dato más reciente pesa más
+    weights = [(1 - 0.3) ** i for i in range(len(values))][::-1]
+    expected = sum(w * v for w, v in zip(weights, values)) / sum(weights)
+    assert result == pytest.approx(expected, rel=1e-4)
+
+
+def test_weighted_moving_average_sin_datos():
+    assert WeightedMovingAverage()._calculate_weighted_average() == 0.0
@@ -0,0 +1,30 @@
+import random
+
+from app.utils.distance_calculator import Coordenadas, DistanceCalculator, haversine_km
+
+
+def test_haversine_vectorizado_coincide_con_escalar():
+    calc = DistanceCalculator()
+    origen = Coordenadas(lat=-33.4489, lng=-70.6693)
+    rng = random.Random(7)
+    puntos = [Coordenadas(lat=rng.uniform(-34, -33), lng=rng.uniform(-71, -70)) for _ in range(50)]
+
+    vector = haversine_km(origen.lat, origen.lng, [p.lat for p in puntos], [p.lng for p in puntos])
+
+    for punto, distancia in zip(puntos, vector):
+        assert round(float(distancia), 2) == calc._haversine_distance(origen, punto)
+
+
+def test_find_nearest_locations_ordena_y_limita():
+    calc = DistanceCalculator()
+    origen = Coordenadas(lat=-33.45, lng=-70.66)
+    ubicaciones = [
+        ("lejos", Coordenadas(lat=-33.60, lng=-70.80)),
+        ("cerca", Coordenadas(lat=-33.451, lng=-70.661)),
+        ("medio", Coordenadas(lat=-33.50, lng=-70.70)),
+    ]
+
+    resultado = calc.find_nearest_locations(origen, ubicaciones, max_results=2)
+
+    assert [nombre for nombre, _ in resultado] == ["cerca", "medio"]
+    assert calc.find_nearest_locations(origen, [], max_results=3) == []
@@ -0,0 +1,73 @@
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, Response
+from fastapi.testclient import TestClient
+
+from app.core.cache import CachedResponseCoder, etag_for, version_etag, with_etag
+from app.core.etag import ETagMiddleware, is_not_modified
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(ETagMiddleware)
+
+    @app.get("/ofertas")
+    async def ofertas():
+        return with_etag(ORJSONResponse(content={"ofertas": [1, 2, 3]}))
+
+    return app
+
+
+def test_etag_responde_304_si_coincide():
+    client = TestClient(_app())
+
+    first = client.get("/ofertas")
+    etag = first.headers["etag"]
+    second = client.get("/ofertas", headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+
+
+def test_etag_distinto_devuelve_cuerpo():
+    client = TestClient(_app())
+
+    response = client.get("/ofertas", headers={"If-None-Match": 'W/"otro"'})
+
+    assert response.status_code == 200
+    assert response.json() == {"ofertas": [1, 2, 3]}
+
+
+def test_coder_conserva_etag_en_acierto():
+    original = with_etag(ORJSONResponse(content={"a": 1}))
+
+    stored = CachedResponseCoder.encode(original).decode()
+    restored = CachedResponseCoder.decode_as_type(stored)
+
+    assert restored.body == original.body
+    assert restored.headers["etag"] == etag_for(original.body)
+    assert CachedResponseCoder.decode(stored) == {"a": 1}
+
+
+def test_version_etag_corta_sin_tocar_el_cuerpo():
+    updated_at = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+    etag = version_etag("abc", updated_at)
+    app = FastAPI()
+
+    @app.get("/productos/{producto_id}")
+    async def producto(producto_id: str, request: Request):
+        if is_not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        return ORJSONResponse(content={"id": producto_id}, headers={"ETag": etag})
+
+    client = TestClient(app)
+    first = client.get("/productos/abc")
+    second = client.get("/productos/abc", headers={"If-None-Match": etag})
+
+    assert etag == f'W/"abc-{int(updated_at.timestamp())}"'
+    assert first.headers["etag"] == etag
+    assert second.status_code == 304
+    assert version_etag("abc", None) == 'W/"abc-0"'
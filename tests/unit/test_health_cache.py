@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.api.v1.routers import health
+
+
+@pytest.fixture(autouse=True)
+def _reset_cache(monkeypatch):
+    monkeypatch.setattr(health, "_cache", None)
+    yield
+    health._cache = None
+
+
+def test_health_reutiliza_resultado_dentro_del_ttl(monkeypatch):
+    calls = {"db": 0}
+
+    async def check_db():
+        calls["db"] += 1
+        return True
+
+    async def check_redis():
+        return True
+
+    monkeypatch.setattr(health, "check_db", check_db)
+    monkeypatch.setattr(health, "check_redis", check_redis)
+
+    async def probes():
+        return await asyncio.gather(*(health.health() for _ in range(5)))
+
+    results = asyncio.run(probes())
+
+    assert calls["db"] == 1
+    assert all(r == {"status": "ok", "database": "ok", "redis": "ok"} for r in results)
+
+
+def test_health_recalcula_al_expirar(monkeypatch):
+    calls = {"db": 0}
+
+    async def check_db():
+        calls["db"] += 1
+        return False
+
+    async def check_redis():
+        return True
+
+    monkeypatch.setattr(health, "check_db", check_db)
+    monkeypatch.setattr(health, "check_redis", check_redis)
+    monkeypatch.setattr(health, "HEALTH_CACHE_TTL", 0.0)
+
+    asyncio.run(health.health())
+    result = asyncio.run(health.health())
+
+    assert calls["db"] == 2
+    assert result["status"] == "degraded"
@@ -0,0 +1,84 @@
+import asyncio
+
+from app.core import price_notifications
+from app.core.price_notifications import PriceChangeListener
+
+
+class FakeConnection:
+    def __init__(self):
+        self.termination_listeners = []
+        self.listeners = []
+        self.closed = False
+
+    def add_termination_listener(self, callback):
+        self.termination_listeners.append(callback)
+
+    async def add_listener(self, channel, callback):
+        self.listeners.append(callback)
+
+    async def remove_listener(self, channel, callback):
+        self.listeners.remove(callback)
+
+    async def close(self):
+        self.closed = True
+
+    def drop(self):
+        for callback in self.termination_listeners:
+            callback(self)
+
+
+def _fake_connect(monkeypatch, connections):
+    async def connect(dsn):
+        conn = FakeConnection()
+        connections.append(conn)
+        return conn
+
+    monkeypatch.setattr(price_notifications.asyncpg, "connect", connect)
+
+
+def test_listener_agrupa_notificaciones_repetidas(monkeypatch):
+    monkeypatch.setattr(price_notifications, "DEBOUNCE_SECONDS", 0)
+    connections = []
+    _fake_connect(monkeypatch, connections)
+    invalidated = []
+
+    async def on_change(product_id):
+        invalidated.append(product_id)
+
+    async def run():
+        listener = PriceChangeListener("postgresql://db", on_change)
+        await listener.start()
+        for product_id in ["p1", "p1", "p2", "p1"]:
+            listener._handle(connections[0], 1, "price_changed", product_id)
+        await asyncio.sleep(0.01)
+        await listener.stop()
+
+    asyncio.run(run())
+
+    assert sorted(invalidated) == ["p1", "p2"]
+    assert connections[0].closed
+
+
+def test_listener_reconecta_e_invalida_todo(monkeypatch):
+    connections = []
+    _fake_connect(monkeypatch, connections)
+    reconnects = []
+
+    async def on_change(product_id):
+        pass
+
+    async def on_reconnect():
+        reconnects.append(True)
+
+    async def run():
+        listener = PriceChangeListener("postgresql://db", on_change, on_reconnect=on_reconnect)
+        await listener.start()
+        connections[0].drop()
+        await asyncio.sleep(0.01)
+        assert listener._conn is connections[1]
+        await listener.stop()
+
+    asyncio.run(run())
+
+    assert len(connections) == 2
+    assert reconnects == [True]
@@ -0,0 +1,19 @@
+import uuid
+
+import pytest
+
+from app.services.product_service import decode_search_cursor, encode_search_cursor
+
+
+def test_cursor_ida_y_vuelta():
+    product_id = uuid.uuid4()
+    cursor = encode_search_cursor(0.4285714328289032, product_id, 137)
+
+    assert "=" not in cursor
+    assert decode_search_cursor(cursor) == (0.4285714328289032, product_id, 137)
+
+
+@pytest.mark.parametrize("cursor", ["no-es-base64!", "W10", encode_search_cursor(0.5, uuid.uuid4(), 3)[:-4]])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        decode_search_cursor(cursor)
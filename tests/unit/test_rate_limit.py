@@ -0,0 +1,81 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.rate_limit import RateLimiter
+
+
+class FakeScript:
+    """Reproduce el script Lua: contador por clave con tope."""
+
+    def __init__(self):
+        self.counts = {}
+        self.calls = 0
+
+    async def __call__(self, keys, args):
+        self.calls += 1
+        key = keys[0]
+        self.counts[key] = self.counts.get(key, 0) + 1
+        return 0 if self.counts[key] > int(args[1]) else 1
+
+
+@pytest.fixture(autouse=True)
+def rate_limit_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+
+
+def _request(script, host="1.2.3.4", forwarded_for=None):
+    app = SimpleNamespace(state=SimpleNamespace(rate_limit_script=script, redis=None))
+    headers = {"x-forwarded-for": forwarded_for} if forwarded_for else {}
+    return SimpleNamespace(app=app, client=SimpleNamespace(host=host), headers=headers)
+
+
+def test_rate_limiter_rechaza_sobre_el_limite():
+    script = FakeScript()
+    limiter = RateLimiter(times=2, seconds=60, scope="comparar")
+
+    asyncio.run(limiter(_request(script)))
+    asyncio.run(limiter(_request(script)))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(limiter(_request(script)))
+
+    assert exc.value.status_code == 429
+    assert script.calls == 3
+    assert list(script.counts) == ["rl:comparar:1.2.3.4"]
+
+
+def test_rate_limiter_sin_redis_deja_pasar():
+    limiter = RateLimiter(times=1)
+
+    asyncio.run(limiter(_request(None)))
+    asyncio.run(limiter(_request(None)))
+
+
+def test_rate_limiter_desactivado_no_cuenta(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    script = FakeScript()
+    limiter = RateLimiter(times=1)
+
+    asyncio.run(limiter(_request(script)))
+    asyncio.run(limiter(_request(script)))
+
+    assert script.calls == 0
+
+
+def test_rate_limiter_usa_x_forwarded_for_solo_desde_proxy_de_confianza():
+    limiter = RateLimiter(times=1, trusted_proxies=["10.0.0.0/8"])
+
+    # Desde el proxy: el salto más a la derecha que no es proxy, no lo que
+    # el cliente haya escrito a la izquierda
+    detras_del_proxy = _request(None, host="10.1.2.3", forwarded_for="6.6.6.6, 200.1.1.1, 10.0.0.7")
+    assert limiter.client_ip(detras_del_proxy) == "200.1.1.1"
+
+    # Conexión directa: el header no es confiable
+    directo = _request(None, host="200.9.9.9", forwarded_for="6.6.6.6")
+    assert limiter.client_ip(directo) == "200.9.9.9"
+
+    # Proxy sin header: queda la IP del proxy
+    assert limiter.client_ip(_request(None, host="10.1.2.3")) == "10.1.2.3"
@@ -0,0 +1,35 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from structlog.contextvars import get_contextvars
+
+from app.core.request_log import RequestLogMiddleware
+
+
+def _make_app():
+    app = FastAPI()
+    app.add_middleware(RequestLogMiddleware)
+
+    @app.get("/contexto")
+    async def contexto():
+        return get_contextvars()
+
+    return app
+
+
+def test_request_log_asocia_ids_y_agrega_tiempo():
+    client = TestClient(_make_app())
+
+    response = client.get("/contexto", headers={"X-Request-ID": "req-1", "X-User-ID": "u-9"})
+
+    assert response.json() == {"request_id": "req-1", "user_id": "u-9"}
+    assert float(response.headers["x-process-time"]) >= 0
+    assert get_contextvars() == {}
+
+
+def test_request_log_genera_request_id_si_falta():
+    client = TestClient(_make_app())
+
+    contexto = client.get("/contexto").json()
+
+    assert contexto["user_id"] == "anonymous"
+    assert len(contexto["request_id"]) == 24